@@ -0,0 +1,98 @@
+"""
+PostgreSQL connection pooling.
+
+Django 5.1+ hands ``DATABASES[alias]['OPTIONS']['pool']`` to psycopg's
+``ConnectionPool``: a request or command then borrows an open connection
+instead of opening (TCP, TLS, authentication, backend fork) a new one, and
+gives it back when Django closes it. ``pool_options()`` builds that setting
+from the environment:
+
+==========================  =======  ============================================
+``DB_POOL``                 ``1``    ``0`` disables pooling
+``DB_POOL_MIN_SIZE``        ``2``    connections kept open
+``DB_POOL_MAX_SIZE``        ``10``   upper bound per process and alias
+``DB_POOL_TIMEOUT``         ``10``   seconds to wait for a free connection
+``DB_POOL_MAX_LIFETIME``    ``1800`` seconds before a connection is replaced
+``DB_POOL_MAX_IDLE``        ``300``  seconds an idle extra connection is kept
+==========================  =======  ============================================
+
+With ``CONN_HEALTH_CHECKS`` the pool checks each connection as it hands it
+out. Requires ``psycopg[pool]`` (psycopg 3).
+
+``pool_stats()`` reports each pool's counters; every
+``DB_POOL_STATS_INTERVAL`` seconds a finished request also sends them with
+the ``pool_stats_collected`` signal, for metrics exporters to receive.
+"""
+import os
+import threading
+import time
+
+from django.dispatch import Signal
+
+# Sent with ``stats={alias: {...}}`` (the ``pool_stats()`` result).
+pool_stats_collected = Signal()
+
+_FALSE = ('0', 'false', 'no', 'off')
+
+
+def pool_options(environ=os.environ):
+    """``OPTIONS['pool']`` for a PostgreSQL alias: a dict, or False when ``DB_POOL=0``."""
+    if environ.get('DB_POOL', '1').strip().lower() in _FALSE:
+        return False
+    return {
+        'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        'max_lifetime': float(environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        'max_idle': float(environ.get('DB_POOL_MAX_IDLE', 300)),
+    }
+
+
+def pool_stats(aliases=None):
+    """
+    ``{alias: stats}`` for each pooled alias: psycopg's counters
+    (``requests_num``, ``requests_queued``, ``requests_wait_ms``,
+    ``connections_num``, ...) plus ``in_use`` and ``avg_wait_ms``, the mean
+    time a checkout waited. Counters are per process and cumulative.
+    """
+    from django.db import connections
+
+    result = {}
+    for alias in aliases or connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        requests = stats.get('requests_num', 0)
+        result[alias] = {
+            **stats,
+            'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+            'avg_wait_ms': round(stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0.0,
+        }
+    return result
+
+
+_last_report = 0.0
+_report_lock = threading.Lock()
+
+
+def _report(sender, **kwargs):
+    global _last_report
+    from django.conf import settings
+
+    interval = getattr(settings, 'DB_POOL_STATS_INTERVAL', 0)
+    now = time.monotonic()
+    with _report_lock:
+        if not interval or now - _last_report < interval:
+            return
+        _last_report = now
+    stats = pool_stats()
+    if stats:
+        pool_stats_collected.send(sender=None, stats=stats)
+
+
+def connect_signals():
+    """Called from ``EHealthConfig.ready()``."""
+    from django.core.signals import request_finished
+
+    request_finished.connect(_report, dispatch_uid='core_db_pool_report')
@@ -0,0 +1,187 @@
+"""
+Database routing for a primary with read replicas.
+
+Writes always go to ``default``. Reads go to a random alias from
+``settings.DATABASE_REPLICAS`` (to ``default`` when there are none), so the
+analytics commands read from the replicas instead of competing with the
+OLTP writes.
+
+Replicas lag behind the primary, so a read right after a write may not see
+it. Inside a ``sticky()`` scope, a write pins the scope's reads to the
+primary for ``settings.REPLICA_STICKY_SECONDS``:
+
+* ``ReplicaStickinessMiddleware`` opens a scope per request and carries the
+  pin over to the client's next requests in a cookie;
+* ``StickyCommandMixin`` opens one around a management command.
+
+Reads inside a transaction on the primary, and everything inside
+``use_primary()``, go to the primary too.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from math import ceil, isfinite
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+
+class StickyScope:
+    __slots__ = ('window', 'pinned_until', 'wrote')
+
+    def __init__(self, window, pinned_until=0.0):
+        self.window = window
+        self.pinned_until = pinned_until
+        self.wrote = False
+
+    @property
+    def pinned(self):
+        return time.time() < self.pinned_until
+
+
+_scope = ContextVar('db_sticky_scope', default=None)
+_use_primary = ContextVar('db_use_primary', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def sticky_window():
+    return float(getattr(settings, 'REPLICA_STICKY_SECONDS', 0))
+
+
+@contextmanager
+def sticky(seconds=None, pinned_until=0.0):
+    """
+    Pin reads to the primary for ``seconds`` (default
+    ``REPLICA_STICKY_SECONDS``) after each write inside the block. Pass
+    ``pinned_until`` (a Unix time) to start out pinned.
+    """
+    scope = StickyScope(sticky_window() if seconds is None else seconds, pinned_until)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Send every read inside the block to the primary."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def record_write():
+    scope = _scope.get()
+    if scope is not None and scope.window > 0:
+        scope.wrote = True
+        scope.pinned_until = time.time() + scope.window
+
+
+def reads_pinned():
+    """True when reads must go to the primary right now."""
+    if _use_primary.get() or connections[PRIMARY].in_atomic_block:
+        return True
+    scope = _scope.get()
+    return scope is not None and scope.pinned
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects are read from wherever the instance came from.
+            return None
+        aliases = replicas()
+        if not aliases or reads_pinned():
+            return PRIMARY
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        record_write()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Opens a ``sticky()`` scope per request, carried across requests in a
+    cookie. Works on both the WSGI and the ASGI handler.
+    """
+
+    cookie_name = 'db_pinned_until'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with sticky(pinned_until=self.pinned_until(request)) as scope:
+            response = self.get_response(request)
+        return self.process_response(scope, response)
+
+    async def __acall__(self, request):
+        with sticky(pinned_until=self.pinned_until(request)) as scope:
+            response = await self.get_response(request)
+        return self.process_response(scope, response)
+
+    def pinned_until(self, request):
+        """
+        The cookie's pin, at most ``REPLICA_STICKY_SECONDS`` from now: the
+        client can send any value. Unparsable or past values pin nothing.
+        """
+        try:
+            value = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            return 0.0
+        now = time.time()
+        if not isfinite(value) or value <= now:
+            return 0.0
+        return min(value, now + sticky_window())
+
+    def process_response(self, scope, response):
+        if scope.wrote:
+            response.set_cookie(
+                self.cookie_name, f'{scope.pinned_until:.3f}', max_age=max(1, ceil(scope.window)),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class StickyCommandMixin:
+    """
+    Management command mixin: ``handle()`` runs inside a ``sticky()`` scope
+    of ``sticky_seconds`` (default ``REPLICA_STICKY_SECONDS``), so reads
+    after the command's writes see them.
+    """
+
+    sticky_seconds = None
+
+    def execute(self, *args, **options):
+        with sticky(self.sticky_seconds):
+            return super().execute(*args, **options)
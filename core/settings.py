@@ -12,12 +12,21 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from dotenv import load_dotenv
-load_dotenv()
+
+from core.db_pool import pool_options
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Every process start (manage.py, each web worker) imports this module, so
+# it does no I/O beyond reading .env. The file is looked for as
+# python-dotenv's find_dotenv() does (core/, the project directory, then each
+# parent), but dotenv is only imported once one is found.
+_env_file = next((path / '.env' for path in Path(__file__).resolve().parents if (path / '.env').is_file()), None)
+if _env_file is not None:
+    from dotenv import load_dotenv
+    load_dotenv(_env_file)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -45,11 +54,18 @@ INSTALLED_APPS = [
     'bank',
     # installed apps
     'rest_framework',
-     'django.contrib.postgres',  
 ]
 
+# Apps nothing here needs at runtime (e_health's PostgreSQL search and its
+# migrations, extensions included, are raw SQL), so they are not loaded on
+# every start. List them comma-separated in DJANGO_OPTIONAL_APPS to load them
+# anyway, e.g. django.contrib.postgres for its lookups in a shell.
+INSTALLED_APPS += [app.strip() for app in os.environ.get('DJANGO_OPTIONAL_APPS', '').split(',') if app.strip()]
+
 MIDDLEWARE = [
+    'e_health.profiling.SQLProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_routers.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,6 +93,27 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# e_health.cache keeps cached responses in local memory and the generation
+# counters (one per model, plus one per patient) in a SQLite file, so every
+# worker process on the host sees invalidations. That backend increments
+# atomically and never culls, so no counter is lost (core/cache_backends.py).
+# Across several hosts, point 'generations' at a shared cache with an
+# atomic incr, e.g. django.core.cache.backends.redis.RedisCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e_health',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'generations': {
+        'BACKEND': 'core.cache_backends.SQLiteCounterCache',
+        'LOCATION': BASE_DIR / '.cache' / 'generations.sqlite3',
+    },
+}
+
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     # or allow read-only access for unauthenticated users.
@@ -97,13 +134,6 @@ REST_FRAMEWORK = {
 # }
 
 
-print("PostgreSQL DB Settings from ENV variables:")
-print("DB NAME:", os.environ.get('POSTGRES_DB'))
-print("DB USER:", os.environ.get('POSTGRES_USER'))
-print("DB PASSWORD:", os.environ.get('POSTGRES_PASSWORD'))
-print("DB HOST:", os.environ.get('POSTGRES_HOST'))
-print("DB PORT:", os.environ.get('POSTGRES_PORT'))
-
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -112,9 +142,38 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('POSTGRES_HOST'),
         'PORT': os.environ.get('POSTGRES_PORT'),
+        # Pooled connections (DB_POOL* env vars, see core/db_pool.py), each
+        # checked before it is handed out.
+        'OPTIONS': {'pool': pool_options()},
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas: POSTGRES_REPLICA_HOSTS=host1,host2 adds the aliases
+# replica_1, replica_2, ... with the primary's credentials. Reads are routed
+# to them and writes to 'default' (see core/db_routers.py); after a write,
+# the same request/command and the client's next requests keep reading from
+# the primary for REPLICA_STICKY_SECONDS.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+# SQL profiling (e_health/profiling.py): with SQL_PROFILE=1 every request and
+# e_health command run appends one JSON line to SQL_PROFILE_PATH; commands
+# also take --profile-sql.
+
+SQL_PROFILE = os.environ.get('SQL_PROFILE', '').lower() in ('1', 'true', 'yes', 'on')
+SQL_PROFILE_PATH = os.environ.get('SQL_PROFILE_PATH', BASE_DIR / 'sql_profile.jsonl')
+SQL_PROFILE_SLOWEST = 5
+
+# Seconds between pool_stats_collected signals (0 disables them).
+DB_POOL_STATS_INTERVAL = float(os.environ.get('DB_POOL_STATS_INTERVAL', 60))
+
 
 
 # Password validation
@@ -153,6 +212,11 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files, including ModelArtifactField(storage='file') artifacts
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
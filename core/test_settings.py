@@ -0,0 +1,40 @@
+"""
+Settings for running the tests without PostgreSQL:
+
+    python manage.py test --settings core.test_settings
+
+The primary and two "replicas" are the local SQLite file ``db.sqlite3``.
+Under test the replicas mirror the primary's test database, so reads really
+go through the replica aliases chosen by ``core/db_routers.py``.
+"""
+from core.settings import *  # noqa: F401,F403
+from core.settings import BASE_DIR
+
+SECRET_KEY = 'test-only-secret-key'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    **{
+        alias: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        }
+        for alias in ('replica_1', 'replica_2')
+    },
+}
+DATABASE_REPLICAS = ['replica_1', 'replica_2']
+
+# Generation counters stay in the test process instead of the real
+# .cache/generations.sqlite3 (and apart from parallel test workers).
+CACHES = {
+    **CACHES,  # noqa: F405
+    'generations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e_health-test-generations',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
+}
@@ -19,7 +19,7 @@ from django.urls import path,include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-   
+    path('api/', include('e_health.urls')),
     path('api-auth/', include('rest_framework.urls'))
 
 ]
@@ -0,0 +1,105 @@
+import threading
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class CaseNumberAllocator:
+    """
+    Hands out case numbers of the form ``CASE<YYYYMMDD><seq>``.
+
+    Each database keeps one ``CaseNumberCounter`` row per day. Instead of
+    touching that row for every insert, a process reserves a whole block of
+    sequence values with a single ``UPDATE ... SET last_value = last_value + n``
+    and then serves numbers from memory until the block runs out. The row lock
+    taken by the UPDATE is the only point of contention between writers, and
+    it is held once per block rather than once per case.
+
+    A block reserved inside a transaction is only shared with later callers
+    once that transaction commits, so a rollback can never leave this process
+    holding numbers that another writer will be given again.
+
+    Numbers are unique but not gap-free: a block that is only partly used when
+    the process exits (or whose reserving transaction rolls back) leaves a gap.
+    """
+
+    def __init__(self, block_size=50):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # (alias, day) -> list of [next_value, last_value] ranges ready to use
+        self._blocks = {}
+
+    @staticmethod
+    def format(day, value):
+        return f"CASE{day.strftime('%Y%m%d')}{value:04d}"
+
+    def next(self, using='default'):
+        """Return a single case number."""
+        return self.allocate(1, using=using)[0]
+
+    def allocate(self, count, using='default'):
+        """
+        Return ``count`` unique case numbers for today.
+
+        Used by ``Case.save()`` for single inserts and by
+        ``CaseQuerySet.bulk_create()`` to number a whole batch at once.
+        """
+        day = timezone.now().date()
+        key = (using, day)
+        values = []
+        with self._lock:
+            # Blocks for previous days can never be used again.
+            for stale in [k for k in self._blocks if k[0] == using and k[1] != day]:
+                del self._blocks[stale]
+            ranges = self._blocks.setdefault(key, [])
+            while ranges and len(values) < count:
+                values.extend(self._take(ranges[0], count - len(values)))
+                if ranges[0][0] > ranges[0][1]:
+                    ranges.pop(0)
+
+        if len(values) < count:
+            # Reserve enough for the rest of the request in one go.
+            size = max(self.block_size, count - len(values))
+            in_transaction = connections[using].in_atomic_block
+            end = self._reserve(day, size, using)
+            block = [end - size + 1, end]
+            values.extend(self._take(block, count - len(values)))
+            if block[0] <= block[1]:
+                if in_transaction:
+                    transaction.on_commit(lambda: self._publish(key, block), using=using)
+                else:
+                    self._publish(key, block)
+        return [self.format(day, value) for value in values]
+
+    def reset(self):
+        """Forget every reserved block held by this process."""
+        with self._lock:
+            self._blocks.clear()
+
+    @staticmethod
+    def _take(block, count):
+        take = min(count, block[1] - block[0] + 1)
+        values = range(block[0], block[0] + take)
+        block[0] += take
+        return values
+
+    def _publish(self, key, block):
+        with self._lock:
+            if key[1] == timezone.now().date():
+                self._blocks.setdefault(key, []).append(block)
+
+    def _reserve(self, day, size, using):
+        """Advance the counter for ``day`` by ``size`` and return its new value."""
+        from e_health.models import CaseNumberCounter
+
+        counters = CaseNumberCounter.objects.using(using)
+        with transaction.atomic(using=using):
+            counters.get_or_create(day=day)
+            # The UPDATE row lock serialises concurrent reservations; the read
+            # below sees our own increment because it runs in the same transaction.
+            counters.filter(day=day).update(last_value=F('last_value') + size)
+            return counters.filter(day=day).values_list('last_value', flat=True).get()
+
+
+case_numbers = CaseNumberAllocator()
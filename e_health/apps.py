@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class EHealthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'e_health'
+
+    def ready(self):
+        from core import db_pool
+        from e_health import cache, stats
+        from e_health.fields import register_sqlite_functions
+
+        connection_created.connect(register_sqlite_functions, dispatch_uid='e_health_sqlite_functions')
+        # Before stats: the cache hooks read _loaded_values, which the stats hooks refresh after a save.
+        cache.connect_signals()
+        db_pool.connect_signals()
+        stats.connect_signals()
@@ -0,0 +1,184 @@
+"""
+Async read endpoints, served without a worker thread per request by the ASGI
+app (``core.asgi``).
+
+``/api/async/patients/?q=helene`` and ``/api/async/appointments/`` return the
+first ``limit`` rows, the number of matches and facet counts::
+
+    {"count": 1234, "facets": {"status": {"SCHEDULED": 800, ...}}, "results": [...]}
+
+The three queries are awaited one after another. Django runs async ORM calls
+on the request's database thread over one connection, so starting them
+together would not overlap them; the gain is that no thread waits on a
+request while its queries run, and the event loop serves other requests
+meanwhile. The page is read with ``async for`` over the queryset and the
+facets with ``aiterator()``. Rows are shaped by the list serializers'
+``FieldPlan``, as in the synchronous API.
+
+``/api/async/patients/<uuid>/`` and ``/api/async/appointments/<uuid>/`` load
+one object with ``aget()`` and render it with the synchronous API's detail
+serializers, clinical fields included only for users with
+``e_health.view_clinical_data``.
+
+As in the synchronous API, every view needs a logged-in user with the
+model's ``view`` permission: anonymous requests get 401, others without the
+permission 403.
+"""
+from functools import wraps
+from uuid import UUID
+
+from django.db.models import Count
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+
+from e_health.models import Appointment, Patient
+from e_health.renderers import FastJSONRenderer
+from e_health.search import search_condition
+from e_health.serializers import (
+    CLINICAL_PERMISSION, AppointmentDetailSerializer, AppointmentSerializer, FieldPlan, PatientDetailSerializer,
+    PatientSerializer,
+)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class InvalidParameter(ValueError):
+    pass
+
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def view_permission_required(model):
+    """Refuse requests unless the user is logged in and may view ``model``."""
+    perm = f'{model._meta.app_label}.view_{model._meta.model_name}'
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+            if not await user.ahas_perm(perm):
+                return _json({'detail': 'You do not have permission to perform this action.'}, status=403)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _limit(params):
+    try:
+        return max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        raise InvalidParameter('limit must be an integer.') from None
+
+
+def _uuid(params, name):
+    try:
+        return UUID(params[name])
+    except ValueError:
+        raise InvalidParameter(f'{name} must be a UUID.') from None
+
+
+def _date(params, name):
+    try:
+        value = parse_date(params[name])
+    except ValueError:
+        value = None
+    if value is None:
+        raise InvalidParameter(f'{name} must be a date (YYYY-MM-DD).')
+    return value
+
+
+def _choice(params, name, choices):
+    value = params[name]
+    if value not in dict(choices):
+        raise InvalidParameter(f"{name} must be one of {', '.join(dict(choices))}.")
+    return value
+
+
+async def _rows(queryset):
+    # Not values_list().aiterator(): in Django 5.2 that executes the query on
+    # the event loop thread and raises SynchronousOnlyOperation. Iterating the
+    # queryset fetches the (bounded) page in one hop to the database thread.
+    return [row async for row in queryset]
+
+
+async def _facet(queryset, field):
+    counts = queryset.order_by().values(field).annotate(count=Count('pk'))
+    return {row[field]: row['count'] async for row in counts.aiterator()}
+
+
+async def listing(queryset, serializer_class, facet, limit=DEFAULT_LIMIT):
+    """``{"count", "facets", "results"}`` for ``queryset``."""
+    plan = FieldPlan.for_serializer(serializer_class)
+    ordering = [*queryset.model._meta.ordering, 'pk']
+    rows = await _rows(plan.values_list(queryset.order_by(*ordering))[:limit])
+    count = await queryset.acount()
+    facets = await _facet(queryset, facet)
+    return {'count': count, 'facets': {facet: facets}, 'results': plan.rows(rows)}
+
+
+@require_GET
+@view_permission_required(Patient)
+async def patient_list(request):
+    """Patients matching ``q`` (every word in a name or the email), optionally of one ``gender``."""
+    params = request.GET
+    try:
+        queryset = Patient.objects.all()
+        if params.get('q', '').strip():
+            queryset = queryset.filter(search_condition(params['q']))
+        if params.get('gender'):
+            queryset = queryset.filter(gender=_choice(params, 'gender', Patient.GENDER_CHOICES))
+        limit = _limit(params)
+    except InvalidParameter as exc:
+        return _json({'detail': str(exc)}, status=400)
+    return _json(await listing(queryset, PatientSerializer, 'gender', limit))
+
+
+@require_GET
+@view_permission_required(Appointment)
+async def appointment_list(request):
+    """Appointments filtered by ``patient``, ``doctor``, ``status``, ``date_from`` and ``date_to``."""
+    params = request.GET
+    try:
+        queryset = Appointment.objects.all()
+        if params.get('patient'):
+            queryset = queryset.filter(patient_id=_uuid(params, 'patient'))
+        if params.get('doctor'):
+            queryset = queryset.filter(doctor_id=_uuid(params, 'doctor'))
+        if params.get('status'):
+            queryset = queryset.filter(status=_choice(params, 'status', Appointment.STATUS_CHOICES))
+        if params.get('date_from'):
+            queryset = queryset.filter(appointment_date__gte=_date(params, 'date_from'))
+        if params.get('date_to'):
+            queryset = queryset.filter(appointment_date__lte=_date(params, 'date_to'))
+        limit = _limit(params)
+    except InvalidParameter as exc:
+        return _json({'detail': str(exc)}, status=400)
+    return _json(await listing(queryset, AppointmentSerializer, 'status', limit))
+
+
+async def _detail(request, model, serializer_class, pk):
+    try:
+        instance = await model.objects.aget(pk=pk)
+    except model.DoesNotExist:
+        return _json({'detail': 'No %s matches the given query.' % model._meta.object_name}, status=404)
+    # Checked here: the serializer's own check would query from the event loop.
+    clinical = await (await request.auser()).ahas_perm(CLINICAL_PERMISSION)
+    return _json(serializer_class(instance, context={'clinical': clinical}).data)
+
+
+@require_GET
+@view_permission_required(Patient)
+async def patient_detail(request, pk):
+    return await _detail(request, Patient, PatientDetailSerializer, pk)
+
+
+@require_GET
+@view_permission_required(Appointment)
+async def appointment_detail(request, pk):
+    return await _detail(request, Appointment, AppointmentDetailSerializer, pk)
@@ -0,0 +1,106 @@
+"""
+Small helpers shared by the benchmark commands.
+
+Benchmarks are registered with ``@benchmark(name, group)`` and run by the
+``bench`` command. A benchmark is a function that executes one query shape
+and returns the number of rows it produced.
+"""
+import math
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    func: object
+    description: str = ''
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, group):
+    """Register ``func`` as a benchmark called ``name`` in ``group``."""
+    def decorator(func):
+        BENCHMARKS[name] = Benchmark(name, group, func, (func.__doc__ or '').strip())
+        return func
+    return decorator
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies):
+    """Latency statistics in milliseconds for a list of durations in seconds."""
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'mean_ms': round(sum(values) / len(values), 3) if values else 0.0,
+        'min_ms': round(values[0], 3) if values else 0.0,
+        'max_ms': round(values[-1], 3) if values else 0.0,
+    }
+
+
+def measure(func, iterations=50, warmup=3):
+    """
+    Run ``func`` repeatedly and return its latency summary.
+
+    Queries are counted on the last measured iteration only, so the capture
+    overhead does not show up in the latencies. They are counted on every
+    database alias: reads may be routed to a replica.
+    """
+    for _ in range(warmup):
+        func()
+    latencies = []
+    rows = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        rows = func()
+        latencies.append(time.perf_counter() - started)
+    with ExitStack() as stack:
+        # Mirrors in tests may share one connection object.
+        unique = {id(connections[alias]): connections[alias] for alias in connections}.values()
+        captures = [stack.enter_context(CaptureQueriesContext(connection)) for connection in unique]
+        func()
+    elapsed = sum(latencies)
+    return {
+        **summarize(latencies), 'iterations': iterations, 'queries': sum(len(capture) for capture in captures),
+        'rows': rows,
+        'rows_per_sec': round(rows * iterations / elapsed) if elapsed else 0,
+    }
+
+
+def session_cookie(username=None):
+    """
+    A ``Cookie`` header value logging the API benchmarks in as ``username``
+    (default: the first active superuser); raises ``CommandError`` if there is
+    no such user.
+    """
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management.base import CommandError
+    from django.test import Client
+
+    users = get_user_model().objects.filter(is_active=True)
+    user = (users.filter(username=username) if username else users.filter(is_superuser=True).order_by('pk')).first()
+    if user is None:
+        raise CommandError(
+            f'No active user {username!r}.' if username
+            else 'The API needs a logged-in user: create a superuser or pass --user.'
+        )
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
@@ -0,0 +1,422 @@
+"""
+Query shapes from the ``aggregate``, ``search`` and ``query_expressions``
+commands, plus the API list serialization paths, registered for the
+``bench`` command.
+
+Each benchmark mirrors the query (and any per-row relation access) of the
+command it comes from, and returns the number of rows it produced. Date
+ranges are relative to today so they hit data made by ``generate_data``.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Avg, Case as CaseWhen, Count, DecimalField, Exists, ExpressionWrapper, F, FloatField,
+    IntegerField, Max, Min, OuterRef, Q, Subquery, Sum, Value, When, Window,
+)
+
+from rest_framework.renderers import JSONRenderer
+
+from e_health.benchmarking import benchmark
+from e_health.billing import bill_case, recompute_case_billing
+from e_health.fields import CommaSeparatedCharField, pack_int_list
+from e_health.models import Appointment, Case, Doctor, Patient
+from e_health.pagination import encode_cursor, keyset_paginate
+from e_health.renderers import FastJSONRenderer
+from e_health.serializers import AppointmentSerializer, CaseSerializer, FieldPlan, PatientSerializer
+from e_health.scheduling import find_free_slots
+from e_health.search import search_patients
+from e_health.stats import APPOINTMENT_COLUMNS, CASE_COLUMNS, REVENUE_STATUS, doctor_dashboard
+
+
+# ---------------------------------------------------------------- aggregate
+
+@benchmark('aggregate.patients_by_last_name', 'aggregate')
+def patients_by_last_name():
+    """Exact match on last_name."""
+    return len([(p.first_name, p.last_name) for p in Patient.objects.filter(last_name='Smith')])
+
+
+@benchmark('aggregate.patient_count', 'aggregate')
+def patient_count():
+    """Patient.objects.count()."""
+    Patient.objects.count()
+    return 1
+
+
+@benchmark('aggregate.doctor_fee_stats', 'aggregate')
+def doctor_fee_stats():
+    """Avg/Max/Min consultation_fee over all doctors."""
+    Doctor.objects.aggregate(
+        average_fee=Avg('consultation_fee', default=10, output_field=FloatField()),
+        max_fee=Max('consultation_fee', default=100, output_field=FloatField()),
+        min_fee=Min('consultation_fee', default=5, output_field=FloatField()),
+    )
+    return 1
+
+
+@benchmark('aggregate.patient_case_counts', 'aggregate')
+def patient_case_counts():
+    """annotate(Count('cases')) then values(): one row per patient."""
+    return len(list(Patient.objects.annotate(num_cases=Count('cases')).values('first_name', 'num_cases')))
+
+
+@benchmark('aggregate.first_name_case_counts', 'aggregate')
+def first_name_case_counts():
+    """values('first_name').annotate(Count('cases')): one row per first name."""
+    return len(list(Patient.objects.values('first_name').annotate(num_cases=Count('cases'))))
+
+
+@benchmark('aggregate.patients_aged_40_60_python', 'aggregate')
+def patients_aged_40_60_python():
+    """Count patients aged 40-60 by loading every row and reading Patient.age."""
+    return sum(1 for p in Patient.objects.all() if 40 <= p.age <= 60)
+
+
+@benchmark('aggregate.patients_aged_40_60_indexed', 'aggregate')
+def patients_aged_40_60_indexed():
+    """The same count with age_between(40, 60), a date_of_birth index range."""
+    return Patient.objects.age_between(40, 60).count()
+
+
+@benchmark('aggregate.patient_age_histogram', 'aggregate')
+def patient_age_histogram():
+    """with_age() grouped by age in the database."""
+    return len(list(Patient.objects.with_age().order_by().values('age').annotate(n=Count('pk'))))
+
+
+@benchmark('aggregate.high_priority_cases', 'aggregate')
+def high_priority_cases():
+    """Q(priority__gte=4) | Q(severity='SEVERE'), printed with Case.__str__."""
+    return len([str(c) for c in Case.objects.for_listing().filter(Q(priority__gte=4) | Q(severity='SEVERE'))])
+
+
+_dashboard_doctor = {}
+
+
+def _busiest_doctor():
+    """The doctor with the most appointments, looked up once."""
+    if 'id' not in _dashboard_doctor:
+        busiest = Appointment.objects.order_by().values('doctor_id').annotate(n=Count('pk')).order_by('-n')[0]
+        _dashboard_doctor['id'] = busiest['doctor_id']
+    return _dashboard_doctor['id']
+
+
+@benchmark('aggregate.doctor_dashboard_scan', 'aggregate')
+def doctor_dashboard_scan():
+    """Per-status case/appointment counts and revenue for one doctor, aggregated from the tables."""
+    doctor_id = _busiest_doctor()
+    Case.objects.filter(primary_doctor_id=doctor_id).aggregate(
+        **{column: Count('pk', filter=Q(status=status)) for status, column in CASE_COLUMNS.items()}
+    )
+    Appointment.objects.filter(doctor_id=doctor_id).aggregate(
+        **{column: Count('pk', filter=Q(status=status)) for status, column in APPOINTMENT_COLUMNS.items()},
+        revenue=Sum('actual_cost', filter=Q(status=REVENUE_STATUS)),
+    )
+    return 1
+
+
+@benchmark('aggregate.doctor_dashboard_stats', 'aggregate')
+def doctor_dashboard_stats():
+    """The same dashboard read from DoctorStats by primary key."""
+    doctor_dashboard(_busiest_doctor())
+    return 1
+
+
+# ------------------------------------------------------------------- search
+
+@benchmark('search.first_name_contains', 'search')
+def first_name_contains():
+    """Case-sensitive first_name__contains."""
+    return len([p.first_name for p in Patient.objects.filter(first_name__contains='John')])
+
+
+@benchmark('search.first_name_icontains', 'search')
+def first_name_icontains():
+    """Case-insensitive first_name__icontains."""
+    return len([p.first_name for p in Patient.objects.filter(first_name__icontains='john')])
+
+
+@benchmark('search.patient_name_icontains_all_fields', 'search')
+def patient_name_icontains_all_fields():
+    """Unindexed icontains over first/middle/last name and email (misses accents)."""
+    return len(list(Patient.objects.filter(
+        Q(first_name__icontains='helene') | Q(middle_name__icontains='helene')
+        | Q(last_name__icontains='helene') | Q(email__icontains='helene')
+    )[:20]))
+
+
+@benchmark('search.patient_name_ranked', 'search')
+def patient_name_ranked():
+    """search_patients(): trigram GIN (PostgreSQL) or FTS5 (SQLite), ranked."""
+    return len(search_patients('helene'))
+
+
+@benchmark('search.doctor_specialization_icontains', 'search')
+def doctor_specialization_icontains():
+    """specialization__icontains, reading d.user for every doctor."""
+    return len([
+        (d.user.first_name, d.user.last_name, d.specialization)
+        for d in Doctor.objects.for_listing().filter(specialization__icontains='cardio')
+    ])
+
+
+@benchmark('search.appointment_date_range', 'search')
+def appointment_date_range():
+    """Appointments in the last 30 days, reading a.patient for every row."""
+    today = date.today()
+    appointments = Appointment.objects.for_listing().filter(
+        appointment_date__range=(today - timedelta(days=30), today),
+    )
+    return len([(a.patient.first_name, a.appointment_date) for a in appointments])
+
+
+@benchmark('search.overpriced_appointments', 'search')
+def overpriced_appointments():
+    """ExpressionWrapper(actual_cost - estimated_cost) > 1000."""
+    return len(list(Appointment.objects.annotate(
+        is_over_priced=ExpressionWrapper(F('actual_cost') - F('estimated_cost'), output_field=DecimalField())
+    ).filter(is_over_priced__gt=1000)))
+
+
+@benchmark('search.doctors_with_appointments', 'search')
+def doctors_with_appointments():
+    """Exists() subquery per doctor, reading doctor.user for every row."""
+    doctors = Doctor.objects.for_listing().annotate(
+        has_appointments=Exists(Appointment.objects.filter(doctor=OuterRef('pk')))
+    )
+    return len([(d.user.first_name, d.has_appointments) for d in doctors])
+
+
+@benchmark('search.patients_going_on_day', 'search')
+def patients_going_on_day():
+    """patient_id__in=Subquery(appointments on one day)."""
+    on_day = Appointment.objects.filter(appointment_date=date.today() - timedelta(days=7))
+    return len(list(Appointment.objects.filter(patient_id__in=Subquery(on_day.values('patient_id')))))
+
+
+@benchmark('search.special_patients', 'search')
+def special_patients():
+    """Case/When annotation used as a filter."""
+    return len(list(Patient.objects.annotate(
+        is_special=CaseWhen(
+            When(Q(first_name__startswith='John') | Q(last_name__startswith='M'), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).exclude(gender='F').filter(is_special=1)))
+
+
+@benchmark('search.appointment_type_counts', 'search')
+def appointment_type_counts():
+    """Count(filter=Q(...)) conditional aggregation."""
+    Appointment.objects.aggregate(
+        CONSULTATION=Count('pk', filter=Q(appointment_type='CONSULTATION')),
+        All=Count('pk', filter=~Q(appointment_type__isnull=True)),
+    )
+    return 1
+
+
+# --------------------------------------------------------------- scheduling
+
+@benchmark('scheduling.free_slots_week', 'scheduling')
+def free_slots_week():
+    """Free 30 minute slots for the next 7 days for up to 500 doctors."""
+    doctors = list(Doctor.objects.order_by().values_list('pk', flat=True)[:500])
+    start = date.today()
+    slots = find_free_slots(doctors, start, start + timedelta(days=6))
+    return sum(len(doctor_slots) for doctor_slots in slots.values())
+
+
+@benchmark('scheduling.upcoming_python', 'scheduling')
+def upcoming_python():
+    """Scheduled/confirmed upcoming appointments found by loading all rows and reading is_upcoming."""
+    return sum(
+        1 for a in Appointment.objects.filter(status__in=('SCHEDULED', 'CONFIRMED')) if a.is_upcoming
+    )
+
+
+@benchmark('scheduling.upcoming_sql', 'scheduling')
+def upcoming_sql():
+    """The same count with Appointment.objects.upcoming()."""
+    return Appointment.objects.upcoming().count()
+
+
+@benchmark('scheduling.due_within_24h', 'scheduling')
+def due_within_24h():
+    """Appointments due in the next 24 hours, as a reminder job polls them."""
+    return len(list(Appointment.objects.due_within(timedelta(hours=24))))
+
+
+# --------------------------------------------------------------- pagination
+
+PAGE_SIZE = 50
+_deep_cursor = {}
+_deep_offsets = {}
+
+
+def _deep_offset():
+    """Offset of a page 90% of the way through the appointments (counted once)."""
+    if 'appointments' not in _deep_offsets:
+        _deep_offsets['appointments'] = Appointment.objects.count() * 9 // 10
+    return _deep_offsets['appointments']
+
+
+@benchmark('pagination.appointments_offset_deep', 'pagination')
+def appointments_offset_deep():
+    """OFFSET/LIMIT page 90% of the way through the appointments (the offset is counted once)."""
+    offset = _deep_offset()
+    return len(list(Appointment.objects.order_by('appointment_date', 'appointment_time', 'uuid')[offset:offset + PAGE_SIZE]))
+
+
+@benchmark('pagination.appointments_keyset_deep', 'pagination')
+def appointments_keyset_deep():
+    """keyset_paginate() page at the same depth (the cursor is looked up once)."""
+    if 'appointments' not in _deep_cursor:
+        row = Appointment.objects.order_by('appointment_date', 'appointment_time', 'uuid').values_list(
+            'appointment_date', 'appointment_time', 'uuid')[_deep_offset()]
+        _deep_cursor['appointments'] = encode_cursor(list(row))
+    return len(keyset_paginate(Appointment.objects.all(), _deep_cursor['appointments'], PAGE_SIZE).object_list)
+
+
+# ---------------------------------------------------------------------- api
+
+API_ROWS = 1000
+
+
+def _model_serializer_path(serializer_class, queryset):
+    data = serializer_class(queryset[:API_ROWS], many=True).data
+    JSONRenderer().render(data)
+    return len(data)
+
+
+def _field_plan_path(serializer_class, queryset):
+    plan = FieldPlan.for_serializer(serializer_class)
+    data = plan.rows(plan.values_list(queryset[:API_ROWS]))
+    FastJSONRenderer().render(data)
+    return len(data)
+
+
+@benchmark('api.patients_model_serializer', 'api')
+def patients_model_serializer():
+    """1,000 patients through PatientSerializer and JSONRenderer."""
+    return _model_serializer_path(PatientSerializer, Patient.objects.all())
+
+
+@benchmark('api.patients_field_plan', 'api')
+def patients_field_plan():
+    """1,000 patients as values_list() tuples through FieldPlan and FastJSONRenderer."""
+    return _field_plan_path(PatientSerializer, Patient.objects.all())
+
+
+@benchmark('api.cases_model_serializer', 'api')
+def cases_model_serializer():
+    """1,000 cases through CaseSerializer and JSONRenderer."""
+    return _model_serializer_path(CaseSerializer, Case.objects.all())
+
+
+@benchmark('api.cases_field_plan', 'api')
+def cases_field_plan():
+    """1,000 cases as values_list() tuples through FieldPlan and FastJSONRenderer."""
+    return _field_plan_path(CaseSerializer, Case.objects.all())
+
+
+@benchmark('api.appointments_model_serializer', 'api')
+def appointments_model_serializer():
+    """1,000 appointments through AppointmentSerializer and JSONRenderer."""
+    return _model_serializer_path(AppointmentSerializer, Appointment.objects.all())
+
+
+@benchmark('api.appointments_field_plan', 'api')
+def appointments_field_plan():
+    """1,000 appointments as values_list() tuples through FieldPlan and FastJSONRenderer."""
+    return _field_plan_path(AppointmentSerializer, Appointment.objects.all())
+
+
+# ------------------------------------------------------------------- fields
+
+DECODE_ROWS = 1_000_000
+_text_values = [','.join(str(n) for n in range(i % 7, i % 7 + 8)) for i in range(1000)]
+_binary_values = [pack_int_list(list(range(i % 7, i % 7 + 8))) for i in range(1000)]
+
+
+def _decode(storage, values, materialize=True):
+    field = CommaSeparatedCharField(storage=storage)
+    from_db_value = field.from_db_value
+    for i in range(DECODE_ROWS):
+        numbers = from_db_value(values[i % 1000], None, None)
+        if materialize:
+            len(numbers)
+    return DECODE_ROWS
+
+
+@benchmark('fields.int_list_decode_text', 'fields')
+def int_list_decode_text():
+    """Decode 1M eight-item lists stored as comma-separated text."""
+    return _decode('text', _text_values)
+
+
+@benchmark('fields.int_list_decode_binary', 'fields')
+def int_list_decode_binary():
+    """Decode 1M eight-item lists stored as packed 64-bit integers."""
+    return _decode('array', _binary_values)
+
+
+@benchmark('fields.int_list_load_untouched', 'fields')
+def int_list_load_untouched():
+    """Load 1M text-stored lists that are never read (parsing is deferred)."""
+    return _decode('text', _text_values, materialize=False)
+
+
+# -------------------------------------------------------- query_expressions
+
+@benchmark('query_expressions.fee_window', 'query_expressions')
+def fee_window():
+    """Avg/Max/Min consultation_fee as window functions per specialization."""
+    window = {'partition_by': [F('specialization')], 'order_by': 'years_of_experience'}
+    return len(list(Doctor.objects.annotate(
+        avg_fee=Window(expression=Avg('consultation_fee'), **window),
+        best_fee=Window(expression=Max('consultation_fee'), **window),
+        worst_fee=Window(expression=Min('consultation_fee'), **window),
+    ).values('uuid', 'avg_fee', 'best_fee', 'worst_fee')))
+
+
+@benchmark('query_expressions.fee_update', 'query_expressions')
+def fee_update():
+    """update(consultation_fee=F(...) + 1), rolled back after each run."""
+    with transaction.atomic():
+        rows = Doctor.objects.update(consultation_fee=F('consultation_fee') + 1)
+        transaction.set_rollback(True)
+    return rows
+
+
+# ------------------------------------------------------------------ billing
+
+BILLING_CASES = 1000
+_billing_bound = {}
+
+
+def _billing_cases():
+    """The first BILLING_CASES cases by primary key (the boundary is looked up once)."""
+    if 'pk' not in _billing_bound:
+        keys = Case.objects.order_by('pk').values_list('pk', flat=True)
+        _billing_bound['pk'] = keys[BILLING_CASES - 1:BILLING_CASES].first() or keys.last()
+    return Case.objects.filter(pk__lte=_billing_bound['pk'])
+
+
+@benchmark('billing.recompute_save_loop', 'billing')
+def billing_save_loop():
+    """bill_case() and save() per case, rolled back after each run."""
+    with transaction.atomic():
+        cases = [bill_case(case) for case in _billing_cases()]
+        transaction.set_rollback(True)
+    return len(cases)
+
+
+@benchmark('billing.recompute_set_based', 'billing')
+def billing_set_based():
+    """recompute_case_billing() over the same cases, rolled back after each run."""
+    with transaction.atomic():
+        run = recompute_case_billing(_billing_cases(), chunk_size=BILLING_CASES)
+        transaction.set_rollback(True)
+    return run.cases
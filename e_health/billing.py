@@ -0,0 +1,114 @@
+"""
+Case billing.
+
+A case's ``actual_cost`` is the sum of its completed appointments'
+``actual_cost``; ``insurance_coverage`` is each appointment's cost times its
+treatment's ``insurance_coverage_percentage`` (none without a treatment),
+summed and rounded to cents; ``patient_liability`` is the remainder.
+
+``recompute_case_billing()`` rewrites these columns set-based: one
+``UPDATE case SET ... = (SELECT SUM(...) FROM appointment ...)`` per chunk
+of consecutive primary keys, touching only the cases whose totals changed.
+Each chunk runs in its own ``atomic()`` block, so a long run commits as it
+goes, and when called inside a transaction each chunk is a savepoint that
+rolls back on its own.
+
+``bill_case()`` is the same rule for one case in Python.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now, Round
+
+from e_health.models import Appointment, Case
+
+BILLABLE_STATUS = 'COMPLETED'
+CENT = Decimal('0.01')
+
+_money = DecimalField(max_digits=10, decimal_places=2)
+
+
+class BillingRun(NamedTuple):
+    chunks: int
+    cases: int
+    updated: int
+
+
+def _billable(using):
+    return Appointment.objects.using(using).filter(case=OuterRef('pk'), status=BILLABLE_STATUS).order_by().values('case')
+
+
+def _total(using, expression):
+    subquery = Subquery(_billable(using).annotate(total=Sum(expression)).values('total'), output_field=_money)
+    return Coalesce(subquery, Value(Decimal('0.00')), output_field=_money)
+
+
+def billing_expressions(using='default'):
+    """``{column: expression}`` computing each billing column of a ``Case`` row."""
+    actual_cost = _total(using, F('actual_cost'))
+    # Multiply by 0.01 rather than divide by 100: SQLite turns whole NUMERIC
+    # products into integers and would then divide them as integers.
+    percentage = Coalesce('treatment__insurance_coverage_percentage', Value(Decimal('0')), output_field=_money)
+    coverage = _total(using, ExpressionWrapper(F('actual_cost') * percentage * Value(CENT), output_field=_money))
+    coverage = Round(coverage, 2, output_field=_money)
+    return {
+        'actual_cost': actual_cost,
+        'insurance_coverage': coverage,
+        'patient_liability': ExpressionWrapper(actual_cost - coverage, output_field=_money),
+    }
+
+
+def _chunk_bounds(queryset, chunk_size):
+    """Yield ``(lower, upper)`` primary keys (exclusive, inclusive) covering ``queryset`` in order."""
+    keys = queryset.order_by('pk').values_list('pk', flat=True)
+    lower = None
+    while True:
+        remaining = keys if lower is None else keys.filter(pk__gt=lower)
+        upper = remaining[chunk_size - 1:chunk_size].first()
+        yield lower, upper
+        if upper is None:
+            return
+        lower = upper
+
+
+def recompute_case_billing(queryset=None, chunk_size=5000, using='default', on_chunk=None):
+    """
+    Recompute the billing columns of ``queryset`` (default: every case) in
+    chunks of ``chunk_size`` cases. Returns a ``BillingRun``.
+    """
+    queryset = (queryset if queryset is not None else Case.objects.all()).using(using)
+    expressions = billing_expressions(using)
+    unchanged = Q(**{column: expression for column, expression in expressions.items()})
+    run = BillingRun(0, 0, 0)
+    for lower, upper in _chunk_bounds(queryset, chunk_size):
+        chunk = queryset.order_by()
+        if lower is not None:
+            chunk = chunk.filter(pk__gt=lower)
+        if upper is not None:
+            chunk = chunk.filter(pk__lte=upper)
+        with transaction.atomic(using=using):
+            cases = chunk.count()
+            updated = chunk.exclude(unchanged).update(**expressions, updated_at=Now())
+        run = BillingRun(run.chunks + 1, run.cases + cases, run.updated + updated)
+        if on_chunk:
+            on_chunk(run)
+    return run
+
+
+def bill_case(case, save=True):
+    """Recompute one case's billing columns in Python (one query, plus the save)."""
+    rows = case.appointments.filter(status=BILLABLE_STATUS).values_list(
+        'actual_cost', 'treatment__insurance_coverage_percentage',
+    )
+    actual_cost = coverage = Decimal('0.00')
+    for cost, percentage in rows:
+        actual_cost += cost
+        coverage += cost * (percentage or 0) / 100
+    case.actual_cost = actual_cost
+    case.insurance_coverage = coverage.quantize(CENT, rounding=ROUND_HALF_UP)
+    case.patient_liability = case.actual_cost - case.insurance_coverage
+    if save:
+        case.save(update_fields=['actual_cost', 'insurance_coverage', 'patient_liability', 'updated_at'])
+    return case
@@ -0,0 +1,222 @@
+"""
+Version-keyed caching for the e_health read paths.
+
+Every cached model has a generation counter. Cache keys embed the current
+generation of each model the cached value depends on, and ``post_save`` /
+``post_delete`` bump the counter, so invalidating a model is a single
+``incr`` and stale entries are simply never read again (they expire with
+their timeout). No key scans, no delete patterns.
+
+A value that depends on one object's data only (one patient's timeline) can
+depend on a scoped generation, ``(Patient, patient_id)``, instead; writes
+bump the scopes listed in ``SCOPED_DEPENDENTS``, so they leave the values of
+other patients alone. Saves of a model listed in ``WATCHED_FIELDS`` bump
+only when one of those fields changes: a login rewrites ``User.last_login``,
+which no doctor listing shows.
+
+Two cache aliases are used (see ``CACHES`` in ``core/settings.py``):
+
+* ``GENERATION_CACHE`` (a SQLite file, ``core.cache_backends``) holds the
+  counters, so every worker process on the host sees a bump immediately;
+* ``RESPONSE_CACHE`` (local memory) holds the cached values themselves.
+
+Bulk writes that skip signals (``QuerySet.update()``, ``bulk_create()``,
+raw SQL) must call ``invalidate(model)`` (or ``invalidate(model, scope)``)
+themselves.
+"""
+import hashlib
+import threading
+import time
+from functools import partial
+
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+GENERATION_CACHE = 'generations'
+RESPONSE_CACHE = 'default'
+DEFAULT_TIMEOUT = 300
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Hit, miss and invalidation counts of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _generation_key(model, scope=None):
+    key = f'e_health:gen:{_label(model)}'
+    return key if scope is None else f'{key}:{scope}'
+
+
+def generation(model, scope=None):
+    generations = caches[GENERATION_CACHE]
+    key = _generation_key(model, scope)
+    value = generations.get(key)
+    if value is None:
+        # Start from the clock rather than 0 so a lost counter can never
+        # line up with keys written under an earlier generation.
+        generations.add(key, time.time_ns(), timeout=None)
+        value = generations.get(key)
+    return value
+
+
+def _incr(model, scope=None):
+    generations = caches[GENERATION_CACHE]
+    key = _generation_key(model, scope)
+    try:
+        generations.incr(key)
+    except ValueError:
+        generations.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate(model, scope=None):
+    """Make every cached value depending on ``model`` (or on its ``scope`` generation) unreachable."""
+    _incr(model, scope)
+    _count('invalidations')
+
+
+def _version(dependency):
+    model, scope = dependency if isinstance(dependency, tuple) else (dependency, None)
+    label = _label(model) if scope is None else f'{_label(model)}[{scope}]'
+    return f'{label}:{generation(model, scope)}'
+
+
+def make_key(name, models, *parts):
+    """
+    A cache key for ``name`` and ``parts`` under the current generations of
+    ``models``: models, or ``(model, scope)`` pairs for scoped generations.
+    """
+    versions = '.'.join(_version(dependency) for dependency in models)
+    digest = hashlib.sha1('\x00'.join(map(str, parts)).encode()).hexdigest()
+    return f'e_health:{name}:{digest}:{hashlib.sha1(versions.encode()).hexdigest()}'
+
+
+_MISSING = object()
+
+
+def cached(name, models, compute, *parts, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached result of ``compute()`` for ``name``/``parts``,
+    computing and storing it on a miss. ``models`` lists every model the
+    result reads from.
+    """
+    cache = caches[RESPONSE_CACHE]
+    key = make_key(name, models, *parts)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+    _count('misses')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def clear():
+    """Drop every cached value and reset the counters (used by tests)."""
+    caches[RESPONSE_CACHE].clear()
+    caches[GENERATION_CACHE].clear()
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+# model -> models whose generation it bumps when written
+DEPENDENTS = {}
+# model -> (model, attname) pairs: a write bumps the generation of ``model``
+# scoped to the written row's ``attname`` value (before and after the write).
+SCOPED_DEPENDENTS = {}
+# model -> the fields its DEPENDENTS show; saves that change none of them
+# (a user's last_login, say) bump nothing. Deletes always bump.
+WATCHED_FIELDS = {}
+
+
+def _watched_values(instance, fields):
+    # __dict__, not getattr(): a deferred field must not cost a query.
+    return tuple(instance.__dict__.get(name) for name in sorted(fields))
+
+
+def _remember_watched(sender, instance, **kwargs):
+    instance._watched_values = _watched_values(instance, WATCHED_FIELDS[sender])
+
+
+def _watched_changed(sender, instance, kwargs):
+    fields = WATCHED_FIELDS.get(sender)
+    if fields is None or instance is None or 'created' not in kwargs:
+        return True
+    update_fields = kwargs.get('update_fields')
+    current = _watched_values(instance, fields)
+    loaded, instance._watched_values = getattr(instance, '_watched_values', None), current
+    if update_fields is not None:
+        return not fields.isdisjoint(update_fields)
+    return loaded != current
+
+
+def _scopes(sender, instance):
+    loaded = getattr(instance, '_loaded_values', {})
+    for model, attname in SCOPED_DEPENDENTS.get(sender, ()):
+        values = {getattr(instance, attname), loaded.get(attname)}
+        values.discard(None)
+        for value in values:
+            yield model, value
+
+
+def _bump(sender, instance=None, using=None, **kwargs):
+    in_transaction = connections[using or 'default'].in_atomic_block
+    targets = []
+    if _watched_changed(sender, instance, kwargs):
+        targets.extend((model, None) for model in DEPENDENTS.get(sender, ()))
+    if instance is not None:
+        targets.extend(_scopes(sender, instance))
+    if targets:
+        # One invalidation per write, however many generations it bumps.
+        _count('invalidations')
+    for model, scope in targets:
+        _incr(model, scope)
+        if in_transaction:
+            # A reader may cache the pre-commit data under the new generation
+            # before we commit; bump again once the write is visible.
+            transaction.on_commit(partial(_incr, model, scope), using=using)
+
+
+def connect_signals():
+    """Called from ``EHealthConfig.ready()``."""
+    from django.contrib.auth.models import User
+
+    from e_health.models import Appointment, Case, Doctor, Patient, Treatment
+
+    DEPENDENTS.update({
+        Patient: (Patient,),
+        Treatment: (Treatment,),
+        Doctor: (Doctor,),
+        # Doctor listings show the user's name.
+        User: (Doctor,),
+    })
+    WATCHED_FIELDS.update({
+        User: frozenset({'first_name', 'last_name'}),
+    })
+    # A patient's timeline (e_health.timeline) shows their cases and appointments.
+    SCOPED_DEPENDENTS.update({
+        Patient: ((Patient, 'pk'),),
+        Case: ((Patient, 'patient_id'),),
+        Appointment: ((Patient, 'patient_id'),),
+    })
+    for sender in {*DEPENDENTS, *SCOPED_DEPENDENTS}:
+        uid = f'e_health_cache_{_label(sender)}'
+        post_save.connect(_bump, sender=sender, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_bump, sender=sender, dispatch_uid=f'{uid}_delete')
+    for sender in WATCHED_FIELDS:
+        post_init.connect(_remember_watched, sender=sender, dispatch_uid=f'e_health_cache_{_label(sender)}_init')
@@ -0,0 +1,198 @@
+"""
+Streaming CSV and NDJSON export of cases and appointments.
+
+``export_chunks('appointments', 'csv', date_from=..., statuses=[...])``
+returns a generator of text chunks: the header line straight away, then
+batches of encoded rows as they are read. Rows are ``values_list()`` tuples
+with the patient and doctor names joined in the same query, read through
+``.iterator(chunk_size=...)`` (a server-side cursor on PostgreSQL, chunked
+``fetchmany()`` elsewhere) and never collected, so memory stays flat
+whatever the number of rows.
+
+The ``export_records`` command writes an export to a file or stdout;
+``/api/export/<kind>.<format>`` streams one in a ``StreamingHttpResponse``.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+from django.db import models, router
+from django.utils import timezone
+
+from e_health.models import Appointment, Case
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+CHUNK_SIZE = 2000
+# Rows encoded into one chunk of output.
+BATCH_ROWS = 500
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+class Export(NamedTuple):
+    model: type
+    date_field: str
+    # (header, column path); a tuple of paths is joined with spaces, for names.
+    columns: tuple
+
+
+_PATIENT_NAME = ('patient__first_name', 'patient__last_name')
+
+EXPORTS = {
+    'cases': Export(Case, 'created_at', (
+        ('uuid', 'uuid'),
+        ('case_number', 'case_number'),
+        ('created_at', 'created_at'),
+        ('status', 'status'),
+        ('priority', 'priority'),
+        ('severity', 'severity'),
+        ('patient', 'patient_id'),
+        ('patient_name', _PATIENT_NAME),
+        ('primary_doctor_name', ('primary_doctor__user__first_name', 'primary_doctor__user__last_name')),
+        ('referring_doctor_name', ('referring_doctor__user__first_name', 'referring_doctor__user__last_name')),
+        ('chief_complaint', 'chief_complaint'),
+        ('estimated_cost', 'estimated_cost'),
+        ('actual_cost', 'actual_cost'),
+        ('closed_at', 'closed_at'),
+    )),
+    'appointments': Export(Appointment, 'appointment_date', (
+        ('uuid', 'uuid'),
+        ('appointment_date', 'appointment_date'),
+        ('appointment_time', 'appointment_time'),
+        ('status', 'status'),
+        ('appointment_type', 'appointment_type'),
+        ('priority', 'priority'),
+        ('patient', 'patient_id'),
+        ('patient_name', _PATIENT_NAME),
+        ('doctor_name', ('doctor__user__first_name', 'doctor__user__last_name')),
+        ('case_number', 'case__case_number'),
+        ('treatment', 'treatment__name'),
+        ('estimated_cost', 'estimated_cost'),
+        ('actual_cost', 'actual_cost'),
+    )),
+}
+
+
+def _date_filter(model, field_name, date_from, date_to):
+    """Inclusive date bounds; on datetime columns a range of local days, so an index can serve it."""
+    condition = models.Q()
+    if isinstance(model._meta.get_field(field_name), models.DateTimeField):
+        zone = timezone.get_current_timezone()
+        if date_from:
+            condition &= models.Q(**{f'{field_name}__gte': datetime.combine(date_from, time.min, zone)})
+        if date_to:
+            condition &= models.Q(**{f'{field_name}__lt': datetime.combine(date_to + timedelta(days=1), time.min, zone)})
+        return condition
+    if date_from:
+        condition &= models.Q(**{f'{field_name}__gte': date_from})
+    if date_to:
+        condition &= models.Q(**{f'{field_name}__lte': date_to})
+    return condition
+
+
+def export_queryset(kind, date_from=None, date_to=None, statuses=(), using=None):
+    """``(export, queryset)``: the filtered rows of ``kind`` in export order, as flat tuples."""
+    try:
+        export = EXPORTS[kind]
+    except KeyError:
+        raise InvalidExport(f"Unknown export {kind!r}; choose from {', '.join(EXPORTS)}.") from None
+    model = export.model
+    known = dict(model._meta.get_field('status').choices)
+    unknown = [status for status in statuses if status not in known]
+    if unknown:
+        raise InvalidExport(f"Unknown status {', '.join(unknown)}; choose from {', '.join(known)}.")
+
+    queryset = model.objects.using(using or router.db_for_read(model))
+    queryset = queryset.filter(_date_filter(model, export.date_field, date_from, date_to))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    paths = [path for _, source in export.columns for path in ((source,) if isinstance(source, str) else source)]
+    # The model ordering plus the key matches the keyset pagination indexes.
+    return export, queryset.order_by(*model._meta.ordering, 'pk').values_list(*paths)
+
+
+def _rows(export, queryset, chunk_size):
+    """Output rows: the ``values_list()`` tuples with name parts joined."""
+    slices = []
+    offset = 0
+    for _, source in export.columns:
+        width = 1 if isinstance(source, str) else len(source)
+        slices.append((offset, width))
+        offset += width
+    if all(width == 1 for _, width in slices):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield [
+            row[start] if width == 1 else ' '.join(part for part in row[start:start + width] if part) or None
+            for start, width in slices
+        ]
+
+
+def _plain(value):
+    """Text for the values JSON and CSV have no type for (dates, times, decimals, UUIDs)."""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _batched(lines):
+    """The first line on its own, so output starts at once, then ``BATCH_ROWS`` lines per chunk."""
+    lines = iter(lines)
+    for line in lines:
+        yield line
+        break
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= BATCH_ROWS:
+            yield ''.join(batch)
+            batch.clear()
+    if batch:
+        yield ''.join(batch)
+
+
+def _csv_chunks(headers, rows):
+    class Line:
+        def write(self, line):
+            return line
+
+    writer = csv.writer(Line())
+    yield writer.writerow(headers)
+    yield from _batched(
+        writer.writerow([_plain(value) if isinstance(value, datetime) else value for value in row]) for row in rows
+    )
+
+
+def _ndjson_chunks(headers, rows):
+    if orjson is not None:
+        def dumps(record):
+            return orjson.dumps(record, default=_plain).decode()
+    else:
+        def dumps(record):
+            return json.dumps(record, default=_plain, ensure_ascii=False, separators=(',', ':'))
+
+    yield from _batched(dumps(dict(zip(headers, row))) + '\n' for row in rows)
+
+
+def export_chunks(kind, fmt, date_from=None, date_to=None, statuses=(), chunk_size=CHUNK_SIZE, using=None):
+    """
+    Text chunks of the ``kind`` export (``cases`` or ``appointments``) in
+    ``fmt`` (``csv`` or ``ndjson``). Arguments are checked, and the database
+    chosen, when this is called; rows are read as the chunks are consumed.
+    """
+    if fmt not in FORMATS:
+        raise InvalidExport(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}.")
+    export, queryset = export_queryset(kind, date_from, date_to, statuses, using)
+    headers = [header for header, _ in export.columns]
+    rows = _rows(export, queryset, chunk_size)
+    return _csv_chunks(headers, rows) if fmt == 'csv' else _ndjson_chunks(headers, rows)
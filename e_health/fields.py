@@ -1,30 +1,199 @@
-from django.db import models
-from django.utils.translation import gettext_lazy as _  
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+from array import array
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import partial
 
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import NotSupportedError, models
+from django.db.models import Index, Lookup
+from django.utils.translation import gettext_lazy as _
 
 
 class IntegerList:
-    """Stores a dynamic list of integers."""
+    """
+    Stores a dynamic list of integers.
+
+    Values live in a compact ``array('q')`` (8 bytes per item) instead of a
+    list of boxed ints. Lists read from the database keep the raw column value
+    and are only parsed the first time their contents are used, so loading rows
+    that never touch the field costs nothing, and saving an untouched list
+    writes the raw value back unchanged.
+
+    The array is exposed read-only without copying: ``lst.as_memoryview()``
+    on any version, ``memoryview(lst)`` on Python 3.12+ only (the Python-level
+    buffer protocol of PEP 688), and
+    ``numpy.asarray(lst)`` / ``numpy.frombuffer(lst.as_memoryview(), 'int64')``.
+    """
+
+    __slots__ = ('_values', '_raw', '_separator')
 
     def __init__(self, *numbers):
-        self.numbers = [int(n) for n in numbers]
+        self._values = array('q', [int(n) for n in numbers])
+        self._raw = None
+        self._separator = ','
+
+    @classmethod
+    def from_iterable(cls, numbers):
+        return cls(*numbers)
+
+    @classmethod
+    def from_string(cls, raw, separator=','):
+        """Wrap a separator-joined string; it is parsed on first use."""
+        obj = cls.__new__(cls)
+        obj._values = None
+        obj._raw = raw
+        obj._separator = separator
+        return obj
+
+    @classmethod
+    def from_bytes(cls, raw):
+        """Wrap packed little-endian int64 values (see ``pack_int_list``); unpacked on first use."""
+        obj = cls.__new__(cls)
+        obj._values = None
+        obj._raw = bytes(raw)
+        obj._separator = ','
+        return obj
+
+    @property
+    def values(self):
+        """The underlying ``array('q')``, parsing the raw value if needed."""
+        if self._values is None:
+            raw = self._raw
+            values = array('q')
+            if isinstance(raw, bytes):
+                values.frombytes(raw)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+            else:
+                raw = raw.strip()
+                if raw:
+                    values.extend([int(v) for v in raw.split(self._separator)])
+            self._values = values
+        return self._values
+
+    def to_string(self, separator=','):
+        if isinstance(self._raw, str) and self._separator == separator:
+            return self._raw.strip()
+        return separator.join(map(str, self.values))
+
+    def to_bytes(self):
+        if isinstance(self._raw, bytes):
+            return self._raw
+        values = self.values
+        if sys.byteorder == 'big':
+            values = array('q', values)
+            values.byteswap()
+        return values.tobytes()
+
+    def tolist(self):
+        return self.values.tolist()
+
+    def as_memoryview(self):
+        """
+        A read-only view of the ``array('q')``, without copying, on every
+        Python version. Read-only because writes through it would bypass the
+        raw column value kept for saving.
+        """
+        return memoryview(self.values).toreadonly()
+
+    def __buffer__(self, flags):
+        # PEP 688: lets memoryview(lst) work on Python 3.12+. Older versions
+        # ignore this method and raise TypeError; use as_memoryview() there.
+        return self.as_memoryview()
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy
+
+        result = numpy.frombuffer(self.values, dtype=numpy.int64)
+        return result if dtype is None else result.astype(dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __contains__(self, item):
+        return item in self.values
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return IntegerList(*self.values[index])
+        return self.values[index]
+
+    def __setitem__(self, index, value):
+        self.values[index] = int(value)
+        self._raw = None
+
+    def append(self, value):
+        self.values.append(int(value))
+        self._raw = None
+
+    def extend(self, numbers):
+        self.values.extend([int(n) for n in numbers])
+        self._raw = None
+
+    def __eq__(self, other):
+        if isinstance(other, IntegerList):
+            return self.values == other.values
+        if isinstance(other, (list, tuple, array)):
+            return self.values.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (IntegerList, tuple(self.values))
 
     def __str__(self):
-        return str(self.numbers)
+        return str(self.tolist())
 
     def __repr__(self):
-        return f"IntegerList({', '.join(map(str, self.numbers))})"
+        return f"IntegerList({', '.join(map(str, self.values))})"
+
+
+def pack_int_list(values):
+    """Pack integers as little-endian signed 64-bit values."""
+    if isinstance(values, IntegerList):
+        return values.to_bytes()
+    return struct.pack(f'<{len(values)}q', *values)
+
+
+def unpack_int_list(data):
+    """Inverse of ``pack_int_list``."""
+    return IntegerList.from_bytes(data)
 
 
 class CommaSeparatedCharField(models.Field):
     """
     Custom field to store a list of integers as a comma-separated string.
+
+    With ``storage='array'`` the list is stored natively instead: as a
+    ``bigint[]`` column on PostgreSQL and as packed 64-bit integers in a binary
+    column on other backends, so reading a row no longer re-parses text.
+    Both modes support the ``__has_int`` and ``__overlaps`` lookups, which run
+    in the database; see ``IntListIndex`` for a matching GIN index.
     """
-    
+
     description = _("Store a list of integers as a comma-separated string.")
+    STORAGES = ('text', 'array')
+
     def __init__(self, *args, **kwargs):
         # separator: character used to join/split integers in the string
         self.separator = kwargs.pop('separator', ',')
+        # storage: 'text' (comma-separated string) or 'array' (native/binary list)
+        self.storage = kwargs.pop('storage', 'text')
+        if self.storage not in self.STORAGES:
+            raise ValueError(f"storage must be one of {self.STORAGES}, not {self.storage!r}")
         # max_length: maximum length of the stored string
         kwargs['max_length'] = kwargs.get('max_length', 255)
         super().__init__(*args, **kwargs)
@@ -37,6 +206,8 @@ class CommaSeparatedCharField(models.Field):
         name, path, args, kwargs = super().deconstruct()
         if self.separator != ',':
             kwargs['separator'] = self.separator
+        if self.storage != 'text':
+            kwargs['storage'] = self.storage
         if self.max_length != 255:
             kwargs['max_length'] = self.max_length
         return name, path, args, kwargs
@@ -45,15 +216,26 @@ class CommaSeparatedCharField(models.Field):
         """
         Returns the database column type for this field.
         """
+        if self.storage == 'array':
+            if connection.vendor == 'postgresql':
+                return 'bigint[]'
+            return connection.data_types['BinaryField']
         return f"char({self.max_length})"
 
     def get_prep_value(self, value):
         """
         Prepares the value before saving to the database.
         Accepts a list of integers or a comma-separated string, and stores as a string.
+        In array storage a list of integers is returned and converted per backend
+        by ``get_db_prep_value``.
         """
+        if self.storage == 'array':
+            return None if value is None else self.to_python(value)
         if value is None:
             return ''
+        if isinstance(value, IntegerList):
+            # Untouched lists read from the database are written back as is.
+            return value.to_string(self.separator)
         if isinstance(value, list):
             return self.separator.join(str(int(v)) for v in value)
         if isinstance(value, str):
@@ -61,33 +243,442 @@ class CommaSeparatedCharField(models.Field):
             return value
         return str(value)
 
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if self.storage == 'array' and value is not None:
+            if connection.vendor == 'postgresql':
+                return value.tolist()
+            return connection.Database.Binary(value.to_bytes())
+        return value
+
     def from_db_value(self, value, expression, connection):
         """
-        Converts the database value (comma-separated string) to a Python list of integers.
+        Converts the database value (comma-separated string) to an IntegerList.
+        The string is only parsed when the list is first used.
         """
         if value is None or value == '':
-            return []
-        return [int(v) for v in str(value).split(self.separator)]
+            return IntegerList()
+        if isinstance(value, list):
+            return IntegerList(*value)
+        if isinstance(value, (bytes, memoryview)):
+            return IntegerList.from_bytes(value)
+        return IntegerList.from_string(str(value), self.separator)
 
     def to_python(self, value):
         """
-        Converts the value to a Python list of integers.
-        Accepts a list or a comma-separated string and always returns a list of integers.
+        Converts the value to an IntegerList.
+        Accepts a list or a comma-separated string and always returns an IntegerList.
         """
         if value is None or value == '':
-            return []
-        if isinstance(value, list):
-            return [int(v) for v in value]
+            return IntegerList()
+        if isinstance(value, IntegerList):
+            return value
+        if isinstance(value, (list, tuple)):
+            return IntegerList(*value)
+        if isinstance(value, (bytes, memoryview)):
+            return IntegerList.from_bytes(value)
         if isinstance(value, str):
-            return [int(v) for v in value.split(self.separator)]
-        return [int(value)]
-    
-    
+            return IntegerList(*value.split(self.separator))
+        return IntegerList(value)
+
+
     def value_to_string(self, obj):
         value = self.value_from_object(obj)
+        if self.storage == 'array':
+            return ','.join(map(str, value or []))
         return self.get_prep_value(value)
-    
-    
-# TODO: create custom field that handle ml models performance saving and loading
-        
-        
\ No newline at end of file
+
+
+class _IntListLookup(Lookup):
+    # The right-hand side is a plain int or list of ints, not a field value.
+    prepare_rhs = False
+
+    def rhs_values(self):
+        if isinstance(self.rhs, (list, tuple, set)):
+            return [int(v) for v in self.rhs]
+        return [int(self.rhs)]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        values = self.rhs_values()
+        field = self.lhs.output_field
+        if field.storage == 'array':
+            if connection.vendor == 'postgresql':
+                return f'{lhs} {self.pg_operator} %s::bigint[]', [*lhs_params, values]
+            if connection.vendor == 'sqlite':
+                return f'{self.sqlite_function}({lhs}, %s)', [*lhs_params, pack_int_list(values)]
+            raise NotSupportedError(f'__{self.lookup_name} on array storage needs PostgreSQL or SQLite.')
+        if not values:
+            return '1 = 0', []
+        # Text storage: wrap the list in separators and look for ",<n>," in it.
+        sep = field.separator
+        if connection.vendor == 'mysql':
+            haystack = f"CONCAT(%s, TRIM({lhs}), %s)"
+        else:
+            haystack = f"(%s || TRIM({lhs}) || %s)"
+        conditions = [f"{haystack} LIKE %s" for _ in values]
+        params = []
+        for value in values:
+            params += [sep, *lhs_params, sep, f'%{sep}{value}{sep}%']
+        return '(' + ' OR '.join(conditions) + ')', params
+
+
+@CommaSeparatedCharField.register_lookup
+class HasInt(_IntListLookup):
+    """``numbers__has_int=5``: the list contains 5."""
+    lookup_name = 'has_int'
+    pg_operator = '@>'
+    sqlite_function = 'e_health_int_list_has'
+
+    def rhs_values(self):
+        return [int(self.rhs)]
+
+
+@CommaSeparatedCharField.register_lookup
+class Overlaps(_IntListLookup):
+    """``numbers__overlaps=[1, 2]``: the list contains at least one of the values."""
+    lookup_name = 'overlaps'
+    pg_operator = '&&'
+    sqlite_function = 'e_health_int_list_overlaps'
+
+
+class IntListIndex(Index):
+    """
+    Index for a ``CommaSeparatedCharField(storage='array')``.
+
+    A GIN index on PostgreSQL, which serves ``__has_int`` and ``__overlaps``.
+    Other backends have no index type for these lookups and get a plain index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor == 'postgresql':
+            using = ' USING gin'
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+def register_sqlite_functions(sender, connection, **kwargs):
+    """``connection_created`` receiver adding the array-storage lookup functions to SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+
+    def has(data, packed):
+        return data is not None and unpack_int_list(packed)[0] in unpack_int_list(data)
+
+    def overlaps(data, packed):
+        return data is not None and not set(unpack_int_list(packed)).isdisjoint(unpack_int_list(data))
+
+    connection.connection.create_function('e_health_int_list_has', 2, has, deterministic=True)
+    connection.connection.create_function('e_health_int_list_overlaps', 2, overlaps, deterministic=True)
+
+
+# ------------------------------------------------------------ model artifacts
+
+ARTIFACT_MAGIC = b'EHMA\x01'
+_HEADER_LENGTH = struct.Struct('<I')
+
+# format name -> (dumps, loads). Pickle runs arbitrary code while loading, so
+# only store artifacts produced by trusted code.
+ARTIFACT_SERIALIZERS = {
+    'pickle': (partial(pickle.dumps, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+}
+
+
+class ArtifactCache:
+    """
+    Process-wide LRU of deserialized model artifacts, keyed by the SHA-256 of
+    their serialized bytes and bounded by the total serialized size of the
+    entries (a cheap stand-in for their size in memory).
+
+    Concurrent loads of the same artifact wait for the first one instead of
+    deserializing it again.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # sha256 -> (size, object)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        """
+        Return the cached object for ``key``. On a miss ``loader()`` is called
+        and must return ``(object, size_in_bytes)``.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][1]
+                self.misses += 1
+            try:
+                obj, size = loader()
+                self.put(key, size, obj)
+            finally:
+                # Also when loader() raises: the next caller gets a fresh lock and tries again.
+                with self._lock:
+                    self._loading.pop(key, None)
+        return obj
+
+    def put(self, key, size, obj):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[0]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (size, obj)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][0]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+artifact_cache = ArtifactCache()
+
+
+class ModelArtifact:
+    """
+    A serialized ML model plus its metadata (format and performance metrics).
+
+    Stored either as one blob (``ARTIFACT_MAGIC``, a length-prefixed JSON
+    header, then the payload) or as a file with the same layout named after
+    the payload's SHA-256. Nothing is deserialized until ``load()`` is called,
+    and ``load()`` goes through ``artifact_cache``, so rows sharing a model
+    share one deserialized object.
+    """
+
+    __slots__ = ('_header', '_payload', 'name', '_storage')
+
+    def __init__(self, header=None, payload=None, name=None, storage=None):
+        self._header = header
+        self._payload = payload
+        self.name = name
+        self._storage = storage
+
+    @classmethod
+    def from_object(cls, obj, metrics=None, format='pickle'):
+        """Serialize ``obj`` and remember it as already loaded."""
+        if format not in ARTIFACT_SERIALIZERS:
+            raise ValueError(f"Unknown artifact format {format!r}")
+        payload = ARTIFACT_SERIALIZERS[format][0](obj)
+        header = {
+            'sha256': hashlib.sha256(payload).hexdigest(),
+            'format': format,
+            'size': len(payload),
+            'metrics': metrics or {},
+        }
+        artifact_cache.put(header['sha256'], header['size'], obj)
+        return cls(header, payload)
+
+    @classmethod
+    def from_blob(cls, blob):
+        """Wrap a stored blob; only the JSON header is parsed."""
+        view = memoryview(blob)
+        if bytes(view[:len(ARTIFACT_MAGIC)]) != ARTIFACT_MAGIC:
+            raise ValueError('Not a model artifact blob.')
+        offset = len(ARTIFACT_MAGIC) + _HEADER_LENGTH.size
+        (length,) = _HEADER_LENGTH.unpack(view[len(ARTIFACT_MAGIC):offset])
+        header = json.loads(bytes(view[offset:offset + length]))
+        return cls(header, view[offset + length:])
+
+    @classmethod
+    def from_file(cls, name, storage=None):
+        """Refer to a stored file; it is not opened until needed."""
+        return cls(name=name, storage=storage or default_storage)
+
+    @property
+    def sha256(self):
+        if self._header is None:
+            # Files are named after their hash, so no read is needed.
+            return os.path.splitext(os.path.basename(self.name))[0]
+        return self._header['sha256']
+
+    @property
+    def header(self):
+        if self._header is None:
+            with self._storage.open(self.name, 'rb') as fh:
+                prefix = fh.read(len(ARTIFACT_MAGIC) + _HEADER_LENGTH.size)
+                (length,) = _HEADER_LENGTH.unpack(prefix[len(ARTIFACT_MAGIC):])
+                self._header = json.loads(fh.read(length))
+        return self._header
+
+    @property
+    def format(self):
+        return self.header['format']
+
+    @property
+    def metrics(self):
+        return self.header['metrics']
+
+    @property
+    def size(self):
+        return self.header['size']
+
+    def load(self):
+        """Return the deserialized model, from ``artifact_cache`` when possible."""
+        return artifact_cache.get(self.sha256, lambda: (self._deserialize(), self.size))
+
+    def _deserialize(self):
+        loads = ARTIFACT_SERIALIZERS[self.format][1]
+        if self._payload is not None:
+            return loads(self._payload)
+        try:
+            path = self._storage.path(self.name)
+        except NotImplementedError:
+            # Remote storage: no local file to map.
+            return loads(self._read_payload())
+        offset = len(ARTIFACT_MAGIC) + _HEADER_LENGTH.size
+        with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                (length,) = _HEADER_LENGTH.unpack(view[len(ARTIFACT_MAGIC):offset])
+                with view[offset + length:] as payload:
+                    return loads(payload)
+
+    def to_blob(self):
+        header = json.dumps(self.header, sort_keys=True).encode()
+        return b''.join([ARTIFACT_MAGIC, _HEADER_LENGTH.pack(len(header)), header, self._read_payload()])
+
+    def _read_payload(self):
+        if self._payload is None:
+            with self._storage.open(self.name, 'rb') as fh:
+                return ModelArtifact.from_blob(fh.read())._payload
+        return self._payload
+
+    def file_name(self, upload_to):
+        return self.name or f'{upload_to.rstrip("/")}/{self.sha256}.{self.format}'
+
+    def save_to(self, storage, upload_to):
+        """Write the artifact as ``<upload_to>/<sha256>.<format>`` unless it already exists."""
+        if self.name is None:
+            name = self.file_name(upload_to)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(self.to_blob()))
+            self.name = name
+            self._storage = storage
+        return self.name
+
+    def __eq__(self, other):
+        if isinstance(other, ModelArtifact):
+            return self.sha256 == other.sha256
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.sha256)
+
+    def __repr__(self):
+        return f'<ModelArtifact {self.sha256[:12]}>'
+
+
+class ModelArtifactField(models.Field):
+    """
+    Stores an ML model (any object the chosen serializer handles) together
+    with its performance metrics, and returns a lazily loaded ``ModelArtifact``.
+
+    ``storage='db'`` keeps the artifact in a binary column with a metadata
+    header; ``storage='file'`` writes it out of row to ``default_storage``
+    under ``upload_to``, named by content hash (identical models are stored
+    once), and memory-maps it on load when the storage is on local disk.
+
+    Assign a plain object or ``ModelArtifact.from_object(model, metrics={...})``;
+    read it back with ``instance.field.load()``.
+    """
+
+    description = _("A serialized machine learning model with metrics.")
+    STORAGES = ('db', 'file')
+
+    def __init__(self, *args, **kwargs):
+        self.storage = kwargs.pop('storage', 'db')
+        if self.storage not in self.STORAGES:
+            raise ValueError(f"storage must be one of {self.STORAGES}, not {self.storage!r}")
+        self.upload_to = kwargs.pop('upload_to', 'artifacts')
+        if self.storage == 'file':
+            kwargs.setdefault('max_length', 255)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.storage != 'db':
+            kwargs['storage'] = self.storage
+        if self.upload_to != 'artifacts':
+            kwargs['upload_to'] = self.upload_to
+        if self.storage == 'file' and self.max_length == 255:
+            del kwargs['max_length']
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'CharField' if self.storage == 'file' else 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        if self.storage == 'file':
+            return ModelArtifact.from_file(value)
+        return ModelArtifact.from_blob(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, ModelArtifact):
+            return value
+        if self.storage == 'file' and isinstance(value, str):
+            return ModelArtifact.from_file(value)
+        if self.storage == 'db' and isinstance(value, str):
+            # value_to_string() output, e.g. from a fixture
+            return ModelArtifact.from_blob(b64decode(value))
+        if isinstance(value, (bytes, memoryview)):
+            return ModelArtifact.from_blob(value)
+        return ModelArtifact.from_object(value)
+
+    def pre_save(self, model_instance, add):
+        value = self.to_python(getattr(model_instance, self.attname))
+        if value is not None and self.storage == 'file':
+            value.save_to(default_storage, self.upload_to)
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def get_prep_value(self, value):
+        value = self.to_python(value)
+        if value is None:
+            return None
+        if self.storage == 'file':
+            # pre_save() writes the file; lookups only need its name.
+            return value.file_name(self.upload_to)
+        return value.to_blob()
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is not None and self.storage == 'db':
+            return connection.Database.Binary(value)
+        return value
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        if value is None:
+            return None
+        if self.storage == 'file':
+            return value.name
+        return b64encode(value.to_blob()).decode('ascii')
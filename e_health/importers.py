@@ -0,0 +1,226 @@
+"""
+Streaming bulk import of patient, case and appointment feeds.
+
+A feed is a CSV or NDJSON file with one row per object. Columns are named
+after model fields. Foreign keys are given either as the raw primary key
+(``patient``) or through a unique field of the related model using the ORM's
+double underscore syntax (``patient__email``, ``doctor__license_number``,
+``case__case_number``, ``treatment__code``).
+
+Rows are read one at a time and written in batches: with ``COPY ... FROM
+STDIN`` on PostgreSQL and with ``executemany`` everywhere else, so memory use
+depends on the batch size and not on the size of the file. The rows skip the
+save signals, so the imported model's cache generation is bumped once the
+import commits (see ``e_health.cache``).
+"""
+import csv
+import io
+import json
+import time
+from functools import partial
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from e_health import cache
+from e_health.allocators import case_numbers
+
+
+class FeedError(ValueError):
+    """Raised when a feed row cannot be converted."""
+
+
+def read_rows(path, fmt=None):
+    """Yield feed rows as dicts from a CSV or NDJSON file."""
+    fmt = fmt or ('ndjson' if str(path).endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class _CopyStream(io.TextIOBase):
+    """File-like object that feeds pre-formatted COPY lines to psycopg2's ``copy_expert``."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _copy_text(value):
+    """Format one value for PostgreSQL's COPY text format."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    text = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return (
+        text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class FeedImporter:
+    """
+    Import rows of one model from a feed.
+
+    ``FeedImporter(Appointment).run(read_rows('appointments.csv'))`` returns
+    the number of rows written. ``progress`` is called after every batch with
+    ``(rows_written, seconds_elapsed)``.
+    """
+
+    def __init__(self, model, using='default', batch_size=10_000, progress=None):
+        self.model = model
+        self.using = using
+        self.batch_size = batch_size
+        self.progress = progress
+        self.connection = connections[using]
+        self.fields = list(model._meta.concrete_fields)
+        # (related model, lookup field) -> {value: pk}, filled on first use
+        self._lookups = {}
+
+    def run(self, rows):
+        started = time.perf_counter()
+        total = 0
+        rows = iter(rows)
+        with transaction.atomic(using=self.using):
+            line = 1
+            while batch := list(islice(rows, self.batch_size)):
+                values = [self.convert(row, line + i) for i, row in enumerate(batch)]
+                line += len(batch)
+                self._fill_generated(values)
+                self.write(values)
+                total += len(values)
+                if self.progress:
+                    self.progress(total, time.perf_counter() - started)
+        transaction.on_commit(partial(cache.invalidate, self.model), using=self.using)
+        return total
+
+    # ---------------------------------------------------------------- convert
+
+    def convert(self, row, line):
+        """Turn one feed row into a list of database values, one per concrete field."""
+        now = timezone.now()
+        values = []
+        for field in self.fields:
+            try:
+                value = self._value(field, row, now)
+                values.append(field.get_db_prep_save(value, self.connection))
+            except FeedError:
+                raise
+            except Exception as exc:
+                raise FeedError(f"Line {line}, column '{field.name}': {exc}") from exc
+        return values
+
+    def _value(self, field, row, now):
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            return now
+        if field.is_relation:
+            if field.attname in row or field.name in row:
+                raw = row.get(field.attname, row.get(field.name))
+                return self._required(field, field.target_field.to_python(raw) if raw not in ('', None) else None)
+            for key, raw in row.items():
+                if key.startswith(f'{field.name}__'):
+                    return self._required(field, self._resolve(field, key.split('__', 1)[1], raw))
+            return None if field.null else self._missing(field)
+        if field.name in row:
+            raw = row[field.name]
+            if raw in ('', None):
+                if field.null:
+                    return None
+                if field.has_default():
+                    return field.get_default()
+                return self._required(field, raw)
+            return field.to_python(raw)
+        if field.has_default():
+            return field.get_default()
+        if field.null or field.blank:
+            return None if field.null else ''
+        if field.name == 'case_number':
+            return None  # allocated per batch in _fill_generated()
+        return self._missing(field)
+
+    def _missing(self, field):
+        raise FeedError(f"Missing required column '{field.name}'")
+
+    def _required(self, field, value):
+        # Reported by convert() with the line and column.
+        if value is None and not field.null:
+            raise ValidationError(field.error_messages['null'], code='null')
+        return value
+
+    def _resolve(self, field, lookup, raw):
+        """Map a natural key to a primary key through a table loaded in one pass."""
+        if raw in ('', None):
+            return None
+        related = field.related_model
+        key = (related, lookup)
+        if key not in self._lookups:
+            self._lookups[key] = {
+                str(value): pk
+                for value, pk in related._default_manager.using(self.using)
+                .order_by().values_list(lookup, 'pk').iterator(chunk_size=10_000)
+            }
+        try:
+            return self._lookups[key][str(raw)]
+        except KeyError:
+            raise FeedError(f"No {related._meta.verbose_name} with {lookup}={raw!r}") from None
+
+    def _fill_generated(self, values):
+        for index, field in enumerate(self.fields):
+            if field.name == 'case_number':
+                missing = [row for row in values if not row[index]]
+                for row, number in zip(missing, case_numbers.allocate(len(missing), using=self.using)):
+                    row[index] = number
+
+    # ------------------------------------------------------------------ write
+
+    def write(self, values):
+        if self.connection.vendor == 'postgresql':
+            self._copy(values)
+        else:
+            self._executemany(values)
+
+    def _columns(self):
+        quote = self.connection.ops.quote_name
+        return ', '.join(quote(f.column) for f in self.fields)
+
+    def _copy(self, values):
+        table = self.connection.ops.quote_name(self.model._meta.db_table)
+        sql = f'COPY {table} ({self._columns()}) FROM STDIN'
+        with self.connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                lines = ('\t'.join(map(_copy_text, row)) + '\n' for row in values)
+                raw.copy_expert(sql, _CopyStream(lines))
+            else:  # psycopg 3 adapts the values itself
+                with raw.copy(sql) as copy:
+                    for row in values:
+                        copy.write_row(row)
+
+    def _executemany(self, values):
+        table = self.connection.ops.quote_name(self.model._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(self.fields))
+        sql = f'INSERT INTO {table} ({self._columns()}) VALUES ({placeholders})'
+        with self.connection.cursor() as cursor:
+            cursor.executemany(sql, values)
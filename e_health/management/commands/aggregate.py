@@ -1,11 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from django.db.models import FloatField
-from e_health.models import Patient, Doctor, Case, Treatment, Appointment
-# ? for custom query examples
-from django.db.models import Avg, Max, Min, Count, Q
-from django.db.models import Q
-class Command(BaseCommand):
+from e_health.profiling import ProfiledCommandMixin
+class Command(ProfiledCommandMixin, BaseCommand):
     # ? Refrence : https://docs.djangoproject.com/en/5.1/topics/db/aggregation/
     help = 'Run test queries for data aggregation'
 
@@ -15,6 +10,11 @@ class Command(BaseCommand):
 
 
     def test_queries(self):
+        # Imported here, not at module level, so loading the command stays cheap.
+        from django.db.models import FloatField
+        from e_health.models import Patient, Doctor, Case
+        # ? for custom query examples
+        from django.db.models import Avg, Max, Min, Count, Q
         print("ORM example:")
         for p in Patient.objects.filter(last_name="Smith"):
             print("ORM ->", p.first_name, p.last_name)
@@ -45,7 +45,7 @@ annotate() → values(): Annotates all objects first, then values()"""
         
         # * Q Example *
         """Q objects:   """
-        high_priority_cases = Case.objects.filter(Q(priority__gte=4) | Q(severity='SEVERE'))
+        high_priority_cases = Case.objects.for_listing().filter(Q(priority__gte=4) | Q(severity='SEVERE'))
         print("High Priority Cases:", list(high_priority_cases))
         
         
@@ -0,0 +1,104 @@
+import json
+import platform
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Benchmark the query patterns of the e_health commands and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('patterns', nargs='*', help="Benchmark names or globs, e.g. 'search.*' (default: all)")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--scale', type=float,
+                            help='Regenerate the dataset with generate_data at this scale before running; '
+                                 'this DELETES every e_health row first and needs --reset')
+        parser.add_argument('--reset', action='store_true',
+                            help='Confirm that --scale may delete the existing e_health data')
+        parser.add_argument('--seed', type=int, default=42, help='Seed passed to generate_data with --scale')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to compare against')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Flag a regression when p95 grows by more than this factor')
+        parser.add_argument('--list', action='store_true', help='List the available benchmarks and exit')
+
+    def handle(self, *args, **options):
+        from django.db import connection
+        from e_health import benchmarks  # noqa: F401 -- registers the benchmarks
+        from e_health.benchmarking import BENCHMARKS, measure
+        from e_health.models import Appointment, Case, Doctor, Patient, Treatment
+
+        selected = [
+            bench for name, bench in sorted(BENCHMARKS.items())
+            if not options['patterns'] or any(fnmatch(name, p) for p in options['patterns'])
+        ]
+        if options['list']:
+            for bench in selected:
+                self.stdout.write(f"{bench.name:45} {bench.description}")
+            return
+        if not selected:
+            raise CommandError('No benchmark matches the given patterns.')
+
+        if options['scale'] is not None:
+            if not options['reset']:
+                raise CommandError(
+                    '--scale deletes every e_health row before generating new data; add --reset to confirm.'
+                )
+            call_command('generate_data', scale=options['scale'], seed=options['seed'], reset=True,
+                         stdout=self.stdout)
+
+        report = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'rows': {
+                    model._meta.db_table: model.objects.count()
+                    for model in (Patient, Doctor, Case, Treatment, Appointment)
+                },
+            },
+            'results': {},
+        }
+        self.stdout.write(f"{'benchmark':45} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'rows':>8} {'rows/s':>10}")
+        for bench in selected:
+            result = measure(bench.func, iterations=options['iterations'], warmup=options['warmup'])
+            report['results'][bench.name] = result
+            self.stdout.write(
+                f"{bench.name:45} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['queries']:>8} {result['rows']:>8} {result['rows_per_sec']:>10}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'])
+
+    def compare(self, report, path, threshold):
+        with open(path, encoding='utf-8') as handle:
+            baseline = json.load(handle)['results']
+        regressions = []
+        for name, result in report['results'].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+            if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * threshold:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) against {path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}'))
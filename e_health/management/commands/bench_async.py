@@ -0,0 +1,139 @@
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Compare throughput and tail latency under concurrent load of the ASGI and the WSGI handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per handler (default 500)')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Requests in flight: client threads for WSGI, tasks for ASGI (default 16)')
+        parser.add_argument('--path', default='/api/async/appointments/?limit=50',
+                            help='URL requested through the ASGI handler')
+        parser.add_argument('--wsgi-path',
+                            help='URL requested through the WSGI handler (default: the same URL as --path)')
+        parser.add_argument('--handler', choices=['asgi', 'wsgi', 'both'], default='both')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+        parser.add_argument('--user', help='User the requests log in as (default: the first active superuser)')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        from e_health.benchmarking import session_cookie, summarize
+
+        cookie = session_cookie(options['user'])
+        results = {}
+        for name in ('asgi', 'wsgi'):
+            if options['handler'] not in (name, 'both'):
+                continue
+            run = self.run_asgi if name == 'asgi' else self.run_wsgi
+            path = options['path'] if name == 'asgi' else options['wsgi_path'] or options['path']
+            started = time.perf_counter()
+            latencies, statuses = run(
+                path, options['host'], cookie, max(1, options['requests']), max(1, options['concurrency']),
+            )
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'path': path,
+                'requests': len(latencies),
+                'errors': sum(status != 200 for status in statuses),
+                'requests_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                **summarize(latencies),
+            }
+            if results[name]['errors'] == len(latencies):
+                raise CommandError(f'Every {name.upper()} request to {path} failed (status {statuses[0]}).')
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:5} {result['requests_per_sec']:>8} req/s  p50 {result['p50_ms']} ms  "
+                f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  max {result['max_ms']} ms  "
+                f"errors {result['errors']}  {result['path']}"
+            )
+
+    def run_wsgi(self, path, host, cookie, total, concurrency):
+        """``total`` requests through ``WSGIHandler`` from ``concurrency`` threads, like a threaded server."""
+        from django.core.handlers.wsgi import WSGIHandler
+
+        handler = WSGIHandler()
+        url = urlsplit(path)
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': host,
+                'HTTP_COOKIE': cookie,
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = []
+            started = time.perf_counter()
+            response = handler(environ, lambda line, headers, exc_info=None: status.append(int(line[:3])))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return time.perf_counter() - started, status[0]
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(request, range(total)))
+        return [latency for latency, _ in results], [status for _, status in results]
+
+    def run_asgi(self, path, host, cookie, total, concurrency):
+        """``total`` requests through ``ASGIHandler`` from ``concurrency`` tasks on one event loop."""
+        from django.core.handlers.asgi import ASGIHandler
+
+        handler = ASGIHandler()
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': url.path, 'raw_path': url.path.encode(), 'query_string': url.query.encode(), 'root_path': '',
+            'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())], 'client': ('127.0.0.1', 50000), 'server': (host, 80),
+        }
+
+        async def request():
+            body_sent = False
+            done = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The handler listens for a disconnect while the view runs.
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    done.set()
+
+            started = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            return time.perf_counter() - started, status[0]
+
+        async def worker(count):
+            return [await request() for _ in range(count)]
+
+        async def main():
+            shares = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+            return await asyncio.gather(*(worker(share) for share in shares))
+
+        results = [result for part in asyncio.run(main()) for result in part]
+        return [latency for latency, _ in results], [status for _, status in results]
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Measure Case insert throughput as the case table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=10, help='Number of measured rounds')
+        parser.add_argument('--per-round', type=int, default=1000, help='Cases inserted per round')
+        parser.add_argument(
+            '--mode', choices=['save', 'bulk', 'count'], default='save',
+            help="'save' uses Case.save(), 'bulk' uses bulk_create(), "
+                 "'count' emulates the old Case.objects.count() + 1 numbering",
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the inserted rows instead of deleting them')
+
+    def handle(self, *args, **options):
+        from e_health.models import Case, Patient
+
+        # Rows are inserted in autocommit mode, as a web worker would, so the
+        # allocator can keep its reserved blocks between inserts.
+        patient = Patient.objects.create(
+            first_name='Bench', last_name='Patient', date_of_birth='1990-01-01',
+        )
+        try:
+            self.stdout.write(f"{'round':>5} {'table rows':>12} {'rows/sec':>12}")
+            for round_no in range(1, options['rounds'] + 1):
+                cases = [
+                    Case(patient=patient, chief_complaint='Benchmark', symptoms_description='Benchmark')
+                    for _ in range(options['per_round'])
+                ]
+                started = time.perf_counter()
+                if options['mode'] == 'bulk':
+                    Case.objects.bulk_create(cases, batch_size=500)
+                elif options['mode'] == 'count':
+                    for case in cases:
+                        case.case_number = f"BENCH{Case.objects.count() + 1:010d}"
+                        case.save()
+                else:
+                    for case in cases:
+                        case.save()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{round_no:>5} {Case.objects.count():>12} {len(cases) / elapsed:>12.0f}"
+                )
+        finally:
+            if not options['keep']:
+                patient.delete()
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Measure API request throughput through the Django handler, with and without connection pooling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Total requests (default 500)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Client threads (default 8)')
+        parser.add_argument('--path', default='/api/appointments/',
+                            help='URL to request; patient, doctor and treatment responses are cached and '
+                                 'need no connection (default /api/appointments/)')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+        parser.add_argument('--user', help='User the requests log in as (default: the first active superuser)')
+        parser.add_argument('--compare', action='store_true',
+                            help='Run once with DB_POOL=1 and once with DB_POOL=0, in fresh processes')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(options)
+        result = self.run(options)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        self.write_result('pooled' if result['pooled'] else 'unpooled', result)
+
+    def run(self, options):
+        from django.db import connection
+        from django.test import Client
+
+        from core.db_pool import pool_stats
+        from e_health.benchmarking import session_cookie, summarize
+
+        path, host = options['path'], options['host']
+        cookie = session_cookie(options['user'])
+
+        def worker(count):
+            client = Client(HTTP_HOST=host, HTTP_COOKIE=cookie)
+            latencies, errors = [], 0
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(path)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+            return latencies, errors
+
+        threads = max(1, options['concurrency'])
+        shares = [options['requests'] // threads + (i < options['requests'] % threads) for i in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(worker, shares))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for part, _ in results for latency in part]
+        stats = pool_stats().get('default', {})
+        return {
+            'vendor': connection.vendor,
+            'pooled': bool(stats),
+            'requests': len(latencies),
+            'errors': sum(errors for _, errors in results),
+            'requests_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            **summarize(latencies),
+            'pool': {key: stats[key] for key in ('connections_num', 'requests_queued', 'avg_wait_ms') if key in stats},
+        }
+
+    def compare(self, options):
+        from django.conf import settings
+
+        # Not sys.argv[0], which may be django-admin or a test runner: the
+        # children run manage.py with this process's settings.
+        argv = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_pool', '--json',
+            '--settings', settings.SETTINGS_MODULE,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--path', options['path'], '--host', options['host'],
+        ]
+        if options.get('pythonpath'):
+            argv += ['--pythonpath', options['pythonpath']]
+        if options['user']:
+            argv += ['--user', options['user']]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        for enabled in ('1', '0'):
+            completed = subprocess.run(argv, env={**env, 'DB_POOL': enabled}, capture_output=True, text=True)
+            if completed.returncode:
+                raise CommandError(f'DB_POOL={enabled} run failed:\n{completed.stderr}')
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            self.write_result(f'DB_POOL={enabled}', result)
+        if result['vendor'] != 'postgresql':
+            self.stderr.write(f"{result['vendor']} has no connection pool; both runs were unpooled.")
+
+    def write_result(self, label, result):
+        pool = ', '.join(f'{key} {value}' for key, value in result['pool'].items())
+        self.stdout.write(
+            f"{label:10} {result['requests_per_sec']:>8} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+            f"errors {result['errors']}" + (f"  ({pool})" if pool else '')
+        )
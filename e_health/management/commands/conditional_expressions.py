@@ -11,3 +11,41 @@
 ... )
 >>> Client.objects.values_list("name", "account_type")"""
 
+
+from django.core.management.base import BaseCommand
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    # ? Refrence : https://docs.djangoproject.com/en/5.1/ref/models/conditional-expressions/
+    help = 'Run example queries with Case/When and conditional aggregation'
+
+    def handle(self, *args, **options):
+        self.test_queries()
+
+    def test_queries(self):
+        # Imported here, not at module level, so loading the command stays cheap.
+        # Django's Case, not the e_health model of the same name.
+        from django.db.models import Case, CharField, Count, Q, Value, When
+        from e_health.models import Appointment, Doctor
+
+        # * Case/When annotation, grouped by its value *
+        res = Doctor.objects.annotate(
+            experience=Case(
+                When(years_of_experience__gte=20, then=Value('senior')),
+                When(years_of_experience__gte=5, then=Value('mid-career')),
+                default=Value('junior'),
+                output_field=CharField(),
+            ),
+        ).order_by().values('experience').annotate(doctors=Count('pk'))
+        print("SQL Query:", str(res.query))
+        print("Doctors by experience:", list(res))
+
+        # * Conditional aggregation: several counts in one pass over the table *
+        res = Appointment.objects.aggregate(
+            completed=Count('pk', filter=Q(status='COMPLETED')),
+            cancelled=Count('pk', filter=Q(status='CANCELLED')),
+            no_show=Count('pk', filter=Q(status='NO_SHOW')),
+        )
+        print("=======================================================================")
+        print("Appointments by outcome:", res)
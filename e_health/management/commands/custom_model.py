@@ -1 +1,23 @@
-# https://docs.djangoproject.com/en/5.1/howto/custom-model-fields/
\ No newline at end of file
+# https://docs.djangoproject.com/en/5.1/howto/custom-model-fields/
+
+from django.core.management.base import BaseCommand
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    # ? Refrence : https://docs.djangoproject.com/en/5.1/howto/custom-model-fields/
+    help = 'Show how the custom model fields read back and filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--value', type=int, default=1, help='Integer looked up with __has_int (default 1)')
+
+    def handle(self, *args, **options):
+        # Imported here, not at module level, so loading the command stays cheap.
+        from e_health.models import TestCustomFielModel
+
+        for row in TestCustomFielModel.objects.order_by('pk')[:5]:
+            print(row.pk, "->", row.comma_separated_numbers, type(row.comma_separated_numbers).__name__,
+                  row.packed_numbers)
+        res = TestCustomFielModel.objects.filter(packed_numbers__has_int=options['value'])
+        print("SQL Query:", str(res.query))
+        print(f"Rows whose packed_numbers contain {options['value']}:", res.count())
@@ -0,0 +1,346 @@
+import hashlib
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate, count, islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.db_routers import StickyCommandMixin
+from e_health.profiling import ProfiledCommandMixin
+
+# Row counts at --scale 1. Everything except the treatment catalogue grows
+# linearly, so --scale 100 gives 1M patients and roughly 4M appointments.
+BASE_PATIENTS = 10_000
+BASE_DOCTORS = 200
+BASE_CASES = 15_000
+TREATMENT_COUNT = 60
+
+FIRST_NAMES = [
+    'Mariam', 'John', 'Sarah', 'Mike', 'Emma', 'Helen', 'Helena', 'Hélène', 'Ahmed', 'Sara',
+    'Omar', 'Fatma', 'Youssef', 'Nour', 'Liam', 'Olivia', 'Noah', 'Ava', 'Lucas', 'Mia',
+    'José', 'Zoë', 'Chloé', 'Renée', 'André', 'Björn', 'Ingrid', 'Kenji', 'Aiko', 'Priya',
+]
+LAST_NAMES = [
+    'Eissa', 'Smith', 'Johnson', 'Brown', 'Davis', 'Mirren', 'Joy', 'Khaled', 'Ali', 'Hassan',
+    'Mohamed', 'Wilson', 'García', 'Müller', 'Nguyen', 'Kim', 'Rossi', 'Dubois', 'Ivanov', 'Sato',
+]
+SPECIALIZATIONS = [
+    ('General Practice', 30), ('Cardiology', 10), ('Pediatrics', 12), ('Orthopedics', 8),
+    ('Neurology', 6), ('Dermatology', 7), ('Oncology', 5), ('Psychiatry', 6),
+    ('Radiology', 4), ('Gastroenterology', 5),
+]
+COMPLAINTS = [
+    'Chest pain', 'Headache', 'Back pain', 'Fever', 'Cough', 'Knee injury', 'Shortness of breath',
+    'Abdominal pain', 'Rash', 'Dizziness', 'Fatigue', 'Heart palpitations', 'Anxiety',
+]
+TREATMENT_CATEGORIES = ['DIAGNOSTIC', 'THERAPEUTIC', 'PREVENTIVE', 'SURGICAL', 'MEDICATION', 'THERAPY', 'CONSULTATION']
+APPOINTMENT_TYPES = [
+    ('CONSULTATION', 40), ('FOLLOW_UP', 25), ('DIAGNOSTIC', 15), ('THERAPY', 8),
+    ('PROCEDURE', 6), ('SURGERY', 2), ('EMERGENCY', 4),
+]
+CASE_STATUSES = [('OPEN', 20), ('IN_PROGRESS', 25), ('UNDER_REVIEW', 5), ('RESOLVED', 25), ('CLOSED', 20), ('REFERRED', 5)]
+CASE_SEVERITIES = [('MILD', 45), ('MODERATE', 35), ('SEVERE', 15), ('CRITICAL', 5)]
+PAST_APPOINTMENT_STATUSES = [('COMPLETED', 80), ('CANCELLED', 8), ('NO_SHOW', 7), ('RESCHEDULED', 5)]
+FUTURE_APPOINTMENT_STATUSES = [('SCHEDULED', 60), ('CONFIRMED', 35), ('CANCELLED', 5)]
+
+# Appointments are booked on a 30 minute grid between 08:00 and 16:00,
+# spread from a year in the past to two months ahead.
+SLOTS_PER_DAY = 16
+SLOT_MINUTES = 30
+DAY_START_MINUTES = 8 * 60
+HISTORY_DAYS = 365
+FUTURE_DAYS = 60
+# Average appointments per case (1 + expovariate(1 / 2.2), capped) plus walk-ins.
+APPOINTMENTS_PER_CASE = 3.0
+
+
+def _weighted(choices):
+    """Split ``[(value, weight), ...]`` into values and cumulative weights for ``rng.choices``."""
+    values = [value for value, _ in choices]
+    return values, list(accumulate(weight for _, weight in choices))
+
+
+def _span(duration):
+    """Grid slots an appointment of ``duration`` minutes occupies."""
+    return max(1, -(-duration // SLOT_MINUTES))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(ProfiledCommandMixin, StickyCommandMixin, BaseCommand):
+    help = 'Generate a large, reproducible synthetic e_health dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f'Scale factor; 1 = {BASE_PATIENTS} patients, {BASE_DOCTORS} doctors, {BASE_CASES} cases')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed always yields the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--reset', action='store_true', help='Delete existing e_health rows first')
+
+    def handle(self, *args, **options):
+        from django.contrib.auth.models import User
+        from e_health import cache
+        from e_health.models import Appointment, Case, Doctor, DoctorStats, Patient, Treatment
+        from e_health.stats import rebuild_doctor_stats
+
+        self.User, self.Patient, self.Doctor = User, Patient, Doctor
+        self.Case, self.Treatment, self.Appointment = Case, Treatment, Appointment
+        self.DoctorStats = DoctorStats
+
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.batch_size = options['batch_size']
+        self.today = date.today()
+        scale = options['scale']
+        self.n_patients = max(1, int(BASE_PATIENTS * scale))
+        self.n_doctors = max(1, int(BASE_DOCTORS * scale))
+        self.n_cases = int(BASE_CASES * scale)
+
+        if options['reset']:
+            self.reset()
+
+        started = time.perf_counter()
+        treatments = self.generate_treatments()
+        doctors = self.generate_doctors()
+        self.generate_patients()
+        self.generate_cases_and_appointments(doctors, treatments)
+        # bulk_create skips the save hooks that keep DoctorStats current.
+        self.stdout.write(f"doctor stats: {rebuild_doctor_stats()} rows")
+        # ...and the signals that bump the cache generations.
+        for model in (Treatment, Doctor, Patient, Case, Appointment):
+            cache.invalidate(model)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.1f}s"))
+
+    # ------------------------------------------------------------------ helpers
+
+    def _uuid(self, kind, index):
+        """
+        Deterministic primary key for row ``index`` of ``kind``.
+
+        Keys are derived instead of stored, so cases and appointments can point
+        at any patient without keeping millions of ids in memory. Keys of one
+        kind are sequential, which also keeps B-tree inserts append-only.
+        """
+        prefix = int.from_bytes(hashlib.blake2b(f'{self.seed}:{kind}'.encode(), digest_size=8).digest(), 'big')
+        return uuid.UUID(int=(prefix << 64) | index)
+
+    def _insert(self, model, rows, label):
+        started = time.perf_counter()
+        total = 0
+        for chunk in _chunks(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            total += len(chunk)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label}: {total} rows ({total / elapsed if elapsed else 0:.0f} rows/sec)")
+        return total
+
+    def reset(self):
+        # Plain DELETEs: the ORM collector would load every row to cascade.
+        with connection.cursor() as cursor:
+            for model in (self.Appointment, self.Case, self.Treatment, self.DoctorStats, self.Doctor, self.Patient):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        self.User.objects.filter(username__startswith='gen_dr_').delete()
+        self.stdout.write('Existing e_health rows deleted')
+
+    # --------------------------------------------------------------- generators
+
+    def generate_treatments(self):
+        rng = self.rng
+        treatments = []
+        for i in range(TREATMENT_COUNT):
+            category = TREATMENT_CATEGORIES[i % len(TREATMENT_CATEGORIES)]
+            duration = rng.choice([10, 15, 30, 45, 60, 90])
+            treatments.append(self.Treatment(
+                uuid=self._uuid('treatment', i),
+                name=f'{category.title()} procedure {i + 1}',
+                code=f'GEN{self.seed}-{i:04d}',
+                description=f'Synthetic {category.lower()} treatment',
+                category=category,
+                base_cost=Decimal(round(rng.lognormvariate(5, 0.8), 2)).quantize(Decimal('0.01')),
+                insurance_coverage_percentage=Decimal(rng.choice([0, 50, 60, 70, 80, 90])),
+                estimated_duration_minutes=duration,
+                requires_specialist=category in ('SURGICAL', 'THERAPEUTIC'),
+            ))
+        self._insert(self.Treatment, treatments, 'Treatments')
+        return [(t.uuid, t.category, t.base_cost, t.estimated_duration_minutes) for t in treatments]
+
+    def generate_doctors(self):
+        rng = self.rng
+        password = '!'  # unusable password; hashing one per doctor would dominate the run time
+        users = [
+            self.User(
+                username=f'gen_dr_{self.seed}_{i}',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                email=f'dr{i}.{self.seed}@hospital.test',
+                password=password,
+            )
+            for i in range(self.n_doctors)
+        ]
+        self._insert(self.User, users, 'Doctor users')
+        user_ids = dict(
+            self.User.objects.filter(username__startswith=f'gen_dr_{self.seed}_').values_list('username', 'id')
+        )
+
+        specializations, spec_weights = _weighted(SPECIALIZATIONS)
+
+        def doctors():
+            for i, user in enumerate(users):
+                experience = min(50, int(rng.expovariate(1 / 12)))
+                yield self.Doctor(
+                    uuid=self._uuid('doctor', i),
+                    user_id=user_ids[user.username],
+                    license_number=f'G{self.seed % 1000:03d}{i:07d}',
+                    medical_degree=rng.choice(['MD', 'DO', 'MBBS']),
+                    specialization=rng.choices(specializations, cum_weights=spec_weights)[0],
+                    years_of_experience=experience,
+                    consultation_fee=Decimal(50 + 5 * experience + rng.randint(0, 100)),
+                    follow_up_fee=Decimal(25 + 2 * experience),
+                    availability_hours='Mon-Fri 8-16',
+                    is_accepting_new_patients=rng.random() < 0.8,
+                )
+
+        self._insert(self.Doctor, doctors(), 'Doctors')
+        return [self._uuid('doctor', i) for i in range(self.n_doctors)]
+
+    def generate_patients(self):
+        rng = self.rng
+
+        def patients():
+            for i in range(self.n_patients):
+                age = min(100, max(0, int(rng.gauss(45, 20))))
+                born = self.today - timedelta(days=age * 365 + rng.randint(0, 364))
+                yield self.Patient(
+                    uuid=self._uuid('patient', i),
+                    first_name=rng.choice(FIRST_NAMES),
+                    middle_name=rng.choice(FIRST_NAMES) if rng.random() < 0.3 else None,
+                    last_name=rng.choice(LAST_NAMES),
+                    gender=rng.choices('MFOP', cum_weights=[48, 97, 99, 100])[0],
+                    date_of_birth=born,
+                    email=f'patient{i}.{self.seed}@example.test' if rng.random() < 0.9 else None,
+                    phone_number=f'+20{rng.randint(10**9, 10**10 - 1)}',
+                    blood_type=rng.choice(['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']),
+                    is_active=rng.random() < 0.97,
+                )
+
+        self._insert(self.Patient, patients(), 'Patients')
+
+    def generate_cases_and_appointments(self, doctors, treatments):
+        """
+        Cases and their appointments are produced in the same pass so an
+        appointment always shares its case's patient and primary doctor.
+        """
+        rng = self.rng
+        statuses, status_weights = _weighted(CASE_STATUSES)
+        severities, severity_weights = _weighted(CASE_SEVERITIES)
+        appointment_types, type_weights = _weighted(APPOINTMENT_TYPES)
+        past_statuses, past_weights = _weighted(PAST_APPOINTMENT_STATUSES)
+        future_statuses, future_weights = _weighted(FUTURE_APPOINTMENT_STATUSES)
+        # A few doctors carry most of the load (Zipf-like).
+        raw_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(doctors))]
+        doctor_weights = list(accumulate(raw_weights))
+        # First free slot per doctor. A booking starts at or after it and
+        # moves it past every slot the appointment occupies, so a doctor's
+        # appointments never overlap. Each doctor's average gap is sized so
+        # their expected bookings span the whole window; the busiest doctors
+        # simply run further into the future.
+        next_slot = [0] * len(doctors)
+        window_slots = (HISTORY_DAYS + FUTURE_DAYS) * SLOTS_PER_DAY
+        expected_total = self.n_cases * APPOINTMENTS_PER_CASE
+        mean_span = sum(_span(duration) for *_, duration in treatments) / len(treatments)
+        max_gap = [
+            max(0, int(2 * (window_slots * doctor_weights[-1] / (expected_total * weight or 1) - mean_span)))
+            for weight in raw_weights
+        ]
+        first_day = self.today - timedelta(days=HISTORY_DAYS)
+        appointment_index = count()
+
+        def book(doctor_index, patient_id, case_id):
+            treatment_id, _, base_cost, duration = rng.choice(treatments)
+            span = _span(duration)
+            slot = next_slot[doctor_index] + rng.randint(0, max_gap[doctor_index])
+            if slot % SLOTS_PER_DAY + span > SLOTS_PER_DAY:
+                slot += SLOTS_PER_DAY - slot % SLOTS_PER_DAY  # would run past closing: next morning
+            next_slot[doctor_index] = slot + span
+            day = first_day + timedelta(days=slot // SLOTS_PER_DAY)
+            minutes = DAY_START_MINUTES + (slot % SLOTS_PER_DAY) * SLOT_MINUTES
+            past = day < self.today
+            if past:
+                status = rng.choices(past_statuses, cum_weights=past_weights)[0]
+            else:
+                status = rng.choices(future_statuses, cum_weights=future_weights)[0]
+            completed = status == 'COMPLETED'
+            return self.Appointment(
+                uuid=self._uuid('appointment', next(appointment_index)),
+                patient_id=patient_id,
+                doctor_id=doctors[doctor_index],
+                case_id=case_id,
+                treatment_id=treatment_id,
+                appointment_date=day,
+                appointment_time=f'{minutes // 60:02d}:{minutes % 60:02d}',
+                estimated_duration=max(SLOT_MINUTES, duration),
+                appointment_type=rng.choices(appointment_types, cum_weights=type_weights)[0],
+                purpose=rng.choice(COMPLAINTS),
+                status=status,
+                priority=rng.choices([1, 2, 3, 4], cum_weights=[3, 15, 85, 100])[0],
+                estimated_cost=base_cost,
+                actual_cost=(base_cost * Decimal(rng.uniform(0.9, 1.3))).quantize(Decimal('0.01')) if completed else Decimal('0.00'),
+                insurance_approved=completed and rng.random() < 0.7,
+                reminder_sent=past,
+            )
+
+        case_started = time.perf_counter()
+        case_total = appointment_total = 0
+        pending = []
+        for start in range(0, self.n_cases, self.batch_size):
+            cases = []
+            for i in range(start, min(start + self.batch_size, self.n_cases)):
+                # Skewed towards low indices: some patients have many cases.
+                patient_index = int(self.n_patients * rng.random() ** 2)
+                doctor_index = rng.choices(range(len(doctors)), cum_weights=doctor_weights)[0]
+                case = self.Case(
+                    uuid=self._uuid('case', i),
+                    patient_id=self._uuid('patient', patient_index),
+                    primary_doctor_id=doctors[doctor_index],
+                    referring_doctor_id=rng.choice(doctors) if rng.random() < 0.2 else None,
+                    chief_complaint=rng.choice(COMPLAINTS),
+                    symptoms_description='Synthetic case',
+                    status=rng.choices(statuses, cum_weights=status_weights)[0],
+                    priority=rng.choices([1, 2, 3, 4], cum_weights=[5, 20, 80, 100])[0],
+                    severity=rng.choices(severities, cum_weights=severity_weights)[0],
+                )
+                cases.append(case)
+                for _ in range(min(6, int(rng.expovariate(1 / 2.2)) + 1)):
+                    pending.append(book(doctor_index, case.patient_id, case.uuid))
+            with transaction.atomic():
+                self.Case.objects.bulk_create(cases)
+            case_total += len(cases)
+            # One walk-in without a case for every two cases: about one
+            # appointment in six.
+            for _ in range(len(cases) // 2):
+                patient_index = int(self.n_patients * rng.random())
+                doctor_index = rng.choices(range(len(doctors)), cum_weights=doctor_weights)[0]
+                pending.append(book(doctor_index, self._uuid('patient', patient_index), None))
+            while len(pending) >= self.batch_size:
+                chunk, pending = pending[:self.batch_size], pending[self.batch_size:]
+                with transaction.atomic():
+                    self.Appointment.objects.bulk_create(chunk)
+                appointment_total += len(chunk)
+        if pending:
+            with transaction.atomic():
+                self.Appointment.objects.bulk_create(pending)
+            appointment_total += len(pending)
+
+        elapsed = time.perf_counter() - case_started
+        rate = (case_total + appointment_total) / elapsed if elapsed else 0
+        self.stdout.write(f"Cases: {case_total} rows, appointments: {appointment_total} rows ({rate:.0f} rows/sec)")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Stream a CSV/NDJSON feed of patients, cases or appointments into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['patients', 'cases', 'appointments'])
+        parser.add_argument('path', help='Feed file (.csv, .ndjson or .jsonl)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Override the format guessed from the extension')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per COPY/executemany batch')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        from django.db import IntegrityError
+        from e_health.importers import FeedError, FeedImporter, read_rows
+        from e_health.models import Appointment, Case, Patient
+        from e_health.stats import rebuild_doctor_stats
+
+        model = {'patients': Patient, 'cases': Case, 'appointments': Appointment}[options['kind']]
+
+        def progress(total, elapsed):
+            self.stdout.write(f"{total} rows ({total / elapsed if elapsed else 0:.0f} rows/sec)")
+
+        importer = FeedImporter(
+            model, using=options['database'], batch_size=options['batch_size'], progress=progress,
+        )
+        try:
+            total = importer.run(read_rows(options['path'], options['format']))
+        except (FeedError, IntegrityError, OSError) as exc:
+            raise CommandError(str(exc)) from exc
+        if model is not Patient:
+            # The import bypasses the save hooks that keep DoctorStats current.
+            rebuild_doctor_stats(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Imported {total} {options['kind']}"))
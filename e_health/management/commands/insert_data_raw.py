@@ -1,10 +1,8 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from e_health.models import Patient, Doctor, Case, Treatment, Appointment
-# ? for custom query examples
-from django.db import connections
+from e_health.profiling import ProfiledCommandMixin
+from core.db_routers import StickyCommandMixin
 
-class Command(BaseCommand):
+class Command(ProfiledCommandMixin, StickyCommandMixin, BaseCommand):
     help = 'Insert sample data and run test queries'
 
     def handle(self, *args, **options):
@@ -12,6 +10,9 @@ class Command(BaseCommand):
         self.test_queries()
 
     def insert_sample_data(self):
+        # Imported here, not at module level, so loading the command stays cheap.
+        from django.contrib.auth.models import User
+        from e_health.models import Patient, Doctor, Case, Treatment, Appointment
         
         Appointment.objects.all().delete()  
         Case.objects.all().delete()  
@@ -137,6 +138,9 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f"Created {Case.objects.count()} cases"))  
         self.stdout.write(self.style.SUCCESS(f"Created {Appointment.objects.count()} appointments"))
     def test_queries(self):
+        from e_health.models import Patient, Doctor
+        # ? for custom query examples
+        from django.db import connections
         print("ORM example:")
         for p in Patient.objects.filter(last_name="Smith"):
             print("ORM ->", p.first_name, p.last_name)
@@ -56,4 +56,50 @@ Ticket.objects.annotate(
 ...     worst=Window(
 ...         expression=Min("rating"),
 ...         **window,
-...  """
\ No newline at end of file
+...  """
+
+
+from django.core.management.base import BaseCommand
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    # ? Refrence : https://docs.djangoproject.com/en/5.1/ref/models/expressions/
+    help = 'Run example queries with F() expressions, ExpressionWrapper and window functions'
+
+    def handle(self, *args, **options):
+        self.test_queries()
+
+    def test_queries(self):
+        # Imported here, not at module level, so loading the command stays cheap.
+        from django.db.models import Avg, DecimalField, ExpressionWrapper, F, Window
+        from django.db.models.functions import Rank
+        from e_health.models import Appointment, Case, Doctor
+
+        # * F() arithmetic: computed by the database, no rows loaded into Python *
+        res = Doctor.objects.annotate(total_fee=F('consultation_fee') + F('follow_up_fee')).values(
+            'license_number', 'consultation_fee', 'follow_up_fee', 'total_fee',
+        )[:5]
+        print("SQL Query:", str(res.query))
+        print("Fees:", list(res))
+
+        # * F() in a filter: compares two columns of the same row *
+        print("Cases over their estimate:", Case.objects.filter(actual_cost__gt=F('estimated_cost')).count())
+
+        # * ExpressionWrapper: declares the output type of mixed arithmetic *
+        res = Appointment.objects.filter(status='COMPLETED').annotate(
+            overrun=ExpressionWrapper(F('actual_cost') - F('estimated_cost'), output_field=DecimalField()),
+        ).values('appointment_date', 'estimated_cost', 'actual_cost', 'overrun')[:5]
+        print("=======================================================================")
+        print("SQL Query:", str(res.query))
+        print("Cost overruns:", list(res))
+
+        # * Window functions: per-row values over a partition *
+        window = {'partition_by': [F('specialization')]}
+        res = Doctor.objects.annotate(
+            avg_fee=Window(expression=Avg('consultation_fee'), **window),
+            fee_rank=Window(expression=Rank(), order_by=F('consultation_fee').desc(), **window),
+        ).values('license_number', 'specialization', 'consultation_fee', 'avg_fee', 'fee_rank')[:5]
+        print("=======================================================================")
+        print("SQL Query:", str(res.query))
+        print("Fee ranks:", list(res))
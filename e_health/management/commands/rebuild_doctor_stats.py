@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Recompute the DoctorStats summary table, or check it for drift with --check'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the table with freshly computed values; fail on drift')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        from e_health.stats import check_doctor_stats, rebuild_doctor_stats
+
+        started = time.perf_counter()
+        if options['check']:
+            drift = check_doctor_stats(using=options['database'])
+            for doctor_id, column, stored, expected in drift[:50]:
+                self.stdout.write(f"{doctor_id} {column}: stored {stored}, expected {expected}")
+            if drift:
+                raise CommandError(f'{len(drift)} drifted value(s); run rebuild_doctor_stats to fix them')
+            self.stdout.write(self.style.SUCCESS(f"DoctorStats is consistent ({time.perf_counter() - started:.1f}s)"))
+            return
+        rows = rebuild_doctor_stats(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} doctor stats rows in {time.perf_counter() - started:.1f}s"))
@@ -1,13 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from e_health.models import Patient, Doctor, Case, Treatment, Appointment
-from django.db.models import F, ExpressionWrapper, DecimalField,Count,window
+from e_health.profiling import ProfiledCommandMixin
 
-# ? for custom query examples
-from django.db import connections
-from django.db.models import F, Func
-
-class Command(BaseCommand):
+class Command(ProfiledCommandMixin, BaseCommand):
       # ? Refrence :
     help = 'Run test queries for data searching'
 
@@ -17,6 +11,11 @@ class Command(BaseCommand):
 
 
     def test_queries(self):
+        # Imported here, not at module level, so loading the command stays cheap.
+        from e_health.models import Patient, Doctor, Appointment
+        from django.db.models import F, ExpressionWrapper, DecimalField,Count
+        # ? for custom query examples
+        from django.db.models import Func
         print("Exact matching search (only this value):")
         for p in Patient.objects.filter(last_name="Smith"):
             print("ORM ->", p.first_name, p.last_name)
@@ -32,7 +31,7 @@ class Command(BaseCommand):
             print("ORM ->", p.first_name)
 
         print("Case-insensitive search in specialization:")
-        for d in Doctor.objects.filter(specialization__icontains="cardio"):
+        for d in Doctor.objects.for_listing().filter(specialization__icontains="cardio"):
             print("ORM ->", d.user.first_name, d.user.last_name, d.specialization)
             
             
@@ -46,6 +45,12 @@ class Command(BaseCommand):
         
         # for p in Patient.objects.filter(first_name__trigram_similar="john"):
         #     print("ORM ->", p.first_name)
+
+        print("Ranked, accent-insensitive search (e_health.search):")
+        # * Uses pg_trgm + unaccent on PostgreSQL and an FTS5 table on SQLite, so "helene" also finds "Hélène"
+        from e_health.search import search_patients
+        for p in search_patients("helene"):
+            print("ORM ->", p.full_name, p.email, round(p.rank, 3))
         
 
         print("Date range search:")
@@ -53,7 +58,7 @@ class Command(BaseCommand):
         from datetime import date
         start_date = date(2024, 11, 1)
         end_date = date(2025, 11, 25)
-        for a in Appointment.objects.filter(appointment_date__range=(start_date, end_date)):
+        for a in Appointment.objects.for_listing().filter(appointment_date__range=(start_date, end_date)):
             print("ORM ->", a.patient.first_name,a.appointment_date)
             
             
@@ -74,7 +79,7 @@ class Command(BaseCommand):
 
         #
 
-        doctors_with_appointments = Doctor.objects.annotate(
+        doctors_with_appointments = Doctor.objects.for_listing().annotate(
             has_appointments=Exists(appointment_subquery)
         )
 
@@ -88,7 +93,7 @@ class Command(BaseCommand):
             appointment_date=f'2025-11-25',
         )
         
-        patient_going_appointments = Appointment.objects.filter(patient_id__in=Subquery(appoinments.values('patient_id')))
+        patient_going_appointments = Appointment.objects.for_listing().filter(patient_id__in=Subquery(appoinments.values('patient_id')))
         print(f"patient_going_appointments: {patient_going_appointments}")
         
         from django.db.models import Case, When, Value, IntegerField, Q
@@ -113,7 +118,7 @@ class Command(BaseCommand):
 
 
         
-        filter_when=Appointment.objects.annotate(is_overpriced=Case(
+        filter_when=Appointment.objects.for_listing().annotate(is_overpriced=Case(
     When(GreaterThanOrEqual(F('actual_cost'), F('estimated_cost')), then=Value(1)),
  
     )  )
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Send appointment reminders in batches; safe to run in several processes at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-hours', type=float, default=24,
+                            help='Remind about appointments starting within this many hours')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--sender', default='console',
+                            help="'console', 'file' or the dotted path of a sender class")
+        parser.add_argument('--output', default='reminders.jsonl', help='File written by the file sender')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Give up on a reminder after this many failed deliveries')
+        parser.add_argument('--retry-minutes', type=float, default=5,
+                            help='Wait before retrying a failed delivery, doubled after each failure')
+        parser.add_argument('--once', action='store_true', help='Exit when nothing is due instead of polling')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when idle')
+        parser.add_argument('--max-batches', type=int)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        from e_health.reminders import ReminderDispatcher, get_sender
+
+        kwargs = {'console': {'stream': self.stdout}, 'file': {'path': options['output']}}.get(options['sender'], {})
+        dispatcher = ReminderDispatcher(
+            get_sender(options['sender'], **kwargs),
+            lead=timedelta(hours=options['lead_hours']),
+            batch_size=options['batch_size'],
+            using=options['database'],
+            max_attempts=options['max_attempts'],
+            retry_delay=timedelta(minutes=options['retry_minutes']),
+        )
+
+        def report(metrics):
+            summary = metrics.summary()
+            self.stderr.write(
+                f"batch {summary['batches']}: {summary['sent']} sent, {summary['failed']} failed, "
+                f"{summary['per_sec']}/s, lag p95 {summary['lag_p95_s']}s"
+            )
+
+        try:
+            metrics = dispatcher.run(
+                once=options['once'], poll_interval=options['poll_interval'],
+                max_batches=options['max_batches'], on_batch=report,
+            )
+        except KeyboardInterrupt:
+            metrics = dispatcher.metrics
+        summary = metrics.summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {summary['sent']} reminders in {summary['batches']} batches ({summary['per_sec']}/s); "
+            f"{summary['failed']} failed, {summary['gave_up']} given up; lag p50 {summary['lag_p50_s']}s, p95 {summary['lag_p95_s']}s, "
+            f"max {summary['lag_max_s']}s"
+        ))
@@ -0,0 +1,83 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_health.profiling import ProfiledCommandMixin
+
+TARGETS = {
+    'help': ['manage.py', '--help'],
+    'setup': ['-c', 'import django; django.setup()'],
+    'wsgi': ['-c', 'import core.wsgi'],
+    'asgi': ['-c', 'import core.asgi'],
+}
+
+# import time: self [us] | cumulative | imported package
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)')
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Measure startup time of manage.py and the WSGI/ASGI apps, and import time per module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*',
+                            help='What to start: help (manage.py --help), setup (django.setup()), wsgi, asgi')
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per target (default 5)')
+        parser.add_argument('--top', type=int, default=15, help='Modules and packages to list (default 15)')
+        parser.add_argument('--budget-ms', type=float,
+                            help='Fail when a target median startup time is above this many milliseconds')
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        targets = options['targets'] or ['help', 'wsgi']
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown target(s) {', '.join(sorted(unknown))}; choose from {', '.join(TARGETS)}")
+        over_budget = []
+        for target in targets:
+            argv = [sys.executable, *TARGETS[target]]
+            timings = [self.run(argv, settings.BASE_DIR)[0] for _ in range(max(1, options['repeat']))]
+            median = statistics.median(timings)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{target}: median {median:.0f} ms, min {min(timings):.0f} ms over {len(timings)} runs"
+            ))
+            modules, packages = self.import_times(argv, settings.BASE_DIR)
+            self.write_table('self time by package', packages, options['top'])
+            self.write_table('self time by module', modules, options['top'])
+            if options['budget_ms'] is not None and median > options['budget_ms']:
+                over_budget.append(f'{target} {median:.0f} ms')
+        if over_budget:
+            raise CommandError(f"Over the {options['budget_ms']:.0f} ms budget: {', '.join(over_budget)}")
+
+    def run(self, argv, cwd, *extra):
+        started = time.perf_counter()
+        completed = subprocess.run([argv[0], *extra, *argv[1:]], cwd=cwd, env=os.environ,
+                                   capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if completed.returncode:
+            raise CommandError(f"{' '.join(argv[1:])} failed:\n{completed.stderr}")
+        return elapsed, completed.stderr
+
+    def import_times(self, argv, cwd):
+        """``(modules, packages)``: self ms per module and per top-level package."""
+        _, output = self.run(argv, cwd, '-X', 'importtime')
+        modules, packages = {}, defaultdict(float)
+        for line in output.splitlines():
+            match = _IMPORTTIME.match(line)
+            if not match:
+                continue
+            own, name = int(match.group(1)) / 1000, match.group(2)
+            modules[name] = own
+            packages[name.split('.')[0]] += own
+        return modules, packages
+
+    def write_table(self, title, timings, top):
+        self.stdout.write(f"  {title}:")
+        for name, ms in sorted(timings.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"    {ms:8.1f} ms  {name}")
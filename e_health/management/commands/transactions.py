@@ -1 +1,42 @@
-# https://docs.djangoproject.com/en/5.1/topics/db/transactions/
\ No newline at end of file
+# https://docs.djangoproject.com/en/5.1/topics/db/transactions/
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from e_health.profiling import ProfiledCommandMixin
+
+
+class Command(ProfiledCommandMixin, BaseCommand):
+    help = 'Recompute case billing (actual cost, insurance coverage, patient liability) from appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Cases per UPDATE (default 5000)')
+        parser.add_argument('--status', action='append', help='Only cases with this status (repeatable)')
+        parser.add_argument('--all-or-nothing', action='store_true',
+                            help='Run every chunk inside one transaction (each chunk a savepoint) '
+                                 'instead of committing chunk by chunk')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        from e_health.billing import recompute_case_billing
+        from e_health.models import Case
+
+        using = options['database']
+        queryset = Case.objects.all()
+        if options['status']:
+            queryset = queryset.filter(status__in=options['status'])
+
+        def progress(run):
+            self.stderr.write(f"\r{run.cases} cases, {run.updated} updated", ending='')
+
+        started = time.perf_counter()
+        with transaction.atomic(using=using, durable=True) if options['all_or_nothing'] else nullcontext():
+            run = recompute_case_billing(queryset, chunk_size=options['chunk_size'], using=using, on_chunk=progress)
+        elapsed = time.perf_counter() - started
+        self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Billed {run.cases} cases in {run.chunks} chunks ({run.updated} changed) in {elapsed:.1f}s"
+        ))
+
@@ -0,0 +1,170 @@
+"""
+Querysets for the e_health models.
+
+Besides model specific helpers, each queryset offers named loading profiles
+that fetch the relations a given screen reads, so iterating the results does
+not issue one query per row:
+
+* ``for_listing()``: the relations used by ``__str__`` and list screens.
+* ``for_detail()``: ``for_listing()`` plus the relations shown on a detail page.
+"""
+from datetime import date
+
+from django.db import models, router
+from django.utils import timezone
+from django.db.models import Case, Prefetch, Q, Value, When
+from django.db.models.functions import ExtractYear
+
+from e_health.allocators import case_numbers
+
+
+def _years_before(day, years):
+    """``day`` moved back ``years`` years; 29 February becomes the 28th."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+class PatientQuerySet(models.QuerySet):
+    def with_age(self, as_of=None):
+        """
+        Annotate ``age`` (completed years on ``as_of``, default today) in SQL,
+        so it can be filtered, ordered and aggregated in the database.
+        """
+        as_of = as_of or date.today()
+        birthday_ahead = (
+            Q(date_of_birth__month__gt=as_of.month)
+            | Q(date_of_birth__month=as_of.month, date_of_birth__day__gt=as_of.day)
+        )
+        return self.annotate(age=(
+            Value(as_of.year) - ExtractYear('date_of_birth')
+            - Case(When(birthday_ahead, then=Value(1)), default=Value(0))
+        ))
+
+    def age_between(self, lo=None, hi=None, as_of=None):
+        """
+        Patients aged ``lo`` to ``hi`` years inclusive (either bound optional),
+        expressed as a ``date_of_birth`` range so the index on that column
+        serves it; no per-row age computation is involved.
+        """
+        as_of = as_of or date.today()
+        condition = Q()
+        if lo is not None:
+            condition &= Q(date_of_birth__lte=_years_before(as_of, lo))
+        if hi is not None:
+            condition &= Q(date_of_birth__gt=_years_before(as_of, hi + 1))
+        return self.filter(condition)
+
+    def for_listing(self):
+        return self
+
+    def for_detail(self):
+        from e_health.models import Appointment, Case
+
+        return self.prefetch_related(
+            Prefetch('cases', queryset=Case.objects.select_related('primary_doctor__user', 'referring_doctor__user')),
+            Prefetch('appointments', queryset=Appointment.objects.select_related('doctor__user', 'treatment')),
+        )
+
+
+class DoctorQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related('user')
+
+    def for_detail(self):
+        return self.for_listing()
+
+
+class CaseQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related('patient', 'primary_doctor__user', 'referring_doctor__user')
+
+    def for_detail(self):
+        from e_health.models import Appointment
+
+        return self.for_listing().prefetch_related(
+            Prefetch('appointments', queryset=Appointment.objects.select_related('doctor__user', 'treatment')),
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Number every case that does not have a ``case_number`` yet.
+
+        ``bulk_create`` skips ``Case.save()``, so the numbers are reserved here
+        in one allocator call for the whole batch.
+        """
+        objs = list(objs)
+        missing = [obj for obj in objs if not obj.case_number]
+        if missing:
+            using = self.db if self._db else router.db_for_write(self.model)
+            for obj, number in zip(missing, case_numbers.allocate(len(missing), using=using)):
+                obj.case_number = number
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+# Appointments that still need to happen; the partial index
+# ``appointment_active_idx`` covers exactly these rows.
+ACTIVE_STATUSES = ('SCHEDULED', 'CONFIRMED')
+
+
+def _local_now(now=None):
+    """
+    ``now`` (default: the current time) as a date and time in the current
+    time zone. Naive datetimes are taken to be local already.
+    """
+    if now is None or timezone.is_aware(now):
+        now = timezone.localtime(now)
+    return now.date(), now.time()
+
+
+def _after(day, at):
+    return Q(appointment_date__gte=day) & (Q(appointment_date__gt=day) | Q(appointment_date=day, appointment_time__gt=at))
+
+
+def _at_or_before(day, at):
+    return Q(appointment_date__lte=day) & (Q(appointment_date__lt=day) | Q(appointment_date=day, appointment_time__lte=at))
+
+
+class AppointmentQuerySet(models.QuerySet):
+    """
+    ``appointment_date`` and ``appointment_time`` are wall-clock values in
+    the clinic's time zone (the current time zone, ``TIME_ZONE`` by default),
+    so the time-based filters compare them with the local date and time,
+    entirely in SQL. Each filter leads with a plain ``appointment_date`` range
+    so the index can seek to it.
+    """
+
+    def active(self):
+        return self.filter(status__in=ACTIVE_STATUSES)
+
+    def upcoming(self, now=None, statuses=ACTIVE_STATUSES):
+        """
+        Appointments starting after ``now``. Only scheduled and confirmed ones
+        by default; pass ``statuses=None`` for every status.
+        """
+        queryset = self.filter(status__in=statuses) if statuses else self
+        return queryset.filter(_after(*_local_now(now)))
+
+    def past(self, now=None, statuses=None):
+        """
+        Appointments that started at or before ``now``, whatever their status
+        unless ``statuses`` is given.
+        """
+        queryset = self.filter(status__in=statuses) if statuses else self
+        return queryset.filter(_at_or_before(*_local_now(now)))
+
+    def overdue(self, now=None):
+        """Past appointments still scheduled or confirmed."""
+        return self.past(now, ACTIVE_STATUSES)
+
+    def due_within(self, delta, now=None, statuses=ACTIVE_STATUSES):
+        """Upcoming appointments starting no later than ``now + delta``."""
+        now = now or timezone.now()
+        return self.upcoming(now, statuses).filter(_at_or_before(*_local_now(now + delta)))
+
+    def for_listing(self):
+        return self.select_related('patient', 'doctor__user', 'treatment')
+
+    def for_detail(self):
+        return self.for_listing().select_related('case')
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:48
+
+import datetime
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    """Start each day's counter after the highest number already issued that day."""
+    Case = apps.get_model('e_health', 'Case')
+    CaseNumberCounter = apps.get_model('e_health', 'CaseNumberCounter')
+    db = schema_editor.connection.alias
+    last_values = {}
+    for number in Case.objects.using(db).values_list('case_number', flat=True).iterator():
+        try:
+            day = datetime.datetime.strptime(number[4:12], '%Y%m%d').date()
+            value = int(number[12:])
+        except ValueError:
+            continue
+        last_values[day] = max(value, last_values.get(day, 0))
+    CaseNumberCounter.objects.using(db).bulk_create(
+        CaseNumberCounter(day=day, last_value=value) for day, value in last_values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0002_testcustomfielmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseNumberCounter',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'case_number_counter',
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
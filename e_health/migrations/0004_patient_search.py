@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# Not UnaccentExtension()/TrigramExtension(): their reverse queries
+# pg_extension on every backend, which fails on SQLite.
+PG_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # unaccent() is only STABLE; index expressions need an IMMUTABLE function.
+    """
+    CREATE OR REPLACE FUNCTION e_health_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS patient_search_trgm_idx ON patient USING gin (
+        e_health_unaccent(lower(first_name || ' ' || coalesce(middle_name, '') || ' '
+        || last_name || ' ' || coalesce(email, ''))) gin_trgm_ops
+    )
+    """,
+]
+PG_BACKWARD = [
+    'DROP INDEX IF EXISTS patient_search_trgm_idx',
+    'DROP FUNCTION IF EXISTS e_health_unaccent(text)',
+    'DROP EXTENSION IF EXISTS pg_trgm',
+    'DROP EXTENSION IF EXISTS unaccent',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE patient_search USING fts5(
+        uuid UNINDEXED, name, email, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO patient_search (uuid, name, email)
+    SELECT uuid, first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name, coalesce(email, '')
+    FROM patient
+    """,
+    """
+    CREATE TRIGGER patient_search_insert AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_search (uuid, name, email) VALUES (
+            new.uuid, new.first_name || ' ' || coalesce(new.middle_name, '') || ' ' || new.last_name,
+            coalesce(new.email, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER patient_search_update AFTER UPDATE OF uuid, first_name, middle_name, last_name, email
+    ON patient BEGIN
+        DELETE FROM patient_search WHERE uuid = old.uuid;
+        INSERT INTO patient_search (uuid, name, email) VALUES (
+            new.uuid, new.first_name || ' ' || coalesce(new.middle_name, '') || ' ' || new.last_name,
+            coalesce(new.email, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER patient_search_delete AFTER DELETE ON patient BEGIN
+        DELETE FROM patient_search WHERE uuid = old.uuid;
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS patient_search_delete',
+    'DROP TRIGGER IF EXISTS patient_search_update',
+    'DROP TRIGGER IF EXISTS patient_search_insert',
+    'DROP TABLE IF EXISTS patient_search',
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor == 'sqlite' and not _sqlite_has_fts5(connection):
+            return  # search_patients() falls back to icontains
+        for statement in statements_by_vendor.get(connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0003_case_number_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': PG_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': PG_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:58
+
+import e_health.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0004_patient_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcustomfielmodel',
+            name='packed_numbers',
+            field=e_health.fields.CommaSeparatedCharField(blank=True, default=list, max_length=255, storage='array'),
+        ),
+        migrations.AddIndex(
+            model_name='testcustomfielmodel',
+            index=e_health.fields.IntListIndex(fields=['packed_numbers'], name='test_custom_packed_idx'),
+        ),
+    ]
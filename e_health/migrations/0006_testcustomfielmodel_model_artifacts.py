@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:03
+
+import e_health.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0005_testcustomfielmodel_packed_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcustomfielmodel',
+            name='model_artifact',
+            field=e_health.fields.ModelArtifactField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testcustomfielmodel',
+            name='model_file',
+            field=e_health.fields.ModelArtifactField(blank=True, null=True, storage='file', upload_to='test_artifacts'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0006_testcustomfielmodel_model_artifacts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'uuid'], name='appointment_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['-created_at', '-uuid'], name='case_created_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorStats',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='e_health.doctor')),
+                ('cases_open', models.IntegerField(default=0)),
+                ('cases_in_progress', models.IntegerField(default=0)),
+                ('cases_under_review', models.IntegerField(default=0)),
+                ('cases_resolved', models.IntegerField(default=0)),
+                ('cases_closed', models.IntegerField(default=0)),
+                ('cases_referred', models.IntegerField(default=0)),
+                ('appointments_scheduled', models.IntegerField(default=0)),
+                ('appointments_confirmed', models.IntegerField(default=0)),
+                ('appointments_in_progress', models.IntegerField(default=0)),
+                ('appointments_completed', models.IntegerField(default=0)),
+                ('appointments_cancelled', models.IntegerField(default=0)),
+                ('appointments_no_show', models.IntegerField(default=0)),
+                ('appointments_rescheduled', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Doctor statistics',
+                'verbose_name_plural': 'Doctor statistics',
+                'db_table': 'doctor_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0008_doctor_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_of_birth'], name='patient_date_of_8742a5_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0009_patient_date_of_birth_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['SCHEDULED', 'CONFIRMED'])), fields=['appointment_date', 'appointment_time'], name='appointment_active_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+"""
+Key the SQLite FTS5 table by rowid.
+
+``uuid`` is UNINDEXED in an FTS5 table, so the ``DELETE ... WHERE uuid =
+old.uuid`` the 0004 triggers ran on every patient update and delete scanned
+the whole index. ``patient_search_key`` now maps each patient to a stable
+integer id, used as the FTS rowid, and the triggers find the row through it.
+The ``patient`` table's own rowid is not used because VACUUM may renumber it.
+"""
+from importlib import import_module
+
+from django.db import migrations
+
+NAME = "new.first_name || ' ' || coalesce(new.middle_name, '') || ' ' || new.last_name"
+KEY_OF = 'SELECT id FROM patient_search_key WHERE uuid = {}.uuid'
+
+FORWARD = [
+    'DROP TRIGGER IF EXISTS patient_search_delete',
+    'DROP TRIGGER IF EXISTS patient_search_update',
+    'DROP TRIGGER IF EXISTS patient_search_insert',
+    'DROP TABLE IF EXISTS patient_search',
+    'CREATE TABLE patient_search_key (id INTEGER PRIMARY KEY, uuid char(32) NOT NULL UNIQUE)',
+    """
+    CREATE VIRTUAL TABLE patient_search USING fts5(
+        name, email, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    'INSERT INTO patient_search_key (uuid) SELECT uuid FROM patient',
+    """
+    INSERT INTO patient_search (rowid, name, email)
+    SELECT patient_search_key.id,
+        first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name, coalesce(email, '')
+    FROM patient JOIN patient_search_key ON patient_search_key.uuid = patient.uuid
+    """,
+    f"""
+    CREATE TRIGGER patient_search_insert AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_search_key (uuid) VALUES (new.uuid);
+        INSERT INTO patient_search (rowid, name, email) VALUES (
+            ({KEY_OF.format('new')}), {NAME}, coalesce(new.email, '')
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER patient_search_update AFTER UPDATE OF uuid, first_name, middle_name, last_name, email
+    ON patient BEGIN
+        UPDATE patient_search_key SET uuid = new.uuid WHERE uuid = old.uuid AND new.uuid != old.uuid;
+        UPDATE patient_search SET name = {NAME}, email = coalesce(new.email, '')
+        WHERE rowid = ({KEY_OF.format('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER patient_search_delete AFTER DELETE ON patient BEGIN
+        DELETE FROM patient_search WHERE rowid = ({KEY_OF.format('old')});
+        DELETE FROM patient_search_key WHERE uuid = old.uuid;
+    END
+    """,
+]
+BACKWARD = [
+    'DROP TRIGGER IF EXISTS patient_search_delete',
+    'DROP TRIGGER IF EXISTS patient_search_update',
+    'DROP TRIGGER IF EXISTS patient_search_insert',
+    'DROP TABLE IF EXISTS patient_search',
+    'DROP TABLE IF EXISTS patient_search_key',
+    # Then the 0004 layout again.
+    *import_module('e_health.migrations.0004_patient_search').SQLITE_FORWARD,
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            if 'patient_search' not in connection.introspection.table_names(cursor):
+                return  # no FTS5; search_patients() falls back to icontains
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0010_appointment_active_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD), _run(BACKWARD)),
+    ]
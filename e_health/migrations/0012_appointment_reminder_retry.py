@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0011_patient_search_rowid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_health', '0012_appointment_reminder_retry'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='patient',
+            options={'ordering': ['last_name', 'first_name'], 'permissions': [('view_clinical_data', 'Can view clinical notes of patients, cases and appointments')], 'verbose_name': 'Patient', 'verbose_name_plural': 'Patients'},
+        ),
+    ]
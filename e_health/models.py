@@ -1,10 +1,28 @@
-from django.db import models
+from django.db import models, router
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
-from e_health.fields import CommaSeparatedCharField
+from e_health.allocators import case_numbers
+from e_health.fields import CommaSeparatedCharField, IntListIndex, ModelArtifactField
+from e_health.managers import AppointmentQuerySet, CaseQuerySet, DoctorQuerySet, PatientQuerySet
+
+class LoadedValuesMixin:
+    """
+    Keeps the values of ``tracked_fields`` (attnames) as they were loaded from
+    the database in ``_loaded_values``, so save hooks can compute deltas
+    without another query. See ``e_health.stats`` and ``e_health.cache``.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {name: loaded[name] for name in cls.tracked_fields if name in loaded}
+        return instance
+
 
 # Create your models here.
 class Patient (models.Model):
@@ -44,11 +62,21 @@ class Patient (models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PatientQuerySet.as_manager()
+    
     class Meta:
         db_table = 'patient'
         ordering = ['last_name', 'first_name']
         verbose_name = 'Patient'
         verbose_name_plural = 'Patients'
+        permissions = [
+            # Gates the clinical fields of the patient, case and appointment API.
+            ('view_clinical_data', 'Can view clinical notes of patients, cases and appointments'),
+        ]
+        indexes = [
+            # Serves age_between() ranges.
+            models.Index(fields=['date_of_birth']),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -60,11 +88,18 @@ class Patient (models.Model):
     
     @property
     def age(self):
+        # Set by Patient.objects.with_age(), which computes it in SQL.
+        if '_age' in self.__dict__:
+            return self.__dict__['_age']
         from datetime import date
         today = date.today()
         return today.year - self.date_of_birth.year - (
             (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
         )
+
+    @age.setter
+    def age(self, value):
+        self.__dict__['_age'] = value
 class Doctor (models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -101,6 +136,8 @@ class Doctor (models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DoctorQuerySet.as_manager()
+    
     class Meta:
         db_table = 'doctor'
         ordering = ['user__last_name', 'user__first_name']
@@ -109,7 +146,7 @@ class Doctor (models.Model):
     
     def __str__(self):
         return f"Dr. {self.user.get_full_name()}"
-class Case (models.Model):
+class Case (LoadedValuesMixin, models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # Case Identification
@@ -185,6 +222,9 @@ class Case (models.Model):
     notes = models.TextField(blank=True)
     is_confidential = models.BooleanField(default=False)
     
+    objects = CaseQuerySet.as_manager()
+    tracked_fields = ('primary_doctor_id', 'status', 'patient_id')
+    
     class Meta:
         db_table = 'case'
         ordering = ['-created_at']
@@ -193,6 +233,8 @@ class Case (models.Model):
         indexes = [
             models.Index(fields=['status', 'priority']),
             models.Index(fields=['patient', 'created_at']),
+            # Keyset pagination over the default ordering (uuid breaks ties).
+            models.Index(fields=['-created_at', '-uuid'], name='case_created_keyset_idx'),
         ]
     
     def __str__(self):
@@ -200,9 +242,21 @@ class Case (models.Model):
     
     def save(self, *args, **kwargs):
         if not self.case_number:
-            self.case_number = f"CASE{timezone.now().strftime('%Y%m%d')}{Case.objects.count() + 1:04d}"
+            using = kwargs.get('using') or router.db_for_write(Case, instance=self)
+            self.case_number = case_numbers.next(using=using)
         super().save(*args, **kwargs)
 
+class CaseNumberCounter(models.Model):
+    """Last case sequence value handed out per day, see ``e_health.allocators``."""
+    day = models.DateField(primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'case_number_counter'
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
 class Treatment (models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -275,7 +329,7 @@ class Treatment (models.Model):
     def __str__(self):
         return f"{self.name} ({self.category})"
 
-class Appointment (models.Model):
+class Appointment (LoadedValuesMixin, models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # Relationships
@@ -353,6 +407,9 @@ class Appointment (models.Model):
     # Communication
     reminder_sent = models.BooleanField(default=False)
     reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    # Failed reminder deliveries, and when the next may be tried.
+    reminder_attempts = models.PositiveSmallIntegerField(default=0)
+    reminder_retry_at = models.DateTimeField(null=True, blank=True)
     patient_contacted = models.BooleanField(default=False)
     
     # Outcome and Follow-up
@@ -369,6 +426,9 @@ class Appointment (models.Model):
     notes = models.TextField(blank=True)
     cancellation_reason = models.CharField(max_length=200, blank=True)
     
+    objects = AppointmentQuerySet.as_manager()
+    tracked_fields = ('doctor_id', 'status', 'actual_cost', 'patient_id')
+    
     class Meta:
         db_table = 'appointment'
         ordering = ['appointment_date', 'appointment_time']
@@ -378,6 +438,13 @@ class Appointment (models.Model):
             models.Index(fields=['appointment_date', 'doctor']),
             models.Index(fields=['patient', 'appointment_date']),
             models.Index(fields=['status', 'appointment_date']),
+            # Keyset pagination over the default ordering (uuid breaks ties).
+            models.Index(fields=['appointment_date', 'appointment_time', 'uuid'], name='appointment_keyset_idx'),
+            # upcoming()/overdue()/due_within() on scheduled and confirmed rows only.
+            models.Index(
+                fields=['appointment_date', 'appointment_time'], name='appointment_active_idx',
+                condition=models.Q(status__in=['SCHEDULED', 'CONFIRMED']),
+            ),
         ]
         unique_together = ['doctor', 'appointment_date', 'appointment_time']
     
@@ -386,10 +453,10 @@ class Appointment (models.Model):
     
     @property
     def is_upcoming(self):
-        from datetime import datetime
-        now = datetime.now()
-        appointment_datetime = datetime.combine(self.appointment_date, self.appointment_time)
-        return appointment_datetime > now
+        # Same rule as Appointment.objects.upcoming(statuses=None): the stored
+        # date and time are wall-clock values in the current time zone.
+        now = timezone.localtime()
+        return (self.appointment_date, self.appointment_time) > (now.date(), now.time())
     
     @property
     def duration_actual(self):
@@ -397,13 +464,59 @@ class Appointment (models.Model):
             delta = self.actual_end_time - self.actual_start_time
             return delta.total_seconds() / 60  # Return minutes
         return None
-    
-    
-    
-    
-    
+
+
+class DoctorStats(models.Model):
+    """
+    Per-doctor dashboard counters, kept up to date by ``e_health.stats``:
+    ``Case`` and ``Appointment`` saves and deletes apply ``F()`` deltas, and
+    ``rebuild_doctor_stats`` recomputes the table from scratch.
+
+    Cases count towards their ``primary_doctor``; revenue is the
+    ``actual_cost`` of completed appointments.
+    """
+    doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    cases_open = models.IntegerField(default=0)
+    cases_in_progress = models.IntegerField(default=0)
+    cases_under_review = models.IntegerField(default=0)
+    cases_resolved = models.IntegerField(default=0)
+    cases_closed = models.IntegerField(default=0)
+    cases_referred = models.IntegerField(default=0)
+
+    appointments_scheduled = models.IntegerField(default=0)
+    appointments_confirmed = models.IntegerField(default=0)
+    appointments_in_progress = models.IntegerField(default=0)
+    appointments_completed = models.IntegerField(default=0)
+    appointments_cancelled = models.IntegerField(default=0)
+    appointments_no_show = models.IntegerField(default=0)
+    appointments_rescheduled = models.IntegerField(default=0)
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'doctor_stats'
+        verbose_name = 'Doctor statistics'
+        verbose_name_plural = 'Doctor statistics'
+
+    def __str__(self):
+        return f"Stats for doctor {self.doctor_id}"
+
+    @property
+    def total_cases(self):
+        return sum(getattr(self, f'cases_{status.lower()}') for status, _ in Case.STATUS_CHOICES)
+
+    @property
+    def total_appointments(self):
+        return sum(getattr(self, f'appointments_{status.lower()}') for status, _ in Appointment.STATUS_CHOICES)
+
+
 class TestCustomFielModel(models.Model):
     number= models.IntegerField()
     comma_separated_numbers = CommaSeparatedCharField(max_length=255, separator=',')
+    packed_numbers = CommaSeparatedCharField(storage='array', default=list, blank=True)
+    model_artifact = ModelArtifactField(null=True, blank=True)
+    model_file = ModelArtifactField(storage='file', upload_to='test_artifacts', null=True, blank=True)
     class Meta:
         db_table = 'test_custom_model'
+        indexes = [IntListIndex(fields=['packed_numbers'], name='test_custom_packed_idx')]
@@ -0,0 +1,128 @@
+"""
+Detection of lazy relation loads inside loops (the "N+1 queries" problem).
+
+While a detector is active, every access to a foreign key or one-to-one
+relation that is not already cached (by ``select_related``,
+``prefetch_related`` or an earlier access) is recorded together with the line
+of project code that triggered it. When the same relation is lazily loaded
+from the same line ``threshold`` times, that line is running in a loop and
+the detector logs a warning or raises ``NPlusOneError``::
+
+    with detect_n_plus_one():
+        for appointment in Appointment.objects.all():
+            print(appointment.patient)      # raises on the second row
+
+    with detect_n_plus_one():
+        for appointment in Appointment.objects.for_listing():
+            print(appointment.patient)      # fine: loaded by select_related
+
+Reverse foreign key and many-to-many managers are not tracked; they issue a
+query only when the manager is evaluated, which is easy to spot in code.
+"""
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import django
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor, ReverseOneToOneDescriptor,
+)
+
+logger = logging.getLogger(__name__)
+
+_DJANGO_DIR = os.path.dirname(django.__file__)
+_state = threading.local()
+_installed = False
+
+
+class NPlusOneError(Exception):
+    """Raised when a relation is lazily loaded repeatedly from the same line."""
+
+
+class _Detector:
+    def __init__(self, raise_error, threshold):
+        self.raise_error = raise_error
+        self.threshold = threshold
+        self.loads = Counter()
+        self.reported = set()
+
+    def record(self, model, relation):
+        site = _call_site()
+        key = (model._meta.label, relation, site)
+        self.loads[key] += 1
+        if self.loads[key] < self.threshold or key in self.reported:
+            return
+        self.reported.add(key)
+        message = (
+            f"Lazy load of {model._meta.label}.{relation} repeated {self.loads[key]} times "
+            f"at {site}; use select_related()/prefetch_related() or a for_listing() profile."
+        )
+        if self.raise_error:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+def _call_site():
+    """File and line of the innermost frame outside Django and this module."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_DJANGO_DIR) and filename != __file__:
+            return f"{filename}:{frame.f_lineno}"
+        frame = frame.f_back
+    return '<unknown>'
+
+
+def _active():
+    return getattr(_state, 'detector', None)
+
+
+def _install():
+    global _installed
+    if _installed:
+        return
+    forward_get = ForwardManyToOneDescriptor.__get__
+    reverse_get = ReverseOneToOneDescriptor.__get__
+
+    def forward(self, instance, cls=None):
+        detector = _active()
+        if (
+            detector is not None and instance is not None
+            and not self.field.is_cached(instance)
+            and getattr(instance, self.field.attname) is not None
+        ):
+            detector.record(type(instance), self.field.name)
+        return forward_get(self, instance, cls)
+
+    def reverse(self, instance, cls=None):
+        detector = _active()
+        if detector is not None and instance is not None and not self.related.is_cached(instance):
+            detector.record(type(instance), self.related.get_accessor_name())
+        return reverse_get(self, instance, cls)
+
+    ForwardManyToOneDescriptor.__get__ = forward
+    ReverseOneToOneDescriptor.__get__ = reverse
+    _installed = True
+
+
+@contextmanager
+def detect_n_plus_one(raise_error=True, threshold=2):
+    """Log or raise when a relation is lazily loaded ``threshold`` times from one line."""
+    _install()
+    previous = _active()
+    _state.detector = _Detector(raise_error, threshold)
+    try:
+        yield _state.detector
+    finally:
+        _state.detector = previous
+
+
+class NPlusOneTestMixin:
+    """``TestCase`` mixin that fails any test loading a relation lazily in a loop."""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(detect_n_plus_one())
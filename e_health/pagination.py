@@ -0,0 +1,231 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET n``, which makes the database walk and discard every row
+before the page, each page starts from the ordering values of the last row
+already seen, in effect::
+
+    WHERE (appointment_date, appointment_time, uuid) > (:date, :time, :uuid)
+    ORDER BY appointment_date, appointment_time, uuid
+    LIMIT 51
+
+``uuid`` is appended to the ordering as a tiebreaker, so every row has a
+distinct position. With an index on the ordering columns (see the
+``Appointment`` and ``Case`` Meta indexes) page 10,000 is one index range
+scan, the same as page 1.
+
+``keyset_paginate()`` works on any queryset; ``KeysetPagination`` plugs the
+same logic into DRF views. Cursors are opaque URL-safe tokens.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import date, time
+from typing import NamedTuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage(NamedTuple):
+    object_list: list
+    next_cursor: str
+    previous_cursor: str
+
+
+def _json_default(value):
+    # Unlike DjangoJSONEncoder, keep microseconds: positions must be exact.
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, backwards=False):
+    payload = json.dumps({'v': values, 'b': backwards}, default=_json_default, separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode()).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(raw_values, backwards)``; raises ``InvalidCursor`` for tampered tokens."""
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return list(payload['v']), bool(payload['b'])
+    except (BinasciiError, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor('Invalid cursor.') from exc
+
+
+def resolve_ordering(queryset, ordering=None):
+    """
+    ``[(field, descending), ...]`` for ``ordering`` (default: the queryset's
+    ordering, then the model's ``Meta.ordering``), with the primary key added
+    as a final tiebreaker.
+    """
+    opts = queryset.model._meta
+    ordering = ordering or queryset.query.order_by or opts.ordering
+    resolved = []
+    for name in ordering:
+        if not isinstance(name, str) or '__' in name or name.lstrip('-') == '?':
+            raise ValueError(f'Keyset pagination needs plain model fields in the ordering, not {name!r}.')
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist as exc:
+            raise ValueError(f'Unknown ordering field {name!r}.') from exc
+        if field.null:
+            raise ValueError(f'Keyset pagination cannot order by nullable field {name!r}.')
+        resolved.append((field, descending))
+        if field.primary_key:
+            return resolved
+    resolved.append((opts.pk, resolved[-1][1] if resolved else False))
+    return resolved
+
+
+def _order_by(ordering, backwards):
+    return [('-' if descending != backwards else '') + field.attname for field, descending in ordering]
+
+
+def _after(ordering, values, backwards):
+    """
+    Rows strictly after ``values`` in ``ordering`` (before them when going
+    backwards), as ``a >= x AND ((a > x) OR (a = x AND b > y) OR ...)``.
+
+    The leading ``a >= x`` is redundant but lets the planner start an index
+    range scan at the cursor instead of scanning the index from the start
+    and filtering.
+    """
+    condition = Q()
+    equal = {}
+    for (field, descending), value in zip(ordering, values):
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+        equal[field.attname] = value
+    (first, descending), start = ordering[0], values[0]
+    return Q(**{f'{first.attname}__{"lte" if descending != backwards else "gte"}': start}) & condition
+
+
+def _position(row, ordering, columns=None):
+    if isinstance(row, tuple):
+        index = {name: i for i, name in enumerate(columns)}
+        return [row[index[field.attname] if field.attname in index else index[field.name]] for field, _ in ordering]
+    if isinstance(row, dict):
+        return [row[field.attname] if field.attname in row else row[field.name] for field, _ in ordering]
+    return [getattr(row, field.attname) for field, _ in ordering]
+
+
+def keyset_paginate(queryset, cursor=None, page_size=50, ordering=None):
+    """
+    Return one ``KeysetPage`` of ``queryset``, starting after ``cursor``
+    (the first page when ``cursor`` is None). Each page costs one query.
+
+    The ordering columns must be non-null concrete fields of the model;
+    ``values()`` and ``values_list()`` querysets must include them.
+    """
+    ordering = resolve_ordering(queryset, ordering)
+    backwards = False
+    if cursor:
+        raw, backwards = decode_cursor(cursor)
+        if len(raw) != len(ordering):
+            raise InvalidCursor('Invalid cursor.')
+        try:
+            values = [field.to_python(value) for (field, _), value in zip(ordering, raw)]
+        except Exception as exc:
+            raise InvalidCursor('Invalid cursor.') from exc
+        queryset = queryset.filter(_after(ordering, values, backwards))
+
+    rows = list(queryset.order_by(*_order_by(ordering, backwards))[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    # Going forwards there are earlier rows whenever we started from a cursor;
+    # going backwards there are later rows (the page we came from).
+    has_next = has_more if not backwards else True
+    has_previous = bool(cursor) if not backwards else has_more
+    columns = getattr(queryset, '_fields', None)
+    return KeysetPage(
+        rows,
+        encode_cursor(_position(rows[-1], ordering, columns)) if rows and has_next else None,
+        encode_cursor(_position(rows[0], ordering, columns), backwards=True) if rows and has_previous else None,
+    )
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination class using ``keyset_paginate()``.
+
+    Responses look like ``{"next": url, "previous": url, "results": [...]}``.
+    Set ``ordering`` on the class or the view (``keyset_ordering``) to
+    override the queryset's ordering.
+    """
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page = keyset_paginate(
+                queryset,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(request),
+                ordering=getattr(view, 'keyset_ordering', None) or self.ordering,
+            )
+        except InvalidCursor as exc:
+            raise NotFound(str(exc)) from exc
+        self.page = page
+        return page.object_list
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        link = {'type': 'string', 'nullable': True, 'format': 'uri'}
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {'next': link, 'previous': link, 'results': schema},
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query',
+             'description': 'The pagination cursor value.', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': 'Number of results to return per page.', 'schema': {'type': 'integer'}},
+        ]
@@ -0,0 +1,233 @@
+"""
+SQL profiling of requests and management commands.
+
+``profile_sql()`` puts an ``execute_wrapper`` on the database connections of
+the current thread and records every statement's duration and the line of
+project code that issued it. When the block ends it holds one record::
+
+    {"kind": "request", "name": "GET api/patients/", "duration_ms": 41.2,
+     "queries": 3, "db_ms": 12.9,
+     "slowest": [{"ms": 9.1, "sql": "SELECT ...", "site": "e_health/views.py:57"}, ...],
+     "repeated": [{"fingerprint": "SELECT ... WHERE id = ?", "count": 50, "ms": 20.3,
+                   "site": "e_health/management/commands/search.py:88"}, ...]}
+
+``repeated`` groups statements by fingerprint (literals and ``IN`` lists
+collapsed); a fingerprint issued many times from one site is usually a loop
+that should be one query.
+
+``SQLProfileMiddleware`` and ``ProfiledCommandMixin`` append one such record
+per request or command run to ``settings.SQL_PROFILE_PATH`` (JSON lines).
+The middleware is active when ``settings.SQL_PROFILE`` is set; commands
+also take ``--profile-sql``.
+"""
+import heapq
+import json
+import os
+import re
+import sys
+import sysconfig
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DEFAULT_PATH = 'sql_profile.jsonl'
+SLOWEST = 5
+MAX_SQL = 2000
+
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()[name] for name in ('stdlib', 'purelib', 'platlib')})
+_write_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """``sql`` with literals and placeholders as ``?`` and ``IN`` lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+@lru_cache(maxsize=1024)
+def _display_path(filename):
+    try:
+        return os.path.relpath(filename)
+    except ValueError:  # another drive on Windows
+        return filename
+
+
+def _call_site():
+    """File and line of the innermost frame outside the standard library, site-packages and this module."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != __file__ and not filename.startswith(_LIBRARY_DIRS) and not filename.startswith('<'):
+            return f'{_display_path(filename)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class SQLProfile:
+    def __init__(self, kind, name, slowest=SLOWEST):
+        self.kind = kind
+        self.name = name
+        self.slowest = slowest
+        self.queries = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.duration = None
+        self.extra = {}
+        self._slowest = []
+        self._fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, duration):
+        site = _call_site()
+        self.queries += 1
+        self.db_time += duration
+        entry = (duration, self.queries, sql, site)
+        if len(self._slowest) < self.slowest:
+            heapq.heappush(self._slowest, entry)
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+        stats = self._fingerprints.setdefault(fingerprint(sql), [0, 0.0, site])
+        stats[0] += 1
+        stats[1] += duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def as_dict(self):
+        repeated = sorted(
+            ((fp, stats) for fp, stats in self._fingerprints.items() if stats[0] > 1),
+            key=lambda item: (-item[1][0], -item[1][1]),
+        )[:self.slowest]
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round((self.duration or 0) * 1000, 3),
+            **self.extra,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'slowest': [
+                {'ms': round(duration * 1000, 3), 'sql': sql[:MAX_SQL], 'site': site}
+                for duration, _, sql, site in sorted(self._slowest, reverse=True)
+            ],
+            'repeated': [
+                {'fingerprint': fp[:MAX_SQL], 'count': count, 'ms': round(total * 1000, 3), 'site': site}
+                for fp, (count, total, site) in repeated
+            ],
+        }
+
+
+@contextmanager
+def profile_sql(kind, name, slowest=None):
+    """Profile every statement run on this thread's connections inside the block."""
+    profile = SQLProfile(kind, name, slowest or getattr(settings, 'SQL_PROFILE_SLOWEST', SLOWEST))
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(profile))
+        try:
+            yield profile
+        finally:
+            profile.finish()
+
+
+def write_record(record, path=None):
+    """Append ``record`` as one JSON line to ``path`` (default ``settings.SQL_PROFILE_PATH``)."""
+    path = path or getattr(settings, 'SQL_PROFILE_PATH', DEFAULT_PATH)
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock, open(path, 'a', encoding='utf-8') as handle:
+        handle.write(line)
+
+
+class SQLProfileMiddleware:
+    """
+    Writes a profile record per request while ``settings.SQL_PROFILE`` is set.
+    Works on both the WSGI and the ASGI handler.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with profile_sql('request', f'{request.method} {request.path}') as profile:
+            response = self.get_response(request)
+        write_record(self.record(request, response, profile))
+        return response
+
+    async def __acall__(self, request):
+        # Connections are per thread, and an async view's queries run on the
+        # request's sync thread (sync_to_async), so the profile is hooked there.
+        profiling = profile_sql('request', f'{request.method} {request.path}')
+        profile = await sync_to_async(profiling.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(profiling.__exit__)(None, None, None)
+        await sync_to_async(write_record)(self.record(request, response, profile))
+        return response
+
+    def record(self, request, response, profile):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.route:
+            profile.name = f'{request.method} {match.route}'
+            profile.extra['path'] = request.path
+        profile.extra['status'] = response.status_code
+        return profile.as_dict()
+
+
+class ProfiledCommandMixin:
+    """
+    Management command mixin adding ``--profile-sql [PATH]``: the run's
+    profile is appended to ``PATH`` (default ``settings.SQL_PROFILE_PATH``).
+    Runs are always profiled while ``settings.SQL_PROFILE`` is set.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--profile-sql', nargs='?', const='', default=None, metavar='PATH',
+            help='Append a JSONL record of the SQL this run issued (query count, DB time, slowest '
+                 'statements, repeated fingerprints) to PATH or SQL_PROFILE_PATH',
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        path = options.get('profile_sql')
+        if path is None and not getattr(settings, 'SQL_PROFILE', False):
+            return super().execute(*args, **options)
+        name = self.__module__.rsplit('.', 1)[-1]
+        with profile_sql('command', name) as profile:
+            try:
+                return super().execute(*args, **options)
+            finally:
+                profile.finish()
+                write_record(profile.as_dict(), path or None)
@@ -0,0 +1,199 @@
+"""
+Appointment reminders.
+
+``ReminderDispatcher`` claims appointments that are due for a reminder in
+batches with ``SELECT ... FOR UPDATE SKIP LOCKED``: rows another worker has
+claimed are skipped rather than waited on, so any number of
+``send_reminders`` processes can run side by side without sending the same
+reminder twice. Each batch is sent and marked (one ``bulk_update``) inside
+the transaction holding the row locks.
+
+Senders are pluggable: anything with a ``send(appointments)`` method that
+returns the appointments it delivered. An undelivered appointment is retried
+after ``retry_delay``, doubled on each further failure, and given up on after
+``max_attempts`` failures, so a few bad rows never hold back the rest of the
+queue. ``ConsoleSender`` and ``FileSender``
+are local stubs for development and tests.
+
+SQLite has no row locks; there a single worker is safe, several are not.
+"""
+import json
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from e_health.benchmarking import percentile
+from e_health.models import Appointment
+
+# Lag percentiles cover the most recent reminders, so a long-running worker's
+# memory stays flat.
+LAG_SAMPLES = 10_000
+
+
+class ConsoleSender:
+    """Writes one line per reminder to a stream (stdout by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, appointments):
+        for appointment in appointments:
+            self.stream.write(
+                f"Reminder to {appointment.patient.full_name}: {appointment.appointment_date} "
+                f"{appointment.appointment_time:%H:%M} with {appointment.doctor}\n"
+            )
+        return appointments
+
+
+class FileSender:
+    """Appends one JSON line per reminder to ``path``."""
+
+    def __init__(self, path='reminders.jsonl'):
+        self.path = path
+
+    def send(self, appointments):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            for appointment in appointments:
+                handle.write(json.dumps({
+                    'appointment': str(appointment.pk),
+                    'patient': str(appointment.patient_id),
+                    'email': appointment.patient.email,
+                    'phone': appointment.patient.phone_number,
+                    'doctor': str(appointment.doctor),
+                    'date': appointment.appointment_date.isoformat(),
+                    'time': appointment.appointment_time.isoformat(),
+                }) + '\n')
+        return appointments
+
+
+SENDERS = {'console': ConsoleSender, 'file': FileSender}
+
+
+def get_sender(name, **kwargs):
+    """A sender by short name (``console``, ``file``) or dotted class path."""
+    sender_class = SENDERS[name] if name in SENDERS else import_string(name)
+    return sender_class(**kwargs)
+
+
+@dataclass
+class ReminderMetrics:
+    sent: int = 0
+    failed: int = 0
+    gave_up: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    lags: deque = field(default_factory=lambda: deque(maxlen=LAG_SAMPLES))
+    lag_max: float = 0.0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def throughput(self):
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """
+        Counts, reminders/sec and lag (seconds past the moment each reminder
+        became due): percentiles over the last ``LAG_SAMPLES``, max over the run.
+        """
+        lags = sorted(self.lags)
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'gave_up': self.gave_up,
+            'batches': self.batches,
+            'elapsed_s': round(self.elapsed, 3),
+            'per_sec': round(self.throughput, 1),
+            'lag_p50_s': round(percentile(lags, 50), 1),
+            'lag_p95_s': round(percentile(lags, 95), 1),
+            'lag_max_s': round(self.lag_max, 1),
+        }
+
+
+class ReminderDispatcher:
+    """
+    Sends reminders for active appointments starting within ``lead`` that
+    have not had one yet, and are not waiting out a retry or given up on.
+    """
+
+    def __init__(self, sender, lead=timedelta(hours=24), batch_size=100, using='default',
+                 max_attempts=5, retry_delay=timedelta(minutes=5)):
+        self.sender = sender
+        self.lead = lead
+        self.batch_size = batch_size
+        self.using = using
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.metrics = ReminderMetrics()
+
+    def due(self, now=None):
+        now = now or timezone.now()
+        return (
+            Appointment.objects.using(self.using)
+            .due_within(self.lead, now=now)
+            .filter(reminder_sent=False, reminder_attempts__lt=self.max_attempts)
+            .filter(Q(reminder_retry_at__isnull=True) | Q(reminder_retry_at__lte=now))
+        )
+
+    def dispatch_batch(self, now=None):
+        """Claim, send and mark one batch; returns the number of appointments claimed."""
+        with transaction.atomic(using=self.using):
+            batch = list(
+                self.due(now)
+                .select_related('patient', 'doctor__user')
+                .select_for_update(skip_locked=True, of=('self',))
+                [:self.batch_size]
+            )
+            if not batch:
+                return 0
+            delivered = list(self.sender.send(batch) or [])
+            sent_at = timezone.now()
+            for appointment in delivered:
+                appointment.reminder_sent = True
+                appointment.reminder_sent_at = sent_at
+            delivered_pks = {appointment.pk for appointment in delivered}
+            failed = [appointment for appointment in batch if appointment.pk not in delivered_pks]
+            for appointment in failed:
+                appointment.reminder_attempts += 1
+                appointment.reminder_retry_at = sent_at + self.retry_delay * 2 ** (appointment.reminder_attempts - 1)
+            Appointment.objects.using(self.using).bulk_update(
+                delivered + failed, ['reminder_sent', 'reminder_sent_at', 'reminder_attempts', 'reminder_retry_at'],
+            )
+
+        self.metrics.batches += 1
+        self.metrics.sent += len(delivered)
+        self.metrics.failed += len(failed)
+        self.metrics.gave_up += sum(appointment.reminder_attempts >= self.max_attempts for appointment in failed)
+        for appointment in delivered:
+            starts = timezone.make_aware(datetime.combine(appointment.appointment_date, appointment.appointment_time))
+            lag = max(0.0, (sent_at - (starts - self.lead)).total_seconds())
+            self.metrics.lags.append(lag)
+            self.metrics.lag_max = max(self.metrics.lag_max, lag)
+        return len(batch)
+
+    def run(self, once=False, poll_interval=5.0, max_batches=None, on_batch=None):
+        """
+        Dispatch batches until nothing is due (``once``) or forever, polling
+        every ``poll_interval`` seconds when idle. Failed deliveries stay
+        unmarked and are retried once their delay is over; with ``once`` they
+        end the run.
+        """
+        while max_batches is None or self.metrics.batches < max_batches:
+            failed = self.metrics.failed
+            claimed = self.dispatch_batch()
+            if claimed and on_batch:
+                on_batch(self.metrics)
+            if not claimed or self.metrics.failed > failed:
+                if once:
+                    break
+                time.sleep(poll_interval)
+        return self.metrics
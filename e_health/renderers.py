@@ -0,0 +1,30 @@
+"""
+JSON rendering for the e_health API.
+
+``FastJSONRenderer`` uses ``orjson`` when it is installed and falls back to
+DRF's ``JSONRenderer`` (the standard library ``json`` module) when it is not,
+or when the client asks for indented output.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # DRF's encoder handles what orjson does not (Decimal, lazy strings, ...).
+        ret = orjson.dumps(data, default=self._encoder.default)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            # Keep the output a strict JavaScript subset, like JSONRenderer.
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
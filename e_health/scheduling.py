@@ -0,0 +1,205 @@
+"""
+Doctor availability.
+
+``find_free_slots()`` loads every booking of the requested doctors in the
+date range with one query (served by the ``(appointment_date, doctor)``
+index), builds a sorted interval list per doctor and day, and then checks
+candidate slots against it with binary search instead of one query per slot.
+
+Appointment dates and times are wall-clock times in the current time zone;
+slots are returned as aware datetimes in that zone. A booking that runs past
+midnight also occupies the start of the following day.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from e_health.models import Appointment, Doctor
+
+# Appointments in these states do not occupy the doctor's time.
+FREE_STATUSES = ('CANCELLED', 'NO_SHOW', 'RESCHEDULED')
+
+DEFAULT_WORKDAYS = frozenset(range(5))  # Monday to Friday
+DEFAULT_HOURS = (9 * 60, 17 * 60)
+DAY_MINUTES = 24 * 60
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+_AVAILABILITY_RE = re.compile(
+    r'(?P<first>[a-z]{3})[a-z]*\s*(?:-\s*(?P<last>[a-z]{3})[a-z]*)?\s+(?P<start>\d{1,2})(?::(?P<start_min>\d\d))?'
+    r'\s*-\s*(?P<end>\d{1,2})(?::(?P<end_min>\d\d))?',
+)
+
+
+class FreeSlot(NamedTuple):
+    doctor_id: object
+    start: datetime
+    end: datetime
+
+
+def parse_availability(text):
+    """
+    Parse ``Doctor.availability_hours`` written like ``"Mon-Fri 9-5"`` or
+    ``"Sat 10:00-14:00"`` into ``(weekdays, (start_minute, end_minute))``.
+
+    Afternoon end hours written in 12-hour form ("9-5") are read as 17:00.
+    Unparseable text gives the default Monday to Friday, 09:00 to 17:00.
+    """
+    match = _AVAILABILITY_RE.search((text or '').lower())
+    if not match or match['first'] not in WEEKDAYS:
+        return DEFAULT_WORKDAYS, DEFAULT_HOURS
+    first = WEEKDAYS.index(match['first'])
+    last = WEEKDAYS.index(match['last']) if match['last'] in WEEKDAYS else first
+    days = frozenset((first + i) % 7 for i in range((last - first) % 7 + 1))
+    start = int(match['start']) * 60 + int(match['start_min'] or 0)
+    end = int(match['end']) * 60 + int(match['end_min'] or 0)
+    if end <= start:
+        end += 12 * 60
+    return days, (start, min(end, DAY_MINUTES))
+
+
+class BookedIntervals:
+    """
+    Non-overlapping, sorted ``[start, end)`` minute intervals for one doctor
+    on one day. Overlapping bookings are merged when the structure is built.
+    """
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, intervals):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def is_free(self, start, end):
+        """True when ``[start, end)`` overlaps no booking."""
+        # The last booking starting before ``end`` is the only one that can overlap.
+        index = bisect_left(self.starts, end) - 1
+        return index < 0 or self.ends[index] <= start
+
+    def gaps(self, day_start, day_end):
+        """Free ``(start, end)`` intervals between ``day_start`` and ``day_end``."""
+        cursor = day_start
+        first = bisect_right(self.ends, day_start)
+        for start, end in zip(self.starts[first:], self.ends[first:]):
+            if start >= day_end:
+                break
+            if start > cursor:
+                yield cursor, start
+            cursor = max(cursor, end)
+        if cursor < day_end:
+            yield cursor, day_end
+
+
+def load_bookings(doctor_ids, start_date, end_date):
+    """
+    ``{doctor_id: {date: BookedIntervals}}`` from a single query. Bookings
+    that run past midnight are split at it, so the day before ``start_date``
+    is read too.
+    """
+    rows = (
+        Appointment.objects
+        .filter(appointment_date__range=(start_date - timedelta(days=1), end_date), doctor_id__in=doctor_ids)
+        .exclude(status__in=FREE_STATUSES)
+        .order_by()
+        .values_list('doctor_id', 'appointment_date', 'appointment_time', 'estimated_duration')
+    )
+    raw = defaultdict(lambda: defaultdict(list))
+    for doctor_id, day, start, duration in rows.iterator(chunk_size=5000):
+        minute = start.hour * 60 + start.minute
+        end = minute + (duration or 0)
+        while end > DAY_MINUTES:
+            raw[doctor_id][day].append((minute, DAY_MINUTES))
+            day, minute, end = day + timedelta(days=1), 0, end - DAY_MINUTES
+        raw[doctor_id][day].append((minute, end))
+    return {
+        doctor_id: {day: BookedIntervals(intervals) for day, intervals in days.items()}
+        for doctor_id, days in raw.items()
+    }
+
+
+def find_free_slots(doctors, start_date, end_date, slot_minutes=30, step_minutes=None,
+                    working_hours=None, now=None):
+    """
+    Free slots of ``slot_minutes`` for each doctor between ``start_date`` and
+    ``end_date`` (inclusive).
+
+    ``doctors`` are ``Doctor`` instances or primary keys. Working days and
+    hours come from each doctor's ``availability_hours`` unless
+    ``working_hours=(weekdays, (start_minute, end_minute))`` is given.
+    Candidate slots start every ``step_minutes`` (default: ``slot_minutes``)
+    and slots before ``now`` are skipped.
+
+    Returns ``{doctor_id: [FreeSlot, ...]}`` in chronological order, with
+    aware ``start`` and ``end`` in the current time zone.
+    """
+    step = step_minutes or slot_minutes
+    if now is not None and timezone.is_aware(now):
+        now = timezone.localtime(now)
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+
+    instances = [d for d in doctors if isinstance(d, Doctor)]
+    ids = [d.pk if isinstance(d, Doctor) else d for d in doctors]
+    hours = {d.pk: d.availability_hours for d in instances}
+    missing = [pk for pk in ids if pk not in hours]
+    if working_hours is None and missing:
+        hours.update(Doctor.objects.filter(pk__in=missing).values_list('pk', 'availability_hours'))
+
+    bookings = load_bookings(ids, start_date, end_date)
+    zone = timezone.get_current_timezone()
+    empty = BookedIntervals([])
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    result = {}
+    for doctor_id in ids:
+        workdays, (day_start, day_end) = working_hours or parse_availability(hours.get(doctor_id))
+        booked = bookings.get(doctor_id, {})
+        slots = []
+        for day in days:
+            if day.weekday() not in workdays:
+                continue
+            intervals = booked.get(day, empty)
+            # Aware datetime + timedelta is wall-clock arithmetic, as make_aware() of the naive sum.
+            midnight = datetime.combine(day, time(), zone)
+            first = day_start
+            if now is not None and day == now.date():
+                elapsed = now.hour * 60 + now.minute
+                first = max(first, day_start + -(-(elapsed - day_start) // step) * step)
+            elif now is not None and day < now.date():
+                continue
+            for gap_start, gap_end in intervals.gaps(first, day_end):
+                # Keep slots on the step grid anchored at the start of the working day.
+                minute = day_start + -(-(gap_start - day_start) // step) * step
+                while minute + slot_minutes <= gap_end:
+                    slots.append(FreeSlot(
+                        doctor_id,
+                        midnight + timedelta(minutes=minute),
+                        midnight + timedelta(minutes=minute + slot_minutes),
+                    ))
+                    minute += step
+        result[doctor_id] = slots
+    return result
+
+
+def is_slot_free(doctor, day, start, duration_minutes):
+    """Check a single slot; convenient for validating one booking."""
+    doctor_id = doctor.pk if isinstance(doctor, Doctor) else doctor
+    minute = start.hour * 60 + start.minute
+    end = minute + duration_minutes
+    last = day + timedelta(days=(end - 1) // DAY_MINUTES)
+    booked = load_bookings([doctor_id], day, last).get(doctor_id, {})
+    while True:
+        if not booked.get(day, BookedIntervals([])).is_free(minute, min(end, DAY_MINUTES)):
+            return False
+        if end <= DAY_MINUTES:
+            return True
+        day, minute, end = day + timedelta(days=1), 0, end - DAY_MINUTES
@@ -0,0 +1,115 @@
+"""
+Ranked, accent-insensitive patient search over first, middle and last name
+and email.
+
+* PostgreSQL: ``pg_trgm`` word similarity against an ``unaccent``-ed,
+  lower-cased document, served by the GIN trigram index created in migration
+  ``0004_patient_search``.
+* SQLite: an FTS5 table (``patient_search``) using the ``unicode61`` tokenizer
+  with diacritics removed, ranked with ``bm25()``. Triggers on ``patient``
+  keep it in sync with every insert, update and delete, including
+  ``bulk_create`` and raw imports. FTS rows are keyed by rowid through
+  ``patient_search_key`` (migration ``0011_patient_search_rowid``), so a
+  trigger touches one row instead of scanning the index.
+* Anything else: ``icontains`` on each column, unranked.
+
+``search_patients('helene')`` returns ``Patient`` instances with an extra
+``rank`` attribute, best match first, so "Helene" finds "Hélène".
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from e_health.models import Patient
+
+# Must match the expression indexed by migration 0004_patient_search.
+PG_DOCUMENT = (
+    "e_health_unaccent(lower(first_name || ' ' || coalesce(middle_name, '') || ' ' "
+    "|| last_name || ' ' || coalesce(email, '')))"
+)
+
+PG_SEARCH_SQL = f"""
+    SELECT patient.*, word_similarity(e_health_unaccent(lower(%s)), {PG_DOCUMENT}) AS rank
+    FROM patient
+    WHERE e_health_unaccent(lower(%s)) <%% {PG_DOCUMENT}
+    ORDER BY rank DESC, last_name, first_name
+    LIMIT %s
+"""
+
+SQLITE_SEARCH_SQL = """
+    SELECT patient.*, -bm25(patient_search) AS rank
+    FROM patient_search
+    JOIN patient_search_key ON patient_search_key.id = patient_search.rowid
+    JOIN patient ON patient.uuid = patient_search_key.uuid
+    WHERE patient_search MATCH %s
+    ORDER BY bm25(patient_search), patient.last_name, patient.first_name
+    LIMIT %s
+"""
+
+
+def _fts_query(query):
+    """Every word of ``query`` as a quoted FTS5 prefix term, all required."""
+    terms = query.replace('@', ' ').replace('.', ' ').split()
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+# Aliases known to have the FTS table; only positive answers are cached.
+_fts_aliases = set()
+
+
+def _has_fts_table(connection):
+    if connection.alias not in _fts_aliases:
+        with connection.cursor() as cursor:
+            if 'patient_search' not in connection.introspection.table_names(cursor):
+                return False
+        _fts_aliases.add(connection.alias)
+    return True
+
+
+def search_condition(query):
+    """``Q`` matching patients with every word of ``query`` in a name or the email (unranked)."""
+    condition = Q()
+    for term in query.split():
+        condition &= (
+            Q(first_name__icontains=term) | Q(middle_name__icontains=term)
+            | Q(last_name__icontains=term) | Q(email__icontains=term)
+        )
+    return condition
+
+
+def search_patients(query, limit=20, using=None):
+    """Return up to ``limit`` patients matching ``query``, best match first."""
+    query = (query or '').strip()
+    if not query:
+        return []
+    using = using or router.db_for_read(Patient)
+    connection = connections[using]
+    manager = Patient.objects.db_manager(using)
+
+    if connection.vendor == 'postgresql':
+        return list(manager.raw(PG_SEARCH_SQL, [query, query, limit]))
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        fts_query = _fts_query(query)
+        if not fts_query:
+            return []
+        return list(manager.raw(SQLITE_SEARCH_SQL, [fts_query, limit]))
+
+    patients = list(manager.filter(search_condition(query))[:limit])
+    for patient in patients:
+        patient.rank = 1.0
+    return patients
+
+
+def rebuild_search_index(using='default'):
+    """Refill the SQLite FTS table from ``patient``; a no-op on PostgreSQL."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not _has_fts_table(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM patient_search')
+        cursor.execute('DELETE FROM patient_search_key')
+        cursor.execute('INSERT INTO patient_search_key (uuid) SELECT uuid FROM patient')
+        cursor.execute(
+            "INSERT INTO patient_search (rowid, name, email) "
+            "SELECT patient_search_key.id, first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name, "
+            "coalesce(email, '') FROM patient JOIN patient_search_key ON patient_search_key.uuid = patient.uuid"
+        )
@@ -0,0 +1,235 @@
+"""
+Read serializers for the e_health API.
+
+List endpoints do not run these serializers row by row. ``FieldPlan``
+compiles a serializer's fields once into ``values_list()`` column paths plus
+the few per-column converters whose output differs from the raw database
+value (UUIDs, decimals, dates and times), and then builds each output dict
+straight from the row tuple. The output is the same as the serializer's.
+
+Detail serializers list their fields explicitly. Clinical notes
+(``Meta.restricted_fields``) are only included when the request's user has
+``CLINICAL_PERMISSION``, or when the context's ``clinical`` says so; a
+serializer used with neither leaves them out.
+"""
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from rest_framework import serializers
+
+from e_health.models import Appointment, Case, Doctor, Patient, Treatment
+
+CLINICAL_PERMISSION = 'e_health.view_clinical_data'
+
+
+def can_view_clinical(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.has_perm(CLINICAL_PERMISSION)
+
+
+class RestrictedFieldsMixin:
+    """Drops ``Meta.restricted_fields`` unless the context allows clinical fields."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        clinical = self.context.get('clinical')
+        if clinical is None:
+            clinical = can_view_clinical(self.context.get('request'))
+        if not clinical:
+            for name in self.Meta.restricted_fields:
+                fields.pop(name, None)
+        return fields
+
+
+class PatientSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Patient
+        fields = [
+            'uuid', 'first_name', 'middle_name', 'last_name', 'gender', 'date_of_birth',
+            'email', 'phone_number', 'blood_type', 'is_active', 'created_at',
+        ]
+
+
+class PatientDetailSerializer(RestrictedFieldsMixin, serializers.ModelSerializer):
+    full_name = serializers.ReadOnlyField()
+    age = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Patient
+        restricted_fields = ['medical_history', 'allergies', 'current_medications', 'insurance_number']
+        fields = [
+            *PatientSerializer.Meta.fields, 'full_name', 'age', 'address', 'emergency_contact_name',
+            'emergency_contact_phone', 'updated_at', *restricted_fields,
+        ]
+
+
+class DoctorSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+
+    class Meta:
+        model = Doctor
+        fields = [
+            'uuid', 'first_name', 'last_name', 'license_number', 'medical_degree', 'specialization',
+            'years_of_experience', 'consultation_fee', 'follow_up_fee', 'availability_hours',
+            'is_available', 'is_accepting_new_patients',
+        ]
+
+
+class DoctorDetailSerializer(DoctorSerializer):
+    class Meta(DoctorSerializer.Meta):
+        fields = '__all__'
+
+
+class CaseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Case
+        fields = [
+            'uuid', 'case_number', 'patient', 'primary_doctor', 'referring_doctor', 'chief_complaint',
+            'status', 'priority', 'severity', 'estimated_cost', 'actual_cost', 'created_at', 'closed_at',
+        ]
+
+
+class CaseDetailSerializer(RestrictedFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Case
+        restricted_fields = [
+            'symptoms_description', 'medical_history_notes', 'physical_examination_notes',
+            'preliminary_diagnosis', 'final_diagnosis', 'treatment_plan', 'notes',
+        ]
+        fields = [
+            *CaseSerializer.Meta.fields, 'insurance_coverage', 'patient_liability', 'updated_at',
+            'follow_up_date', 'is_confidential', *restricted_fields,
+        ]
+
+
+class TreatmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Treatment
+        fields = [
+            'uuid', 'name', 'code', 'category', 'subcategory', 'base_cost',
+            'insurance_coverage_percentage', 'estimated_duration_minutes', 'is_active',
+        ]
+
+
+class TreatmentDetailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Treatment
+        fields = '__all__'
+
+
+class AppointmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        fields = [
+            'uuid', 'patient', 'doctor', 'case', 'treatment', 'appointment_date', 'appointment_time',
+            'estimated_duration', 'appointment_type', 'status', 'priority', 'room_number', 'estimated_cost',
+        ]
+
+
+class AppointmentDetailSerializer(RestrictedFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        restricted_fields = ['preparation_notes', 'outcome_notes', 'notes']
+        fields = [
+            *AppointmentSerializer.Meta.fields, 'purpose', 'special_instructions', 'actual_start_time',
+            'actual_end_time', 'location_notes', 'required_equipment', 'actual_cost', 'insurance_approved',
+            'co_pay_amount', 'reminder_sent', 'reminder_sent_at', 'patient_contacted',
+            'next_appointment_recommended', 'follow_up_date', 'created_at', 'updated_at', 'cancelled_at',
+            'cancellation_reason', *restricted_fields,
+        ]
+
+
+# Fields whose representation is the database value itself.
+_PASSTHROUGH = (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                serializers.FloatField, serializers.ChoiceField)
+
+
+def _model_field(model, path):
+    """The concrete model field at the end of ``path`` (``user__first_name``)."""
+    *relations, name = path.split('__')
+    try:
+        for relation in relations:
+            field = model._meta.get_field(relation)
+            if not field.many_to_one and not field.one_to_one:
+                raise FieldDoesNotExist(relation)
+            model = field.related_model
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        field = None
+    if field is None or not field.concrete or field.many_to_many:
+        raise ImproperlyConfigured(f'{model.__name__}.{path} is not a database column; FieldPlan cannot read it.')
+    return field
+
+
+def _converter(serializer_field, model_field):
+    """``None`` when the column needs no conversion, else a callable."""
+    if isinstance(serializer_field, serializers.PrimaryKeyRelatedField):
+        if serializer_field.pk_field is not None:
+            return serializer_field.pk_field.to_representation
+        # The renderer would turn UUID primary keys into strings anyway.
+        return str if isinstance(model_field.target_field, models.UUIDField) else None
+    if isinstance(serializer_field, serializers.UUIDField) and serializer_field.uuid_format == 'hex_verbose':
+        return str
+    if isinstance(serializer_field, _PASSTHROUGH):
+        return None
+    return serializer_field.to_representation
+
+
+class FieldPlan:
+    """
+    A serializer's read fields compiled for ``values_list()`` rows.
+
+    Only plain column sources are supported (``user.first_name`` is fine,
+    properties and method fields are not). Use ``FieldPlan.for_serializer()``
+    to share one compiled plan per serializer class.
+    """
+
+    _plans = {}
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.names = []
+        self.paths = []
+        converters = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} cannot be compiled into a FieldPlan.')
+            path = field.source.replace('.', '__')
+            self.names.append(name)
+            self.paths.append(path)
+            converters.append(_converter(field, _model_field(model, path)))
+        self.converters = [(index, convert) for index, convert in enumerate(converters) if convert is not None]
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        plan = cls._plans.get(serializer_class)
+        if plan is None:
+            plan = cls._plans[serializer_class] = cls(serializer_class)
+        return plan
+
+    def values_list(self, queryset, extra=()):
+        """
+        ``queryset.values_list()`` of the plan's columns, followed by any
+        ``extra`` columns (e.g. ordering columns a paginator needs) that
+        ``rows()`` will drop again.
+        """
+        return queryset.values_list(*self.paths, *[path for path in extra if path not in self.paths])
+
+    def rows(self, rows):
+        """Output dicts for ``values_list()`` tuples."""
+        names = self.names
+        converters = self.converters
+        if not converters:
+            return [dict(zip(names, row)) for row in rows]
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, convert in converters:
+                value = row[index]
+                if value is not None:
+                    row[index] = convert(value)
+            data.append(dict(zip(names, row)))
+        return data
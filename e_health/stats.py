@@ -0,0 +1,173 @@
+"""
+Incremental maintenance of ``DoctorStats``.
+
+Each ``Case`` and ``Appointment`` row contributes a few counters to one
+doctor's stats row (its status column, plus revenue for completed
+appointments). On save the hooks subtract the row's contribution as it was
+loaded (``LoadedValuesMixin``) and add its new one; on delete they subtract
+it. The difference is applied with ``UPDATE ... SET col = col + delta``, so
+concurrent writers never overwrite each other's counts.
+
+Bulk writes (``bulk_create()``, ``QuerySet.update()``, raw SQL) skip the
+hooks; run ``rebuild_doctor_stats()`` after them, and
+``check_doctor_stats()`` to find drift.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from e_health.models import Appointment, Case, Doctor, DoctorStats
+
+CASE_COLUMNS = {status: f'cases_{status.lower()}' for status, _ in Case.STATUS_CHOICES}
+APPOINTMENT_COLUMNS = {status: f'appointments_{status.lower()}' for status, _ in Appointment.STATUS_CHOICES}
+REVENUE_STATUS = 'COMPLETED'
+COLUMNS = [*CASE_COLUMNS.values(), *APPOINTMENT_COLUMNS.values(), 'revenue']
+
+
+def _case_contribution(values):
+    doctor_id = values.get('primary_doctor_id')
+    if doctor_id is None or values.get('status') not in CASE_COLUMNS:
+        return None, {}
+    return doctor_id, {CASE_COLUMNS[values['status']]: 1}
+
+
+def _appointment_contribution(values):
+    doctor_id = values.get('doctor_id')
+    if doctor_id is None or values.get('status') not in APPOINTMENT_COLUMNS:
+        return None, {}
+    contribution = {APPOINTMENT_COLUMNS[values['status']]: 1}
+    if values['status'] == REVENUE_STATUS and values.get('actual_cost'):
+        contribution['revenue'] = Decimal(str(values['actual_cost']))
+    return doctor_id, contribution
+
+
+CONTRIBUTIONS = {Case: _case_contribution, Appointment: _appointment_contribution}
+
+
+def _current_values(instance):
+    return {name: getattr(instance, name) for name in instance.tracked_fields}
+
+
+def apply_deltas(deltas, using='default', create=True):
+    """
+    Apply ``{doctor_id: {column: delta}}`` with ``F()`` updates. Missing stats
+    rows are created when ``create`` is set (never for deletes, whose doctor
+    may be in the middle of being deleted itself).
+    """
+    stats = DoctorStats.objects.using(using)
+    for doctor_id, columns in deltas.items():
+        changes = {column: F(column) + delta for column, delta in columns.items() if delta}
+        if not changes:
+            continue
+        if not stats.filter(doctor_id=doctor_id).update(**changes) and create:
+            with transaction.atomic(using=using):
+                stats.get_or_create(doctor_id=doctor_id)
+                stats.filter(doctor_id=doctor_id).update(**changes)
+
+
+def _delta(before, after):
+    deltas = defaultdict(Counter)
+    doctor_id, contribution = before
+    for column, amount in contribution.items():
+        deltas[doctor_id][column] -= amount
+    doctor_id, contribution = after
+    for column, amount in contribution.items():
+        deltas[doctor_id][column] += amount
+    deltas.pop(None, None)
+    return deltas
+
+
+def _before_save(sender, instance, raw=False, using=None, **kwargs):
+    if raw or instance._state.adding:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if len(loaded) < len(instance.tracked_fields):
+        # Constructed by hand or loaded with deferred fields: read the old row.
+        row = sender._base_manager.using(using).filter(pk=instance.pk).values(*instance.tracked_fields).first()
+        instance._loaded_values = row or {}
+
+
+def _after_save(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    contribution = CONTRIBUTIONS[sender]
+    before = (None, {}) if created else contribution(getattr(instance, '_loaded_values', {}))
+    current = _current_values(instance)
+    apply_deltas(_delta(before, contribution(current)), using=using)
+    instance._loaded_values = current
+
+
+def _after_delete(sender, instance, using=None, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or _current_values(instance)
+    apply_deltas(_delta(CONTRIBUTIONS[sender](loaded), (None, {})), using=using, create=False)
+
+
+def connect_signals():
+    """Called from ``EHealthConfig.ready()``."""
+    for model in CONTRIBUTIONS:
+        uid = f'e_health_stats_{model._meta.model_name}'
+        pre_save.connect(_before_save, sender=model, dispatch_uid=f'{uid}_pre_save')
+        post_save.connect(_after_save, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_after_delete, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+def compute_doctor_stats(using='default'):
+    """``{doctor_id: {column: value}}`` computed from scratch with two grouped queries."""
+    result = defaultdict(lambda: dict.fromkeys(COLUMNS, 0))
+    cases = (
+        Case.objects.using(using).filter(primary_doctor__isnull=False).order_by()
+        .values('primary_doctor_id')
+        .annotate(**{column: Count('pk', filter=Q(status=status)) for status, column in CASE_COLUMNS.items()})
+    )
+    for row in cases:
+        result[row.pop('primary_doctor_id')].update(row)
+    appointments = (
+        Appointment.objects.using(using).order_by().values('doctor_id')
+        .annotate(
+            **{column: Count('pk', filter=Q(status=status)) for status, column in APPOINTMENT_COLUMNS.items()},
+            revenue=Sum('actual_cost', filter=Q(status=REVENUE_STATUS), default=0),
+        )
+    )
+    for row in appointments:
+        result[row.pop('doctor_id')].update(row)
+    return result
+
+
+def rebuild_doctor_stats(using='default', batch_size=1000):
+    """Replace the whole ``DoctorStats`` table with freshly computed rows; returns the row count."""
+    computed = compute_doctor_stats(using)
+    doctor_ids = Doctor.objects.using(using).values_list('pk', flat=True)
+    rows = [DoctorStats(doctor_id=doctor_id, **computed.get(doctor_id, dict.fromkeys(COLUMNS, 0)))
+            for doctor_id in doctor_ids]
+    with transaction.atomic(using=using):
+        DoctorStats.objects.using(using).all().delete()
+        DoctorStats.objects.using(using).bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def check_doctor_stats(using='default'):
+    """
+    Compare the table with freshly computed values. Returns a list of
+    ``(doctor_id, column, stored, expected)``; empty when consistent.
+    """
+    computed = compute_doctor_stats(using)
+    stored = {row.pop('doctor_id'): row for row in DoctorStats.objects.using(using).values('doctor_id', *COLUMNS)}
+    zeros = dict.fromkeys(COLUMNS, 0)
+    drift = []
+    for doctor_id in sorted(set(computed) | set(stored), key=str):
+        expected = computed.get(doctor_id, zeros)
+        actual = stored.get(doctor_id, zeros)
+        for column in COLUMNS:
+            if Decimal(actual[column] or 0) != Decimal(expected[column] or 0):
+                drift.append((doctor_id, column, actual[column], expected[column]))
+    return drift
+
+
+def doctor_dashboard(doctor, using='default'):
+    """The doctor's ``DoctorStats`` (a primary-key lookup), or an all-zero unsaved row."""
+    doctor_id = doctor.pk if isinstance(doctor, Doctor) else doctor
+    stats = DoctorStats.objects.using(using).filter(pk=doctor_id).first()
+    return stats or DoctorStats(doctor_id=doctor_id)
@@ -1,7 +1,65 @@
 
 
-from django.test import TestCase
-from .models import TestCustomFielModel
+import io
+import json
+import os
+import sys
+import tempfile
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import Permission, User
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from core.cache_backends import SQLiteCounterCache
+from core.db_pool import pool_options, pool_stats
+from core.db_routers import PrimaryReplicaRouter, ReplicaStickinessMiddleware, sticky, use_primary
+from . import cache
+from .allocators import case_numbers
+from .billing import bill_case, recompute_case_billing
+from .fields import IntegerList, ModelArtifact, artifact_cache
+from .models import Appointment, Case, CaseNumberCounter, Doctor, DoctorStats, Patient, TestCustomFielModel, Treatment
+from .nplusone import NPlusOneError, detect_n_plus_one
+from .pagination import KeysetPagination, keyset_paginate
+from .profiling import SQLProfileMiddleware, fingerprint, profile_sql
+from .renderers import FastJSONRenderer
+from .scheduling import find_free_slots, is_slot_free, parse_availability
+from .reminders import LAG_SAMPLES, FileSender, ReminderDispatcher
+from .search import rebuild_search_index, search_patients
+from .stats import check_doctor_stats, doctor_dashboard, rebuild_doctor_stats
+from .serializers import AppointmentSerializer, CaseSerializer, DoctorSerializer, FieldPlan, PatientSerializer
+
+
+def api_user(username="api_reader", clinical=False):
+	"""A user who may view every model, and clinical notes if ``clinical``."""
+	user = User.objects.create_user(username=username)
+	codenames = [f'view_{model._meta.model_name}' for model in (Patient, Doctor, Case, Treatment, Appointment)]
+	if clinical:
+		codenames.append('view_clinical_data')
+	user.user_permissions.set(Permission.objects.filter(content_type__app_label='e_health', codename__in=codenames))
+	return User.objects.get(pk=user.pk)
+
+
+def api_client(username="api_reader", clinical=False):
+	"""An APIClient logged in as ``api_user(username, clinical)``."""
+	user = api_user(username, clinical)
+	# Load the permission cache up front so query counts only see the view.
+	user.get_all_permissions()
+	client = APIClient()
+	client.force_authenticate(user)
+	return client
 
 class TestCustomModelFieldTest(TestCase):
 	def test_comma_separated_char_field(self):
@@ -40,3 +98,1158 @@ class TestCustomModelFieldTest(TestCase):
 		print(f"Retrieved value (string input): {retrieved2.comma_separated_numbers}")
 		print(f"Type of retrieved value (string input): {type(retrieved2.comma_separated_numbers)}")
 		self.assertEqual(retrieved2.comma_separated_numbers, [6, 7, 8])
+
+
+class CaseNumberAllocatorTest(TestCase):
+	def setUp(self):
+		self.patient = Patient.objects.create(first_name="Ada", last_name="Byron", date_of_birth="1990-01-01")
+
+	def test_save_and_bulk_create_assign_unique_numbers(self):
+		saved = [
+			Case.objects.create(patient=self.patient, chief_complaint="Cough", symptoms_description="Dry cough")
+			for _ in range(3)
+		]
+		bulk = Case.objects.bulk_create(
+			Case(patient=self.patient, chief_complaint="Fever", symptoms_description="High fever")
+			for _ in range(120)
+		)
+		numbers = [case.case_number for case in saved + bulk]
+		self.assertEqual(len(set(numbers)), 123)
+		self.assertTrue(all(number.startswith("CASE") for number in numbers))
+
+	def test_counter_advances_per_block(self):
+		case_numbers.reset()
+		case_numbers.allocate(case_numbers.block_size)
+		case_numbers.allocate(1)
+		counter = CaseNumberCounter.objects.get()
+		self.assertEqual(counter.last_value, case_numbers.block_size * 2)
+
+
+class LoadingProfileTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_house", first_name="Greg", last_name="House"),
+			license_number="LIC1", medical_degree="MD", years_of_experience=20,
+		)
+		for day in range(1, 4):
+			patient = Patient.objects.create(first_name=f"P{day}", last_name="Test", date_of_birth="1990-01-01")
+			Appointment.objects.create(
+				patient=patient, doctor=doctor, appointment_date=f"2030-01-0{day}", appointment_time="09:00",
+				appointment_type="CONSULTATION", purpose="Check-up",
+			)
+
+	def test_lazy_loads_in_a_loop_are_detected(self):
+		with self.assertRaises(NPlusOneError), detect_n_plus_one():
+			[str(a) for a in Appointment.objects.all()]
+
+	def test_for_listing_loads_everything_str_needs(self):
+		with self.assertNumQueries(1), detect_n_plus_one():
+			[str(a) for a in Appointment.objects.for_listing()]
+
+
+class PatientSearchTest(TestCase):
+	def test_accent_insensitive_ranked_search_stays_in_sync(self):
+		helene = Patient.objects.create(first_name="Hélène", last_name="Smith", date_of_birth="1995-02-17", email="helene@example.com")
+		Patient.objects.create(first_name="John", last_name="Smith", date_of_birth="1990-05-10")
+
+		self.assertEqual([p.pk for p in search_patients("Helene")], [helene.pk])
+		self.assertEqual(len(search_patients("smith")), 2)
+
+		helene.last_name = "Dubois"
+		helene.save()
+		self.assertEqual([p.pk for p in search_patients("helene dub")], [helene.pk])
+
+		helene.delete()
+		self.assertEqual(search_patients("helene"), [])
+		with connections["default"].cursor() as cursor:
+			cursor.execute("SELECT count(*) FROM patient_search_key")
+			self.assertEqual(cursor.fetchone()[0], Patient.objects.count())
+
+		rebuild_search_index()
+		self.assertEqual(len(search_patients("smith")), 1)
+
+
+class FreeSlotFinderTest(TestCase):
+	def test_free_slots_skip_booked_time(self):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_slots"), license_number="LIC2",
+			medical_degree="MD", years_of_experience=3, availability_hours="Mon-Fri 9-5",
+		)
+		patient = Patient.objects.create(first_name="Sam", last_name="Slot", date_of_birth="1980-01-01")
+		monday = date(2030, 1, 7)
+		Appointment.objects.create(
+			patient=patient, doctor=doctor, appointment_date=monday, appointment_time=time(10, 0),
+			estimated_duration=60, appointment_type="CONSULTATION", purpose="Check-up",
+		)
+
+		with self.assertNumQueries(1):
+			slots = find_free_slots([doctor], monday, monday + timedelta(days=6))[doctor.pk]
+
+		starts = [slot.start.time() for slot in slots if slot.start.date() == monday]
+		self.assertEqual(len(starts), 14)
+		self.assertNotIn(time(10, 0), starts)
+		self.assertNotIn(time(10, 30), starts)
+		self.assertIn(time(11, 0), starts)
+		# Saturday and Sunday are outside "Mon-Fri".
+		self.assertEqual(len(slots), 5 * 16 - 2)
+
+	def test_slots_are_aware_and_overnight_bookings_carry_into_the_next_day(self):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_night"), license_number="LIC3",
+			medical_degree="MD", years_of_experience=3,
+		)
+		patient = Patient.objects.create(first_name="Nat", last_name="Night", date_of_birth="1980-01-01")
+		sunday = date(2030, 1, 6)
+		Appointment.objects.create(
+			patient=patient, doctor=doctor, appointment_date=sunday, appointment_time=time(23, 30),
+			estimated_duration=60, appointment_type="CONSULTATION", purpose="Night shift",
+		)
+		every_day = (frozenset(range(7)), (0, 24 * 60))
+		slots = find_free_slots([doctor], sunday + timedelta(days=1), sunday + timedelta(days=1), working_hours=every_day)[doctor.pk]
+		self.assertTrue(all(timezone.is_aware(slot.start) and timezone.is_aware(slot.end) for slot in slots))
+		self.assertEqual(slots[0].start, timezone.make_aware(datetime(2030, 1, 7, 0, 30)))
+		self.assertFalse(is_slot_free(doctor, sunday + timedelta(days=1), time(0, 0), 15))
+		self.assertFalse(is_slot_free(doctor, sunday - timedelta(days=1), time(23, 0), 25 * 60))
+		self.assertTrue(is_slot_free(doctor, sunday + timedelta(days=1), time(0, 30), 30))
+
+	def test_parse_availability(self):
+		self.assertEqual(parse_availability("Sat 10:00-14:00"), (frozenset({5}), (600, 840)))
+		self.assertEqual(parse_availability("whenever")[1], (540, 1020))
+
+
+class IntegerListLookupTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		TestCustomFielModel.objects.create(number=1, comma_separated_numbers=[1, 12, 3], packed_numbers=[1, 12, 3])
+		TestCustomFielModel.objects.create(number=2, comma_separated_numbers=[2, 21], packed_numbers=[2, 21])
+
+	def test_array_storage_round_trip(self):
+		self.assertEqual(TestCustomFielModel.objects.get(number=1).packed_numbers, [1, 12, 3])
+
+	def test_fields_return_lazily_parsed_integer_lists(self):
+		obj = TestCustomFielModel.objects.get(number=1)
+		for value in (obj.comma_separated_numbers, obj.packed_numbers):
+			self.assertIsInstance(value, IntegerList)
+			self.assertIsNone(value._values)
+			self.assertEqual(value.as_memoryview().tolist(), [1, 12, 3])
+		obj.comma_separated_numbers.append(4)
+		obj.save()
+		self.assertEqual(TestCustomFielModel.objects.get(number=1).comma_separated_numbers, [1, 12, 3, 4])
+
+	def test_memoryview_shares_the_array(self):
+		value = IntegerList(1, 12, 3)
+		view = value.as_memoryview()
+		self.assertIs(view.obj, value.values)
+		self.assertEqual((view.format, view.nbytes, view.readonly), ('q', 24, True))
+		# The view holds the array's own buffer, so the array cannot grow under it.
+		with self.assertRaises(BufferError):
+			value.append(4)
+		view.release()
+		value.append(4)
+		if sys.version_info >= (3, 12):
+			self.assertEqual(memoryview(value).tolist(), [1, 12, 3, 4])
+		else:
+			with self.assertRaises(TypeError):
+				memoryview(value)
+
+	def test_has_int_and_overlaps_run_in_the_database(self):
+		for field in ("comma_separated_numbers", "packed_numbers"):
+			numbers = TestCustomFielModel.objects.order_by("number").values_list("number", flat=True)
+			self.assertEqual(list(numbers.filter(**{f"{field}__has_int": 2})), [2], field)
+			self.assertEqual(list(numbers.filter(**{f"{field}__has_int": 12})), [1], field)
+			self.assertEqual(list(numbers.filter(**{f"{field}__overlaps": [3, 21]})), [1, 2], field)
+			self.assertEqual(list(numbers.filter(**{f"{field}__overlaps": [5]})), [], field)
+
+
+class ModelArtifactFieldTest(TestCase):
+	def setUp(self):
+		artifact_cache.clear()
+		self.addCleanup(artifact_cache.clear)
+
+	def test_rows_sharing_a_model_deserialize_it_once(self):
+		artifact = ModelArtifact.from_object({'weights': [0.5, 1.5]}, metrics={'auc': 0.91})
+		TestCustomFielModel.objects.bulk_create(
+			TestCustomFielModel(number=i, comma_separated_numbers=[i], model_artifact=artifact) for i in range(50)
+		)
+		artifact_cache.clear()
+		loaded = [obj.model_artifact.load() for obj in TestCustomFielModel.objects.all()]
+		self.assertEqual(loaded[0], {'weights': [0.5, 1.5]})
+		self.assertTrue(all(model is loaded[0] for model in loaded))
+		self.assertEqual(artifact_cache.misses, 1)
+		self.assertEqual(TestCustomFielModel.objects.first().model_artifact.metrics, {'auc': 0.91})
+
+	def test_file_storage_is_content_addressed_and_memory_mapped(self):
+		with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+			for i in range(2):
+				TestCustomFielModel.objects.create(number=i, comma_separated_numbers=[i], model_file=[1, 2, 3])
+			self.assertEqual(len(os.listdir(os.path.join(media_root, 'test_artifacts'))), 1)
+			artifact_cache.clear()
+			artifact = TestCustomFielModel.objects.first().model_file
+			self.assertEqual(artifact.load(), [1, 2, 3])
+			self.assertEqual(artifact.format, 'pickle')
+
+	def test_failed_load_releases_the_key(self):
+		def broken():
+			raise OSError("unreadable")
+
+		with self.assertRaises(OSError):
+			artifact_cache.get('k', broken)
+		self.assertEqual(artifact_cache._loading, {})
+		self.assertEqual(artifact_cache.get('k', lambda: ('model', 5)), 'model')
+
+
+class KeysetPaginationTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		patient = Patient.objects.create(first_name="Kay", last_name="Set", date_of_birth="1985-03-03")
+		for n in range(2):
+			doctor = Doctor.objects.create(
+				user=User.objects.create_user(username=f"dr_keyset{n}"), license_number=f"KEY{n}",
+				medical_degree="MD", years_of_experience=5,
+			)
+			# Both doctors share dates and times, so the uuid has to break ties.
+			for day in range(1, 5):
+				Appointment.objects.create(
+					patient=patient, doctor=doctor, appointment_date=date(2030, 2, day), appointment_time=time(9, 0),
+					appointment_type="CONSULTATION", purpose="Check-up",
+				)
+		cls.expected = list(Appointment.objects.order_by('appointment_date', 'appointment_time', 'uuid'))
+
+	def test_pages_walk_forwards_and_backwards_one_query_each(self):
+		pages, cursor = [], None
+		while True:
+			with self.assertNumQueries(1):
+				page = keyset_paginate(Appointment.objects.all(), cursor=cursor, page_size=3)
+			pages.append(page)
+			cursor = page.next_cursor
+			if cursor is None:
+				break
+		self.assertEqual([a for page in pages for a in page.object_list], self.expected)
+		self.assertEqual([len(page.object_list) for page in pages], [3, 3, 2])
+		self.assertIsNone(pages[0].previous_cursor)
+
+		back = keyset_paginate(Appointment.objects.all(), cursor=pages[-1].previous_cursor, page_size=3)
+		self.assertEqual(back.object_list, pages[1].object_list)
+		self.assertEqual(back.next_cursor, pages[1].next_cursor)
+
+	def test_drf_pagination_links_and_bad_cursors(self):
+		paginator = KeysetPagination()
+		paginator.page_size = 5
+		request = Request(APIRequestFactory().get('/api/appointments/'))
+		self.assertEqual(paginator.paginate_queryset(Appointment.objects.all(), request), self.expected[:5])
+		data = paginator.get_paginated_response([]).data
+		self.assertIsNone(data['previous'])
+		self.assertIn('cursor=', data['next'])
+
+		with self.assertRaises(NotFound):
+			paginator.paginate_queryset(Appointment.objects.all(), Request(APIRequestFactory().get('/?cursor=nope')))
+
+
+class ReadApiTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_api", first_name="Ana", last_name="Lyst"),
+			license_number="API1", medical_degree="MD", years_of_experience=7, consultation_fee="120.5",
+		)
+		for n in range(3):
+			patient = Patient.objects.create(first_name=f"Api{n}", last_name="Patient", date_of_birth="1970-06-0%d" % (n + 1))
+			case = Case.objects.create(patient=patient, primary_doctor=doctor, chief_complaint="Pain",
+			                           symptoms_description="Back pain", estimated_cost="99.9")
+			Appointment.objects.create(
+				patient=patient, doctor=doctor, case=case, appointment_date=date(2030, 3, n + 1),
+				appointment_time=time(8, 30), appointment_type="CONSULTATION", purpose="Check-up",
+			)
+
+	def setUp(self):
+		cache.clear()
+
+	def test_field_plan_matches_model_serializer_output(self):
+		for serializer_class, model in ((PatientSerializer, Patient), (DoctorSerializer, Doctor),
+		                                (CaseSerializer, Case), (AppointmentSerializer, Appointment)):
+			plan = FieldPlan.for_serializer(serializer_class)
+			with self.subTest(model=model.__name__):
+				expected = JSONRenderer().render(serializer_class(model.objects.all(), many=True).data)
+				fast = FastJSONRenderer().render(plan.rows(plan.values_list(model.objects.all())))
+				self.assertEqual(json.loads(fast), json.loads(expected))
+
+	def test_list_endpoint_is_one_query_per_page(self):
+		client = api_client()
+		with self.assertNumQueries(1):
+			response = client.get('/api/appointments/', {'page_size': 2})
+		self.assertEqual(response.status_code, 200)
+		data = response.json()
+		self.assertEqual([a['appointment_date'] for a in data['results']], ['2030-03-01', '2030-03-02'])
+		self.assertEqual(client.get(data['next']).json()['results'][0]['appointment_date'], '2030-03-03')
+
+		doctors = client.get('/api/doctors/').json()['results']
+		self.assertEqual((doctors[0]['first_name'], doctors[0]['consultation_fee']), ('Ana', '120.50'))
+		patient = Patient.objects.first()
+		self.assertEqual(client.get(f'/api/patients/{patient.pk}/').json()['full_name'], patient.full_name)
+
+	def test_anonymous_and_unprivileged_users_are_refused(self):
+		patient = Patient.objects.first()
+		for path in ('/api/patients/', f'/api/patients/{patient.pk}/', f'/api/patients/{patient.pk}/timeline/',
+		             '/api/cases/', '/api/appointments/'):
+			with self.subTest(path=path):
+				self.assertIn(APIClient().get(path).status_code, (401, 403))
+		client = APIClient()
+		client.force_authenticate(User.objects.create_user(username="no_perms"))
+		self.assertEqual(client.get('/api/patients/').status_code, 403)
+
+	def test_clinical_fields_need_the_clinical_permission(self):
+		case = Case.objects.first()
+		basic, clinical = api_client(), api_client("clinician", clinical=True)
+		for client, shown in ((basic, False), (clinical, True), (basic, False)):
+			data = client.get(f'/api/cases/{case.pk}/').json()
+			self.assertEqual('symptoms_description' in data, shown)
+			self.assertEqual(data['chief_complaint'], "Pain")
+			# The response cache keeps the two variants apart.
+			patient = client.get(f'/api/patients/{case.patient_id}/').json()
+			self.assertEqual('medical_history' in patient, shown)
+			self.assertEqual(patient['first_name'], case.patient.first_name)
+		appointment = client.get(f'/api/appointments/{Appointment.objects.first().pk}/').json()
+		self.assertNotIn('outcome_notes', appointment)
+
+
+class CounterCacheTest(SimpleTestCase):
+	def setUp(self):
+		tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(tmp.cleanup)
+		self.counters = SQLiteCounterCache(os.path.join(tmp.name, 'counters.sqlite3'), {})
+
+	def test_concurrent_increments_are_never_lost(self):
+		self.assertTrue(self.counters.add('gen', 10, timeout=None))
+		self.assertFalse(self.counters.add('gen', 0, timeout=None))
+		with ThreadPoolExecutor(8) as executor:
+			list(executor.map(lambda _: self.counters.incr('gen'), range(400)))
+		self.assertEqual(self.counters.get('gen'), 410)
+		with self.assertRaises(ValueError):
+			self.counters.incr('missing')
+
+	def test_values_and_expiry(self):
+		self.counters.set('blob', {'a': [1, 2]})
+		self.assertEqual(self.counters.get('blob'), {'a': [1, 2]})
+		self.counters.set('gone', 1, timeout=-1)
+		self.assertIsNone(self.counters.get('gone'))
+		self.assertTrue(self.counters.add('gone', 2))
+		self.assertTrue(self.counters.delete('gone'))
+		self.counters.clear()
+		self.assertIsNone(self.counters.get('blob'))
+
+
+class ResponseCacheTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.patient = Patient.objects.create(first_name="Cache", last_name="Me", date_of_birth="1991-01-01")
+		cls.doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_cache", first_name="Old"), license_number="CCH1",
+			medical_degree="MD", years_of_experience=2,
+		)
+
+	def setUp(self):
+		cache.clear()
+		self.client = api_client()
+
+	def test_responses_are_cached_until_a_write_bumps_the_generation(self):
+		with self.assertNumQueries(1):
+			self.client.get('/api/patients/')
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get('/api/patients/').json()['results'][0]['first_name'], "Cache")
+
+		self.patient.first_name = "Fresh"
+		self.patient.save()
+		with self.assertNumQueries(1):
+			self.assertEqual(self.client.get('/api/patients/').json()['results'][0]['first_name'], "Fresh")
+		self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'invalidations': 1})
+
+	def test_user_changes_invalidate_doctor_listings(self):
+		self.assertEqual(self.client.get('/api/doctors/').json()['results'][0]['first_name'], "Old")
+		self.doctor.user.first_name = "New"
+		self.doctor.user.save()
+		self.assertEqual(self.client.get('/api/doctors/').json()['results'][0]['first_name'], "New")
+
+	def test_user_saves_that_keep_the_name_leave_doctor_listings_cached(self):
+		user = User.objects.get(pk=self.doctor.user_id)
+		user.last_login = timezone.now()
+		user.save(update_fields=['last_login'])
+		user.set_password("secret")
+		user.save()
+		self.assertEqual(cache.stats()['invalidations'], 0)
+		user.last_name = "Renamed"
+		user.save()
+		self.assertEqual(cache.stats()['invalidations'], 1)
+
+	def test_stats_endpoint_is_admin_only(self):
+		self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+		self.client = APIClient()
+		self.client.force_authenticate(User.objects.create_superuser(username="admin_cache"))
+		self.client.get('/api/treatments/')
+		stats = self.client.get('/api/cache-stats/').json()
+		self.assertEqual((stats['misses'], stats['hits']), (1, 0))
+		self.assertIn('e_health.patient', stats['generations'])
+
+
+class DoctorStatsTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.doctors = [
+			Doctor.objects.create(
+				user=User.objects.create_user(username=f"dr_stats{n}"), license_number=f"STS{n}",
+				medical_degree="MD", years_of_experience=4,
+			)
+			for n in range(2)
+		]
+		cls.patient = Patient.objects.create(first_name="Stat", last_name="Patient", date_of_birth="1960-01-01")
+
+	def test_saves_and_deletes_apply_deltas(self):
+		first, second = self.doctors
+		Case.objects.create(patient=self.patient, primary_doctor=first, chief_complaint="Cough", symptoms_description="Dry")
+		case = Case.objects.get()
+		case.status = 'CLOSED'
+		case.save()
+		appointment = Appointment.objects.create(
+			patient=self.patient, doctor=first, appointment_date=date(2030, 4, 1), appointment_time=time(9, 0),
+			appointment_type="CONSULTATION", purpose="Check-up", status='COMPLETED', actual_cost="150.00",
+		)
+
+		with self.assertNumQueries(1):
+			stats = doctor_dashboard(first)
+		self.assertEqual((stats.cases_open, stats.cases_closed, stats.appointments_completed), (0, 1, 1))
+		self.assertEqual(stats.revenue, 150)
+
+		appointment = Appointment.objects.get()
+		appointment.doctor = second
+		appointment.save()
+		self.assertEqual(doctor_dashboard(first).revenue, 0)
+		self.assertEqual(doctor_dashboard(second).revenue, 150)
+		self.assertEqual(check_doctor_stats(), [])
+
+		self.patient.delete()
+		self.assertEqual([doctor_dashboard(d).total_appointments + doctor_dashboard(d).total_cases for d in self.doctors], [0, 0])
+		self.assertEqual(check_doctor_stats(), [])
+
+	def test_check_finds_drift_from_bulk_updates_and_rebuild_fixes_it(self):
+		Case.objects.create(patient=self.patient, primary_doctor=self.doctors[0], chief_complaint="Cough", symptoms_description="Dry")
+		Case.objects.update(status='RESOLVED')  # no save hooks
+		self.assertEqual(
+			[(column, stored, expected) for _, column, stored, expected in check_doctor_stats()],
+			[('cases_open', 1, 0), ('cases_resolved', 0, 1)],
+		)
+		self.assertEqual(rebuild_doctor_stats(), 2)
+		self.assertEqual(check_doctor_stats(), [])
+		self.assertEqual(DoctorStats.objects.get(pk=self.doctors[0].pk).cases_resolved, 1)
+
+
+class PatientAgeTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		births = [date(1990, 2, 28), date(1992, 2, 29), date(1992, 3, 1), date(1970, 6, 15), date(1970, 6, 16), date(2010, 12, 31)]
+		Patient.objects.bulk_create(
+			Patient(first_name=f"Age{n}", last_name="Test", date_of_birth=born) for n, born in enumerate(births)
+		)
+
+	@staticmethod
+	def python_age(born, as_of):
+		return as_of.year - born.year - ((as_of.month, as_of.day) < (born.month, born.day))
+
+	def test_sql_age_and_ranges_match_python(self):
+		for as_of in (date(2030, 2, 28), date(2032, 2, 29), date(2030, 6, 15), date(2030, 12, 31)):
+			patients = list(Patient.objects.with_age(as_of=as_of))
+			for patient in patients:
+				self.assertEqual(patient.age, self.python_age(patient.date_of_birth, as_of), (patient.date_of_birth, as_of))
+			for lo, hi in ((19, 20), (37, 40), (59, 60), (0, 100)):
+				expected = {p.pk for p in patients if lo <= p.age <= hi}
+				with self.subTest(as_of=as_of, lo=lo, hi=hi):
+					self.assertEqual({p.pk for p in Patient.objects.age_between(lo, hi, as_of=as_of)}, expected)
+
+	def test_age_between_is_a_date_of_birth_range(self):
+		sql = str(Patient.objects.age_between(40, 60).query)
+		self.assertIn('"date_of_birth" >', sql)
+		self.assertNotIn('django_date_extract', sql)
+
+
+@override_settings(TIME_ZONE='Asia/Tokyo')
+class AppointmentTimeFilterTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_time"), license_number="TIM1",
+			medical_degree="MD", years_of_experience=9,
+		)
+		patient = Patient.objects.create(first_name="Tim", last_name="Zone", date_of_birth="1980-08-08")
+		cls.slots = {}
+		for name, day, at, status in (
+			('yesterday_evening', date(2030, 5, 1), time(23, 0), 'SCHEDULED'),
+			('soon', date(2030, 5, 2), time(1, 0), 'CONFIRMED'),
+			('later', date(2030, 5, 2), time(2, 0), 'SCHEDULED'),
+			('cancelled', date(2030, 5, 2), time(1, 30), 'CANCELLED'),
+			('done', date(2030, 5, 1), time(9, 0), 'COMPLETED'),
+			('called_off', date(2030, 5, 1), time(10, 0), 'CANCELLED'),
+		):
+			cls.slots[name] = Appointment.objects.create(
+				patient=patient, doctor=doctor, appointment_date=day, appointment_time=at, status=status,
+				appointment_type="CONSULTATION", purpose="Check-up",
+			).pk
+
+	def names(self, queryset):
+		return sorted(name for name, pk in self.slots.items() if pk in set(queryset.values_list('pk', flat=True)))
+
+	def test_filters_compare_with_local_wall_clock_time(self):
+		# 15:30 UTC is 00:30 the next day in Tokyo.
+		now = datetime(2030, 5, 1, 15, 30, tzinfo=dt_timezone.utc)
+		self.assertEqual(self.names(Appointment.objects.upcoming(now)), ['later', 'soon'])
+		self.assertEqual(self.names(Appointment.objects.upcoming(now, statuses=None)), ['cancelled', 'later', 'soon'])
+		self.assertEqual(self.names(Appointment.objects.past(now)), ['called_off', 'done', 'yesterday_evening'])
+		self.assertEqual(self.names(Appointment.objects.past(now, statuses=['COMPLETED'])), ['done'])
+		self.assertEqual(self.names(Appointment.objects.overdue(now)), ['yesterday_evening'])
+		self.assertEqual(self.names(Appointment.objects.due_within(timedelta(hours=1), now)), ['soon'])
+
+
+class ReminderDispatcherTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_remind"), license_number="REM1",
+			medical_degree="MD", years_of_experience=6,
+		)
+		patient = Patient.objects.create(first_name="Remy", last_name="Nder", date_of_birth="1975-04-04", email="remy@example.com")
+		tomorrow = timezone.localtime() + timedelta(hours=12)
+		for n in range(5):
+			Appointment.objects.create(
+				patient=patient, doctor=doctor, appointment_date=tomorrow.date() + timedelta(days=3 * (n == 4)),
+				appointment_time=time(n, 0) if n < 4 else time(9, 0), appointment_type="CONSULTATION",
+				purpose="Check-up", reminder_sent=(n == 3),
+			)
+
+	def test_batches_send_and_mark_each_due_appointment_once(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'reminders.jsonl')
+			dispatcher = ReminderDispatcher(FileSender(path), lead=timedelta(days=2), batch_size=2)
+			expected = dispatcher.due().count()
+			metrics = dispatcher.run(once=True)
+			self.assertEqual(metrics.sent, expected)
+			self.assertEqual(metrics.batches, -(-expected // 2))
+			with open(path) as handle:
+				self.assertEqual(len(handle.readlines()), expected)
+			self.assertEqual(ReminderDispatcher(FileSender(path), lead=timedelta(days=2)).run(once=True).sent, 0)
+		self.assertEqual(Appointment.objects.filter(reminder_sent_at__isnull=False).count(), expected)
+
+	def test_failed_deliveries_stay_unmarked(self):
+		class Failing:
+			def send(self, appointments):
+				return appointments[:1]
+
+		metrics = ReminderDispatcher(Failing(), lead=timedelta(days=2)).run(once=True)
+		self.assertEqual(metrics.sent, 1)
+		self.assertGreater(metrics.failed, 0)
+		self.assertEqual(Appointment.objects.filter(reminder_sent=False).exclude(appointment_time=time(9, 0)).count(), metrics.failed)
+		self.assertEqual(Appointment.objects.filter(reminder_attempts=1, reminder_retry_at__isnull=False).count(), metrics.failed)
+
+	def test_failed_deliveries_back_off_and_are_given_up(self):
+		class Failing:
+			def send(self, appointments):
+				return []
+
+		dispatcher = ReminderDispatcher(Failing(), lead=timedelta(days=2), max_attempts=2, retry_delay=timedelta(minutes=1))
+		first = dispatcher.due().count()
+		self.assertEqual(dispatcher.dispatch_batch(), first)
+		self.assertEqual(dispatcher.dispatch_batch(), 0)
+		later = timezone.now() + timedelta(minutes=1)
+		self.assertEqual(dispatcher.dispatch_batch(now=later), first)
+		self.assertEqual(dispatcher.metrics.gave_up, first)
+		self.assertFalse(dispatcher.due(now=later + timedelta(hours=1)).exists())
+
+	def test_lag_samples_are_bounded(self):
+		dispatcher = ReminderDispatcher(FileSender(os.devnull), lead=timedelta(days=2))
+		dispatcher.metrics.lags.extend([1e9] + [1.0] * LAG_SAMPLES)
+		dispatcher.metrics.lag_max = 1e9
+		dispatcher.run(once=True)
+		self.assertEqual(len(dispatcher.metrics.lags), LAG_SAMPLES)
+		summary = dispatcher.metrics.summary()
+		self.assertLess(summary['lag_p95_s'], 1e9)
+		self.assertEqual(summary['lag_max_s'], 1e9)
+
+
+class CaseBillingTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_bill"), license_number="BIL1",
+			medical_degree="MD", years_of_experience=9,
+		)
+		patient = Patient.objects.create(first_name="Bill", last_name="Able", date_of_birth="1981-02-02", email="bill@example.com")
+		covered = Treatment.objects.create(
+			name="Scan", code="SCN1", category="DIAGNOSTIC", description="Scan",
+			base_cost=Decimal("76.00"), insurance_coverage_percentage=Decimal("80.00"), estimated_duration_minutes=20,
+		)
+		cls.cases = [
+			Case.objects.create(patient=patient, primary_doctor=doctor, chief_complaint="Pain", symptoms_description="Pain")
+			for _ in range(3)
+		]
+		rows = [
+			(cls.cases[0], covered, "76.00", "COMPLETED"),
+			(cls.cases[0], covered, "33.46", "COMPLETED"),
+			(cls.cases[0], None, "20.00", "COMPLETED"),
+			(cls.cases[0], covered, "500.00", "CANCELLED"),
+			(cls.cases[1], covered, "99.99", "COMPLETED"),
+		]
+		for hour, (case, treatment, cost, status) in enumerate(rows, start=8):
+			Appointment.objects.create(
+				patient=patient, doctor=doctor, case=case, treatment=treatment, appointment_date=date(2024, 5, 1),
+				appointment_time=time(hour, 0), appointment_type="PROCEDURE", purpose="Billing",
+				actual_cost=Decimal(cost), status=status,
+			)
+
+	def test_set_based_matches_python_rule(self):
+		run = recompute_case_billing(chunk_size=2)
+		self.assertEqual((run.cases, run.chunks, run.updated), (3, 2, 2))
+		first = Case.objects.get(pk=self.cases[0].pk)
+		# 76.00 * 80% + 33.46 * 80% = 87.568, rounded once at the end.
+		self.assertEqual(
+			(first.actual_cost, first.insurance_coverage, first.patient_liability),
+			(Decimal("129.46"), Decimal("87.57"), Decimal("41.89")),
+		)
+		for case in Case.objects.all():
+			stored = (case.actual_cost, case.insurance_coverage, case.patient_liability)
+			bill_case(case, save=False)
+			self.assertEqual(stored, (case.actual_cost, case.insurance_coverage, case.patient_liability))
+		self.assertEqual(recompute_case_billing().updated, 0)
+
+	def test_queryset_limits_the_cases_billed(self):
+		run = recompute_case_billing(Case.objects.filter(pk=self.cases[1].pk))
+		self.assertEqual((run.cases, run.updated), (1, 1))
+		self.assertEqual(Case.objects.get(pk=self.cases[0].pk).actual_cost, 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+	router = PrimaryReplicaRouter()
+
+	def test_reads_go_to_replicas_and_writes_to_primary(self):
+		self.assertIn(self.router.db_for_read(Patient), ['replica_1', 'replica_2'])
+		self.assertEqual(self.router.db_for_write(Patient), 'default')
+		# Without a sticky scope a write does not pin anything.
+		self.assertIn(self.router.db_for_read(Patient), ['replica_1', 'replica_2'])
+		with use_primary():
+			self.assertEqual(self.router.db_for_read(Patient), 'default')
+
+	def test_write_pins_reads_of_the_scope_to_primary(self):
+		with sticky() as scope:
+			self.assertIn(self.router.db_for_read(Patient), ['replica_1', 'replica_2'])
+			self.router.db_for_write(Patient)
+			self.assertTrue(scope.wrote)
+			self.assertEqual(self.router.db_for_read(Patient), 'default')
+		with sticky(seconds=0):
+			self.router.db_for_write(Patient)
+			self.assertIn(self.router.db_for_read(Patient), ['replica_1', 'replica_2'])
+
+	def test_middleware_carries_the_pin_to_the_next_request(self):
+		seen = []
+
+		def view(request):
+			seen.append(self.router.db_for_read(Patient))
+			if request.method == 'POST':
+				self.router.db_for_write(Patient)
+			return HttpResponse()
+
+		middleware = ReplicaStickinessMiddleware(view)
+		response = middleware(RequestFactory().post('/'))
+		cookie = response.cookies[ReplicaStickinessMiddleware.cookie_name]
+		self.assertEqual(cookie['max-age'], 5)
+		follow_up = RequestFactory().get('/')
+		follow_up.COOKIES[cookie.key] = cookie.value
+		self.assertNotIn(cookie.key, middleware(follow_up).cookies)
+		self.assertIn(seen[0], ['replica_1', 'replica_2'])
+		self.assertEqual(seen[1], 'default')
+
+	def test_middleware_bounds_the_cookie_pin(self):
+		middleware = ReplicaStickinessMiddleware(HttpResponse)
+		now = time_module.time()
+		for value, pinned in (('9e99', True), ('inf', False), ('nan', False), ('soon', False), (str(now - 1), False)):
+			request = RequestFactory().get('/')
+			request.COOKIES[middleware.cookie_name] = value
+			with self.subTest(value=value):
+				until = middleware.pinned_until(request)
+				self.assertEqual(until > 0, pinned)
+				self.assertLessEqual(until, time_module.time() + 5)
+
+	async def test_middleware_under_asgi(self):
+		async def view(request):
+			self.router.db_for_write(Patient)
+			return HttpResponse()
+
+		middleware = ReplicaStickinessMiddleware(view)
+		self.assertTrue(iscoroutinefunction(middleware))
+		response = await middleware(RequestFactory().post('/'))
+		self.assertIn(ReplicaStickinessMiddleware.cookie_name, response.cookies)
+
+
+@skipUnless('replica_1' in connections, 'needs core.test_settings')
+class ReplicaRoutingQueriesTest(TransactionTestCase):
+	databases = {alias for alias in ('default', 'replica_1', 'replica_2') if alias in connections}
+
+	def test_reads_after_commit_hit_a_replica(self):
+		Patient.objects.create(first_name="Rep", last_name="Lica", date_of_birth="1990-01-01", email="rep@example.com")
+		with CaptureQueriesContext(connections['default']) as primary:
+			with CaptureQueriesContext(connections['replica_1']) as first, CaptureQueriesContext(connections['replica_2']) as second:
+				self.assertEqual(Patient.objects.filter(email="rep@example.com").count(), 1)
+		self.assertEqual((len(primary), len(first) + len(second)), (0, 1))
+
+	def test_response_cache_fills_from_the_primary(self):
+		cache.clear()
+		Patient.objects.create(first_name="Rep", last_name="Lica", date_of_birth="1990-01-01")
+		client = api_client()
+		with CaptureQueriesContext(connections['default']) as primary:
+			with CaptureQueriesContext(connections['replica_1']) as first, CaptureQueriesContext(connections['replica_2']) as second:
+				self.assertEqual(client.get('/api/patients/').json()['results'][0]['first_name'], "Rep")
+		self.assertEqual((len(primary), len(first) + len(second)), (1, 0))
+
+	def test_benchmarks_count_queries_on_the_replicas(self):
+		from .benchmarking import measure
+
+		result = measure(lambda: Patient.objects.count(), iterations=1, warmup=0)
+		self.assertEqual(result['queries'], 1)
+
+	def test_timeline_cache_fills_from_the_primary(self):
+		from .timeline import QUERIES, patient_timeline
+
+		cache.clear()
+		patient = Patient.objects.create(first_name="Rep", last_name="Lica", date_of_birth="1990-01-01")
+		with CaptureQueriesContext(connections['default']) as primary:
+			with CaptureQueriesContext(connections['replica_1']) as first, CaptureQueriesContext(connections['replica_2']) as second:
+				self.assertEqual(patient_timeline(patient.pk)['patient']['full_name'], patient.full_name)
+		self.assertEqual(len(first) + len(second), 0)
+		self.assertLessEqual(len(primary), QUERIES)
+
+
+class ConnectionPoolTest(TestCase):
+	def test_pool_options_from_environment(self):
+		self.assertFalse(pool_options({'DB_POOL': 'off'}))
+		options = pool_options({'DB_POOL_MAX_SIZE': '20', 'DB_POOL_MAX_LIFETIME': '600'})
+		self.assertEqual((options['min_size'], options['max_size'], options['max_lifetime']), (2, 20, 600.0))
+
+	def test_pool_stats_reports_in_use_and_average_wait(self):
+		class FakePool:
+			def get_stats(self):
+				return {'pool_size': 5, 'pool_available': 2, 'requests_num': 4, 'requests_wait_ms': 10}
+
+		connection = connections['default']
+		self.assertEqual(pool_stats(['default']), {})
+		connection.pool = FakePool()
+		try:
+			stats = pool_stats(['default'])['default']
+		finally:
+			del connection.pool
+		self.assertEqual((stats['in_use'], stats['avg_wait_ms']), (3, 2.5))
+
+	def test_pool_stats_view_is_staff_only(self):
+		client = APIClient()
+		self.assertEqual(client.get('/api/pool-stats/').status_code, 403)
+		client.force_authenticate(User.objects.create_user(username='pool_admin', is_staff=True))
+		self.assertEqual(client.get('/api/pool-stats/').json(), {})
+
+
+class SQLProfilingTest(TestCase):
+	def test_fingerprint_collapses_literals_and_in_lists(self):
+		self.assertEqual(
+			fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  AND n > 10"),
+			"SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?",
+		)
+
+	def test_profile_counts_queries_and_repeated_statements(self):
+		with profile_sql('test', 'loop') as profile:
+			for email in ("a@example.com", "b@example.com", "c@example.com"):
+				Patient.objects.filter(email=email).exists()
+		record = profile.as_dict()
+		self.assertEqual(record['queries'], 3)
+		self.assertEqual(len(record['slowest']), 3)
+		self.assertEqual(record['repeated'][0]['count'], 3)
+		self.assertIn('tests.py:', record['repeated'][0]['site'])
+
+	def test_middleware_and_command_append_jsonl_records(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'profile.jsonl')
+			with override_settings(SQL_PROFILE=True, SQL_PROFILE_PATH=path):
+				def view(request):
+					Patient.objects.count()
+					return HttpResponse()
+
+				SQLProfileMiddleware(view)(RequestFactory().get('/api/patients/'))
+			call_command('rebuild_doctor_stats', profile_sql=path, stdout=io.StringIO())
+			with open(path) as handle:
+				records = [json.loads(line) for line in handle]
+		self.assertEqual([(r['kind'], r['name']) for r in records], [('request', 'GET /api/patients/'), ('command', 'rebuild_doctor_stats')])
+		self.assertEqual((records[0]['queries'], records[0]['status']), (1, 200))
+		self.assertGreaterEqual(records[1]['queries'], 3)
+
+	async def test_middleware_profiles_async_views(self):
+		async def view(request):
+			await Patient.objects.acount()
+			return HttpResponse(status=201)
+
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'profile.jsonl')
+			with override_settings(SQL_PROFILE=True, SQL_PROFILE_PATH=path):
+				middleware = SQLProfileMiddleware(view)
+				self.assertTrue(iscoroutinefunction(middleware))
+				await middleware(RequestFactory().get('/api/async/patients/'))
+			with open(path) as handle:
+				record = json.loads(handle.read())
+		self.assertEqual((record['name'], record['queries'], record['status']), ('GET /api/async/patients/', 1, 201))
+
+	def test_every_command_takes_profile_sql(self):
+		from django.core.management import get_commands, load_command_class
+		from .profiling import ProfiledCommandMixin
+
+		names = [name for name, app in get_commands().items() if app == 'e_health']
+		self.assertIn('query_expressions', names)
+		for name in names:
+			with self.subTest(command=name):
+				self.assertIsInstance(load_command_class('e_health', name), ProfiledCommandMixin)
+
+
+class BenchCommandTest(TestCase):
+	def test_scale_needs_reset_and_keeps_the_data_without_it(self):
+		Patient.objects.create(first_name="Keep", last_name="Me", date_of_birth="1990-01-01")
+		with self.assertRaisesMessage(CommandError, "--reset"):
+			call_command('bench', 'search.*', scale=0.01, stdout=io.StringIO())
+		self.assertEqual(Patient.objects.count(), 1)
+
+
+class FeedImporterTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_feed"), license_number="FEED1", medical_degree="MD",
+			years_of_experience=4,
+		)
+		cls.patient = Patient.objects.create(first_name="Fe", last_name="Ed", date_of_birth="1988-08-08", email="fe@example.com")
+		cls.treatment = Treatment.objects.create(
+			name="X-ray", code="FD-XR", description="Imaging", category="DIAGNOSTIC", base_cost="80.00",
+			estimated_duration_minutes=15,
+		)
+
+	def write(self, name, text):
+		tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(tmp.cleanup)
+		path = os.path.join(tmp.name, name)
+		with open(path, 'w', encoding='utf-8') as handle:
+			handle.write(text)
+		return path
+
+	def test_reads_csv_and_ndjson(self):
+		from .importers import read_rows
+
+		csv_path = self.write('patients.csv', 'first_name,last_name,date_of_birth\nZoë,Kim,1990-01-02\n')
+		ndjson_path = self.write('patients.ndjson', '{"first_name": "Ana", "middle_name": null}\n\n{"first_name": "Bo"}\n')
+		self.assertEqual(list(read_rows(csv_path)), [{'first_name': "Zoë", 'last_name': "Kim", 'date_of_birth': "1990-01-02"}])
+		self.assertEqual(list(read_rows(ndjson_path)), [{'first_name': "Ana", 'middle_name': None}, {'first_name': "Bo"}])
+		self.assertEqual(len(list(read_rows(csv_path, 'csv'))), 1)
+
+	def test_natural_keys_resolve_to_primary_keys(self):
+		from .importers import FeedImporter
+
+		FeedImporter(Case).run([{
+			'patient__email': "fe@example.com", 'primary_doctor__license_number': "FEED1",
+			'chief_complaint': "Cough", 'symptoms_description': "Dry cough",
+		}])
+		case = Case.objects.get(chief_complaint="Cough")
+		self.assertEqual((case.patient_id, case.primary_doctor_id, case.referring_doctor_id), (self.patient.pk, self.doctor.pk, None))
+		self.assertTrue(case.case_number)
+
+		written = FeedImporter(Appointment, batch_size=1).run([
+			{
+				'patient': str(self.patient.pk), 'doctor__license_number': "FEED1", 'case__case_number': case.case_number,
+				'treatment__code': "FD-XR", 'appointment_date': "2031-02-03", 'appointment_time': f"{hour}:00",
+				'appointment_type': "DIAGNOSTIC", 'purpose': "Imaging", 'notes': "",
+			}
+			for hour in (9, 10)
+		])
+		self.assertEqual(written, 2)
+		appointment = Appointment.objects.get(appointment_time=time(10))
+		self.assertEqual((appointment.case_id, appointment.treatment_id, appointment.status), (case.pk, self.treatment.pk, 'SCHEDULED'))
+
+	def test_unknown_keys_and_bad_rows_raise_and_write_nothing(self):
+		from .importers import FeedError, FeedImporter
+
+		row = {
+			'patient': str(self.patient.pk), 'doctor__license_number': "FEED1", 'appointment_date': "2031-02-03",
+			'appointment_time': "09:00", 'appointment_type': "CONSULTATION", 'purpose': "Check-up",
+		}
+		for bad, message in (
+			({'doctor__license_number': "NOPE"}, "No Doctor with license_number='NOPE'"),
+			({'appointment_date': "03.02.2031"}, "Line 2, column 'appointment_date'"),
+			({'patient': None}, "Line 2, column 'patient': ['This field cannot be null.']"),
+			({'purpose': None}, "Line 2, column 'purpose'"),
+			({'doctor__license_number': ""}, "Line 2, column 'doctor'"),
+			({'appointment_type': None, 'doctor__license_number': None}, "column 'doctor'"),
+		):
+			with self.subTest(bad=bad), self.assertRaisesMessage(FeedError, message):
+				FeedImporter(Appointment).run([row, {**row, 'appointment_time': "10:00", **bad}])
+		self.assertFalse(Appointment.objects.exists())
+
+		path = self.write('appointments.ndjson', json.dumps({**row, 'doctor__license_number': "NOPE"}) + '\n')
+		with self.assertRaisesMessage(CommandError, "No Doctor"):
+			call_command('import_feed', 'appointments', path, stdout=io.StringIO())
+
+
+class GenerateDataTest(TestCase):
+	def generate(self, seed):
+		call_command('generate_data', scale=0.01, seed=seed, reset=True, stdout=io.StringIO())
+		return list(Appointment.objects.order_by('pk').values_list(
+			'pk', 'patient_id', 'doctor_id', 'case_id', 'appointment_date', 'appointment_time', 'estimated_duration', 'status',
+		))
+
+	def test_same_seed_same_data_and_no_overlapping_bookings(self):
+		first = self.generate(7)
+		self.assertEqual(self.generate(7), first)
+		self.assertNotEqual(self.generate(8), first)
+		self.assertEqual(Patient.objects.count(), 100)
+
+		bookings = {}
+		for _, _, doctor, _, day, start, minutes, _ in first:
+			begins = datetime.combine(day, start)
+			bookings.setdefault(doctor, []).append((begins, begins + timedelta(minutes=minutes)))
+		for doctor, slots in bookings.items():
+			slots.sort()
+			for (_, ends), (begins, _) in zip(slots, slots[1:]):
+				self.assertLessEqual(ends, begins)
+			self.assertTrue(all(end.time() <= time(16) for _, end in slots))
+		walk_ins = sum(case is None for _, _, _, case, *_ in first)
+		self.assertAlmostEqual(walk_ins / len(first), 1 / 6, delta=0.06)
+
+
+class StartupProfileTest(SimpleTestCase):
+	def test_reports_startup_time_and_import_time_per_package(self):
+		out = io.StringIO()
+		call_command('startup_profile', 'setup', repeat=1, top=50, stdout=out)
+		output = out.getvalue()
+		self.assertIn('setup: median', output)
+		self.assertIn('self time by package', output)
+		self.assertIn(' django\n', output)
+		self.assertNotIn('django.contrib.postgres', output)
+
+
+class AsyncApiTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_async"), license_number="ASY1", medical_degree="MD", years_of_experience=3,
+		)
+		cls.patients = [
+			Patient.objects.create(first_name=first, last_name="Async", gender=gender, date_of_birth="1980-01-01")
+			for first, gender in (("Helene", "F"), ("Hugo", "M"), ("Hanna", "F"))
+		]
+		for n, (patient, status) in enumerate(zip(cls.patients, ("SCHEDULED", "COMPLETED", "SCHEDULED"))):
+			Appointment.objects.create(
+				patient=patient, doctor=cls.doctor, appointment_date=date(2031, 5, n + 1), appointment_time=time(9),
+				appointment_type="CONSULTATION", purpose="Check-up", status=status, notes="Private",
+			)
+		cls.reader = api_user()
+		cls.clinician = api_user("clinician", clinical=True)
+
+	async def client_for(self, user):
+		client = AsyncClient()
+		await client.aforce_login(user)
+		return client
+
+	async def test_appointment_listing_returns_rows_count_and_facets(self):
+		client = await self.client_for(self.reader)
+		response = await client.get('/api/async/appointments/', {'limit': 2, 'date_from': '2031-05-01'})
+		self.assertEqual(response.status_code, 200)
+		data = response.json()
+		self.assertEqual(data['count'], 3)
+		self.assertEqual(data['facets'], {'status': {'SCHEDULED': 2, 'COMPLETED': 1}})
+		self.assertEqual([row['appointment_date'] for row in data['results']], ['2031-05-01', '2031-05-02'])
+
+		data = (await client.get('/api/async/appointments/', {'status': 'COMPLETED'})).json()
+		self.assertEqual((data['count'], data['results'][0]['patient']), (1, str(self.patients[1].pk)))
+		response = await client.get('/api/async/appointments/', {'date_to': '31.05.2031'})
+		self.assertEqual(response.status_code, 400)
+		self.assertIn('date_to', response.json()['detail'])
+
+	async def test_patient_search_and_detail(self):
+		client = await self.client_for(self.reader)
+		data = (await client.get('/api/async/patients/', {'q': 'h async', 'gender': 'F'})).json()
+		self.assertEqual((data['count'], data['facets']), (2, {'gender': {'F': 2}}))
+		self.assertEqual([row['first_name'] for row in data['results']], ['Hanna', 'Helene'])
+
+		patient = self.patients[0]
+		detail = (await client.get(f'/api/async/patients/{patient.pk}/')).json()
+		self.assertEqual(detail['full_name'], patient.full_name)
+		response = await client.get('/api/async/appointments/00000000-0000-0000-0000-000000000000/')
+		self.assertEqual(response.status_code, 404)
+
+	async def test_views_need_a_user_with_view_permission(self):
+		path = '/api/async/patients/'
+		self.assertEqual((await AsyncClient().get(path)).status_code, 401)
+		nobody = await User.objects.acreate(username="async_nobody")
+		self.assertEqual((await (await self.client_for(nobody)).get(path)).status_code, 403)
+
+	async def test_detail_shows_clinical_fields_only_with_the_clinical_permission(self):
+		path = f'/api/async/appointments/{(await Appointment.objects.afirst()).pk}/'
+		basic = (await (await self.client_for(self.reader)).get(path)).json()
+		self.assertNotIn('notes', basic)
+		self.assertEqual(basic['purpose'], "Check-up")
+		clinical = (await (await self.client_for(self.clinician)).get(path)).json()
+		self.assertEqual(clinical['notes'], "Private")
+
+
+class ExportTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_export", first_name="Ed", last_name="Port"),
+			license_number="EXP1", medical_degree="MD", years_of_experience=4,
+		)
+		patient = Patient.objects.create(first_name="Zoë", last_name="Export", date_of_birth="1985-02-02")
+		case = Case.objects.create(patient=patient, primary_doctor=doctor, chief_complaint="Rash, itchy", symptoms_description="Rash")
+		for day, status in ((1, "COMPLETED"), (2, "SCHEDULED"), (9, "COMPLETED")):
+			Appointment.objects.create(
+				patient=patient, doctor=doctor, case=case, appointment_date=date(2032, 1, day), appointment_time=time(10),
+				appointment_type="FOLLOW_UP", purpose="Review", status=status,
+			)
+		cls.case = case
+		cls.staff = User.objects.create_user(username="exporter", is_staff=True)
+
+	def test_command_writes_filtered_csv_with_joined_names(self):
+		out = io.StringIO()
+		call_command('export_records', 'appointments', date_from=date(2032, 1, 1), date_to=date(2032, 1, 5),
+		             status=['COMPLETED'], stdout=out)
+		lines = out.getvalue().splitlines()
+		self.assertEqual(lines[0].split(',')[:4], ['uuid', 'appointment_date', 'appointment_time', 'status'])
+		self.assertEqual(len(lines), 2)
+		self.assertIn(',2032-01-01,10:00:00,COMPLETED,', lines[1])
+		self.assertIn(f',Zoë Export,Ed Port,{self.case.case_number},', lines[1])
+
+	def test_endpoint_streams_ndjson_to_staff(self):
+		client = APIClient()
+		self.assertEqual(client.get('/api/export/cases.ndjson').status_code, 403)
+		client.force_authenticate(self.staff)
+		response = client.get('/api/export/cases.ndjson', {'status': 'OPEN'}, HTTP_ACCEPT='application/x-ndjson')
+		self.assertTrue(response.streaming)
+		self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+		records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+		self.assertEqual([(r['case_number'], r['patient_name'], r['primary_doctor_name'], r['referring_doctor_name'])
+		                  for r in records], [(self.case.case_number, 'Zoë Export', 'Ed Port', None)])
+		self.assertEqual(client.get('/api/export/cases.csv', {'status': 'NOPE'}).status_code, 400)
+		self.assertEqual(client.get('/api/export/doctors.csv').status_code, 404)
+
+
+class PatientTimelineTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.doctor = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_time", first_name="Tim", last_name="Line"),
+			license_number="TIM1", medical_degree="MD", years_of_experience=9,
+		)
+		cls.referrer = Doctor.objects.create(
+			user=User.objects.create_user(username="dr_ref", first_name="Rita", last_name="Ref"),
+			license_number="REF1", medical_degree="MD", years_of_experience=2,
+		)
+		cls.treatment = Treatment.objects.create(
+			name="Physiotherapy", code="TL-PT", description="Exercises", category="THERAPY", base_cost="40.00",
+			estimated_duration_minutes=45,
+		)
+		cls.patient = Patient.objects.create(first_name="Tia", last_name="Mline", date_of_birth="1975-04-04")
+		cls.other = Patient.objects.create(first_name="Otto", last_name="Ther", date_of_birth="1979-09-09")
+		cls.add_case(cls.patient, day=1)
+
+	@classmethod
+	def add_case(cls, patient, day):
+		case = Case.objects.create(patient=patient, primary_doctor=cls.doctor, referring_doctor=cls.referrer,
+		                           chief_complaint="Knee pain", symptoms_description="Knee")
+		for hour in (9, 14):
+			cls.add_appointment(patient, date(2031, 6, day), hour, case=case, treatment=cls.treatment)
+		return case
+
+	@classmethod
+	def add_appointment(cls, patient, day, hour, **kwargs):
+		return Appointment.objects.create(
+			patient=patient, doctor=cls.doctor, appointment_date=day, appointment_time=time(hour),
+			appointment_type="THERAPY", purpose="Session", **kwargs,
+		)
+
+	def setUp(self):
+		cache.clear()
+
+	def load(self):
+		from .timeline import QUERIES, build_timeline, timeline_patient
+
+		with self.assertNumQueries(QUERIES), detect_n_plus_one():
+			return build_timeline(timeline_patient(self.patient.pk))
+
+	def test_timeline_is_a_fixed_number_of_queries_and_newest_first(self):
+		small = self.load()
+		for day in (2, 3, 4):
+			self.add_case(self.patient, day)
+		self.add_appointment(self.patient, date(2031, 7, 1), 8)
+		events = self.load()['events']
+
+		self.assertEqual(len(events), len(small['events']) + 3 * 3 + 1)
+		self.assertEqual([event['at'] for event in events], sorted((event['at'] for event in events), reverse=True))
+		appointment = next(event for event in events if event['type'] == 'appointment' and event['case'])
+		self.assertEqual((appointment['doctor'], appointment['treatment']), ("Tim Line", "Physiotherapy"))
+		opened = next(event for event in events if event['type'] == 'case_opened')
+		self.assertEqual((opened['primary_doctor'], opened['referring_doctor']), ("Tim Line", "Rita Ref"))
+		self.assertIsNone(next(event for event in events if event['at'].month == 7)['case'])
+
+	def test_timeline_is_cached_until_the_patient_history_changes(self):
+		from .timeline import QUERIES, patient_timeline
+
+		with self.assertNumQueries(QUERIES):
+			first = patient_timeline(self.patient.pk)
+		with self.assertNumQueries(0):
+			self.assertEqual(patient_timeline(str(self.patient.pk)), first)
+
+		self.add_appointment(self.other, date(2031, 8, 1), 10)
+		with self.assertNumQueries(0):
+			patient_timeline(self.patient.pk)
+
+		appointment = self.add_appointment(self.patient, date(2031, 8, 1), 11)
+		with self.assertNumQueries(QUERIES):
+			self.assertEqual(len(patient_timeline(self.patient.pk)['events']), len(first['events']) + 1)
+
+		# Moving an appointment to another patient changes both timelines.
+		patient_timeline(self.other.pk)
+		appointment = Appointment.objects.get(pk=appointment.pk)
+		appointment.patient = self.other
+		appointment.save()
+		with self.assertNumQueries(QUERIES):
+			self.assertEqual(len(patient_timeline(self.patient.pk)['events']), len(first['events']))
+		self.assertEqual(len(patient_timeline(self.other.pk)['events']), 2)
+
+	def test_feed_imports_invalidate_cached_timelines_and_listings(self):
+		from .importers import FeedImporter
+		from .timeline import patient_timeline
+
+		client = api_client()
+		before = len(patient_timeline(self.patient.pk)['events'])
+		self.assertEqual(len(client.get('/api/patients/').json()['results']), 2)
+		with self.captureOnCommitCallbacks(execute=True):
+			FeedImporter(Appointment).run([{
+				'patient': str(self.patient.pk), 'doctor__license_number': "TIM1", 'appointment_date': "2031-09-01",
+				'appointment_time': "10:00", 'appointment_type': "CONSULTATION", 'purpose': "Imported",
+			}])
+			FeedImporter(Patient).run([{'first_name': "Ina", 'last_name': "Port", 'date_of_birth': "1990-01-01"}])
+		self.assertEqual(len(patient_timeline(self.patient.pk)['events']), before + 1)
+		self.assertEqual(len(client.get('/api/patients/').json()['results']), 3)
+
+	def test_timeline_endpoint(self):
+		client = api_client()
+		response = client.get(f'/api/patients/{self.patient.pk}/timeline/')
+		self.assertEqual(response.status_code, 200)
+		data = response.json()
+		self.assertEqual(data['patient']['full_name'], self.patient.full_name)
+		self.assertEqual([event['type'] for event in data['events']], ['appointment', 'appointment', 'case_opened'])
+		self.assertEqual(client.get('/api/patients/00000000-0000-0000-0000-000000000000/timeline/').status_code, 404)
+
+	def test_timeline_endpoint_hides_diagnoses_without_the_clinical_permission(self):
+		Case.objects.filter(patient=self.patient).update(closed_at=timezone.now(), final_diagnosis="Sprain")
+		path = f'/api/patients/{self.patient.pk}/timeline/'
+		for client, expected in ((api_client(), []), (api_client("clinician", clinical=True), ["Sprain"])):
+			events = client.get(path).json()['events']
+			self.assertEqual([event.get('final_diagnosis') for event in events if 'final_diagnosis' in event], expected)
+			self.assertIn('case_closed', [event['type'] for event in events])
@@ -0,0 +1,142 @@
+"""
+A patient's clinical timeline: their cases (with primary and referring
+doctors), each case's appointments and each appointment's doctor and
+treatment, as one event stream, newest first.
+
+Walking ``patient.cases`` and ``case.appointments`` costs a query per case
+and per appointment relation. ``timeline_patient()`` loads everything in
+at most four queries however long the history is (``QUERIES``): the
+patient, the cases joined with their doctors, their appointments joined with
+doctor and treatment, and the patient's appointments outside any case. Results land in
+``to_attr`` lists, so nothing is fetched lazily while the events are built.
+
+``patient_timeline()`` caches the result per patient. The key embeds the
+patient's scoped generation, which every write to the patient or to one of
+their cases or appointments bumps, the ``Doctor`` and ``Treatment``
+generations for the names shown, and the ``Case`` and ``Appointment``
+generations, which only bulk writes such as feed imports bump (see
+``e_health.cache``). Misses are built
+on the primary unless ``using`` says otherwise: a lagging replica would file
+the rows from before a write under the generation that write created.
+
+The cached timeline includes clinical fields (``CLINICAL_FIELDS``);
+``without_clinical()`` strips them for callers without the clinical
+permission.
+"""
+import heapq
+from datetime import datetime
+from operator import itemgetter
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from core.db_routers import use_primary
+from e_health import cache
+from e_health.models import Appointment, Case, Doctor, Patient, Treatment
+
+# Three when the patient has no cases.
+QUERIES = 4
+# Event keys only shown to users with e_health.view_clinical_data.
+CLINICAL_FIELDS = frozenset({'final_diagnosis'})
+
+
+def timeline_patient(patient_id, using=None):
+    """The patient with ``timeline_cases`` (each with ``timeline_appointments``) and ``loose_appointments``."""
+    appointments = Appointment.objects.select_related('doctor__user', 'treatment').order_by(
+        '-appointment_date', '-appointment_time', 'pk',
+    )
+    cases = Case.objects.select_related('primary_doctor__user', 'referring_doctor__user').prefetch_related(
+        Prefetch('appointments', queryset=appointments, to_attr='timeline_appointments'),
+    ).order_by('-created_at', 'pk')
+    patients = Patient.objects.using(using) if using else Patient.objects
+    return patients.prefetch_related(
+        Prefetch('cases', queryset=cases, to_attr='timeline_cases'),
+        Prefetch('appointments', queryset=appointments.filter(case__isnull=True), to_attr='loose_appointments'),
+    ).get(pk=patient_id)
+
+
+def _doctor_name(doctor):
+    return doctor.user.get_full_name() if doctor is not None else None
+
+
+def _appointment_event(appointment, case=None):
+    moment = datetime.combine(appointment.appointment_date, appointment.appointment_time)
+    return {
+        'type': 'appointment',
+        'at': timezone.make_aware(moment) if timezone.is_naive(moment) else moment,
+        'appointment': str(appointment.pk),
+        'case': case.case_number if case is not None else None,
+        'appointment_type': appointment.appointment_type,
+        'status': appointment.status,
+        'purpose': appointment.purpose,
+        'doctor': _doctor_name(appointment.doctor),
+        'treatment': appointment.treatment.name if appointment.treatment is not None else None,
+    }
+
+
+def _case_events(case):
+    """Opened and (when set) closed events of ``case``, newest first."""
+    events = [{
+        'type': 'case_opened',
+        'at': case.created_at,
+        'case': case.case_number,
+        'status': case.status,
+        'chief_complaint': case.chief_complaint,
+        'primary_doctor': _doctor_name(case.primary_doctor),
+        'referring_doctor': _doctor_name(case.referring_doctor),
+    }]
+    if case.closed_at is not None:
+        events.insert(0, {
+            'type': 'case_closed',
+            'at': case.closed_at,
+            'case': case.case_number,
+            'final_diagnosis': case.final_diagnosis,
+        })
+    return events
+
+
+def build_timeline(patient):
+    """``{"patient": {...}, "events": [...]}`` for a patient loaded by ``timeline_patient()``."""
+    case_events = sorted(
+        (event for case in patient.timeline_cases for event in _case_events(case)),
+        key=itemgetter('at'), reverse=True,
+    )
+    # Every appointment list is already newest first, so they only need merging.
+    streams = [case_events, [_appointment_event(a) for a in patient.loose_appointments]]
+    streams.extend(
+        [_appointment_event(a, case) for a in case.timeline_appointments] for case in patient.timeline_cases
+    )
+    return {
+        'patient': {
+            'uuid': str(patient.pk),
+            'full_name': patient.full_name,
+            'date_of_birth': patient.date_of_birth,
+        },
+        'events': list(heapq.merge(*streams, key=itemgetter('at'), reverse=True)),
+    }
+
+
+def patient_timeline(patient_id, using=None, timeout=cache.DEFAULT_TIMEOUT):
+    """The cached timeline of ``patient_id``; raises ``Patient.DoesNotExist``."""
+    # The scope must read like the patient_id the cache hooks see.
+    patient_id = Patient._meta.pk.to_python(patient_id)
+
+    def compute():
+        with use_primary():
+            return build_timeline(timeline_patient(patient_id, using))
+
+    return cache.cached(
+        'timeline', [(Patient, patient_id), Case, Appointment, Doctor, Treatment], compute, patient_id,
+        timeout=timeout,
+    )
+
+
+def without_clinical(timeline):
+    """A copy of ``timeline`` without the ``CLINICAL_FIELDS`` of its events."""
+    return {
+        **timeline,
+        'events': [
+            {key: value for key, value in event.items() if key not in CLINICAL_FIELDS}
+            for event in timeline['events']
+        ],
+    }
@@ -0,0 +1,22 @@
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+
+from e_health import async_views, views
+
+router = DefaultRouter()
+router.register('patients', views.PatientViewSet)
+router.register('doctors', views.DoctorViewSet)
+router.register('cases', views.CaseViewSet)
+router.register('treatments', views.TreatmentViewSet)
+router.register('appointments', views.AppointmentViewSet)
+
+urlpatterns = [
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('pool-stats/', views.PoolStatsView.as_view(), name='pool-stats'),
+    path('export/<slug:kind>.<slug:fmt>', views.ExportView.as_view(), name='export'),
+    path('async/patients/', async_views.patient_list, name='async-patient-list'),
+    path('async/patients/<uuid:pk>/', async_views.patient_detail, name='async-patient-detail'),
+    path('async/appointments/', async_views.appointment_list, name='async-appointment-list'),
+    path('async/appointments/<uuid:pk>/', async_views.appointment_detail, name='async-appointment-detail'),
+    *router.urls,
+]
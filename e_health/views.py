@@ -1,3 +1,212 @@
-from django.shortcuts import render
+"""
+Read-only API for patients, doctors, cases, treatments and appointments.
 
-# Create your views here.
+List views read ``values_list()`` tuples and turn them into JSON through the
+list serializer's compiled ``FieldPlan`` (see ``e_health.serializers``), so
+no model instances or per-field serializer calls are involved. Pages are
+keyset paginated. Detail views use the regular detail serializers.
+
+Patient, doctor and treatment responses are cached under per-model
+generations (see ``e_health.cache``). ``/api/patients/<uuid>/timeline/``
+serves the cached timeline of ``e_health.timeline``.
+
+Every endpoint needs an authenticated user; the model endpoints also need the
+model's ``view`` permission. Clinical fields are left out unless the user has
+``e_health.view_clinical_data`` (see ``e_health.serializers``), and the
+response cache keeps the two variants apart.
+"""
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import db_pool
+from core.db_routers import use_primary
+from e_health import cache, exports, timeline
+
+from e_health.models import Appointment, Case, Doctor, Patient, Treatment
+from e_health.pagination import KeysetPagination, resolve_ordering
+from e_health.renderers import FastJSONRenderer
+from e_health.serializers import (
+    AppointmentDetailSerializer, AppointmentSerializer, CaseDetailSerializer, CaseSerializer,
+    DoctorDetailSerializer, DoctorSerializer, FieldPlan, PatientDetailSerializer, PatientSerializer,
+    TreatmentDetailSerializer, TreatmentSerializer, can_view_clinical,
+)
+
+
+class ModelViewPermissions(permissions.DjangoModelPermissions):
+    """``DjangoModelPermissions`` that also requires the ``view`` permission for reads."""
+
+    perms_map = {
+        **permissions.DjangoModelPermissions.perms_map,
+        'GET': ['%(app_label)s.view_%(model_name)s'],
+        'OPTIONS': ['%(app_label)s.view_%(model_name)s'],
+        'HEAD': ['%(app_label)s.view_%(model_name)s'],
+    }
+
+
+class FieldPlanViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ``list_serializer_class`` shapes list rows through its ``FieldPlan``;
+    ``serializer_class`` is used for single objects.
+    """
+
+    list_serializer_class = None
+    permission_classes = [permissions.IsAuthenticated, ModelViewPermissions]
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    keyset_ordering = None
+
+    def list(self, request, *args, **kwargs):
+        plan = FieldPlan.for_serializer(self.list_serializer_class)
+        queryset = self.filter_queryset(self.get_queryset())
+        # The paginator reads the cursor position from the ordering columns.
+        ordering = [field.attname for field, _ in resolve_ordering(queryset, self.keyset_ordering)]
+        page = self.paginate_queryset(plan.values_list(queryset, extra=ordering))
+        if page is None:
+            return Response(plan.rows(plan.values_list(queryset)))
+        return self.get_paginated_response(plan.rows(page))
+
+
+class CachedReadMixin:
+    """Cache ``list`` and ``retrieve`` responses until a ``cache_models`` row changes."""
+
+    cache_models = ()
+    cache_timeout = cache.DEFAULT_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self._cached('list', super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached('retrieve', super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, action, view, request, *args, **kwargs):
+        def compute():
+            # A lagging replica could file pre-write rows under the new generation.
+            with use_primary():
+                response = view(request, *args, **kwargs)
+            return response.status_code, response.data
+
+        # Users with and without the clinical permission get different fields.
+        scope = 'clinical' if can_view_clinical(request) else 'basic'
+        status, data = cache.cached(
+            f'{self.basename}.{action}', self.cache_models, compute,
+            scope, request.get_host(), request.get_full_path(), timeout=self.cache_timeout,
+        )
+        return Response(data, status=status)
+
+
+class PatientViewSet(CachedReadMixin, FieldPlanViewSet):
+    queryset = Patient.objects.all()
+    serializer_class = PatientDetailSerializer
+    list_serializer_class = PatientSerializer
+    cache_models = (Patient,)
+
+    @action(detail=True)
+    def timeline(self, request, pk=None):
+        """The patient's cases and appointments as one event stream, newest first."""
+        try:
+            data = timeline.patient_timeline(pk)
+        except (Patient.DoesNotExist, ValidationError):
+            raise NotFound()
+        return Response(data if can_view_clinical(request) else timeline.without_clinical(data))
+
+
+class DoctorViewSet(CachedReadMixin, FieldPlanViewSet):
+    queryset = Doctor.objects.for_listing()
+    serializer_class = DoctorDetailSerializer
+    list_serializer_class = DoctorSerializer
+    cache_models = (Doctor,)
+    # Meta.ordering goes through the user table, which keyset pagination cannot use.
+    keyset_ordering = ['uuid']
+
+
+class CaseViewSet(FieldPlanViewSet):
+    queryset = Case.objects.all()
+    serializer_class = CaseDetailSerializer
+    list_serializer_class = CaseSerializer
+
+
+class TreatmentViewSet(CachedReadMixin, FieldPlanViewSet):
+    queryset = Treatment.objects.all()
+    serializer_class = TreatmentDetailSerializer
+    list_serializer_class = TreatmentSerializer
+    cache_models = (Treatment,)
+
+
+class AppointmentViewSet(FieldPlanViewSet):
+    queryset = Appointment.objects.all()
+    serializer_class = AppointmentDetailSerializer
+    list_serializer_class = AppointmentSerializer
+
+
+class CacheStatsView(APIView):
+    """Response cache hit/miss/invalidation counts for this process."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            **cache.stats(),
+            'generations': {
+                model._meta.label_lower: cache.generation(model) for model in (Patient, Doctor, Treatment)
+            },
+        })
+
+
+class PoolStatsView(APIView):
+    """Connection pool counters of this process, per pooled database alias."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(db_pool.pool_stats())
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """For views that build their own response whatever the client accepts."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(APIView):
+    """
+    ``/api/export/<kind>.<format>``: every case or appointment, filtered by
+    ``date_from``, ``date_to`` and ``status`` (repeatable), streamed as CSV or
+    NDJSON while it is read (see ``e_health.exports``).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, kind, fmt):
+        if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+            raise NotFound()
+        params = request.query_params
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            if params.get(name):
+                try:
+                    dates[name] = parse_date(params[name])
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    raise ParseError(f'{name} must be a date (YYYY-MM-DD).')
+        statuses = [status for value in params.getlist('status') for status in value.split(',') if status]
+        try:
+            chunks = exports.export_chunks(kind, fmt, statuses=statuses, **dates)
+        except exports.InvalidExport as exc:
+            raise ParseError(str(exc)) from exc
+        response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+        return response